@@ -0,0 +1,13 @@
+"""
+🛠️ Headless AI Forge
+--------------------
+
+Command-line and batch entry points that reuse ModelLoader, prompt_tools and
+LocalSearchManager without importing any Qt module:
+
+    python -m aiforge generate "Explain WAL mode"
+    python -m aiforge chain summarize translate --input "..."
+    python -m aiforge import notes.pdf
+    python -m aiforge search "vector index"
+    python -m aiforge batch prompts.jsonl results.jsonl --concurrency 4
+"""
@@ -0,0 +1,5 @@
+import sys
+
+from aiforge.cli import main
+
+sys.exit(main())
@@ -0,0 +1,138 @@
+# aiforge/batch.py — JSONL batch generation with bounded concurrency and resumable checkpoints
+#
+# Input: one JSON object per line, {"prompt": "...", "id": optional, "template": optional, "model": optional}.
+# Output: one JSON object per finished prompt, appended (and flushed) as soon as it completes.
+# The output file is the checkpoint: re-running with the same output skips every id already in it.
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ALL_COMPLETED, FIRST_COMPLETED, wait
+
+from requests.adapters import HTTPAdapter
+
+
+def read_jobs(input_path: str):
+    """Yields (id, job) per non-empty input line; the line number is the id when none is given."""
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError:
+                job = {"prompt": line.rstrip("\n")}
+            if isinstance(job, str):
+                job = {"prompt": job}
+            yield str(job.get("id", line_no)), job
+
+
+def completed_ids(output_path: str) -> set:
+    """Ids already written to `output_path`; failed rows are retried on resume."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a torn last line from an interrupted run
+            if "error" not in row:
+                done.add(str(row.get("id")))
+    return done
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def run_job(model_loader, job_id: str, job: dict, timeout: float) -> dict:
+    from prompt_tools import apply_template, load_prompt_template
+
+    prompt = job.get("prompt", "")
+    if job.get("template"):
+        prompt = apply_template(load_prompt_template(job["template"]), prompt)
+
+    start = time.perf_counter()
+    try:
+        reply = model_loader.generate_once(prompt, model_name=job.get("model"), timeout=timeout)
+    except Exception as e:
+        return {"id": job_id, "prompt": job.get("prompt", ""), "error": str(e),
+                "wall_sec": time.perf_counter() - start}
+    return {
+        "id": job_id,
+        "prompt": job.get("prompt", ""),
+        "response": reply.get("response", ""),
+        "model": reply.get("model"),
+        "eval_count": reply.get("eval_count", 0),
+        "eval_duration_sec": reply.get("eval_duration", 0) / 1e9,
+        "wall_sec": time.perf_counter() - start,
+    }
+
+
+def run_batch(model_loader, input_path: str, output_path: str, concurrency: int = 4,
+              resume: bool = True, timeout: float = 300, progress_every: int = 50) -> dict:
+    """
+    Streams prompts from `input_path` through Ollama with at most `concurrency` requests in flight
+    and returns a throughput summary. Only a window of 2x`concurrency` jobs is held in memory,
+    so inputs with thousands of prompts don't queue thousands of futures.
+    """
+    skip = completed_ids(output_path) if resume else set()
+    if not resume and os.path.exists(output_path):
+        os.remove(output_path)
+
+    # let every worker thread keep its own pooled connection to Ollama
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(concurrency, 10))
+    model_loader.session.mount("http://", adapter)
+
+    stats = {"ok": 0, "failed": 0, "skipped": 0, "eval_tokens": 0, "eval_sec": 0.0}
+    start = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        if out.tell() and not _ends_with_newline(output_path):
+            out.write("\n")  # keep a torn line from an interrupted run from swallowing the next row
+        pending = set()
+
+        def drain(return_when):
+            nonlocal pending
+            done, pending = wait(pending, return_when=return_when)
+            for future in done:
+                row = future.result()
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                out.flush()
+                if "error" in row:
+                    stats["failed"] += 1
+                    print(f"❌ [Batch] {row['id']}: {row['error']}")
+                else:
+                    stats["ok"] += 1
+                    stats["eval_tokens"] += row["eval_count"] or 0
+                    stats["eval_sec"] += row["eval_duration_sec"] or 0.0
+                finished = stats["ok"] + stats["failed"]
+                if progress_every and finished % progress_every == 0:
+                    elapsed = time.perf_counter() - start
+                    print(f"⏱️ [Batch] {finished} done, {finished / elapsed:.2f} prompts/s")
+
+        for job_id, job in read_jobs(input_path):
+            if job_id in skip:
+                stats["skipped"] += 1
+                continue
+            pending.add(pool.submit(run_job, model_loader, job_id, job, timeout))
+            if len(pending) >= concurrency * 2:
+                drain(FIRST_COMPLETED)
+        if pending:
+            drain(ALL_COMPLETED)
+
+    wall = time.perf_counter() - start
+    finished = stats["ok"] + stats["failed"]
+    return {
+        **stats,
+        "wall_sec": wall,
+        "prompts_per_sec": finished / wall if wall > 0 else 0.0,
+        # aggregate generated tokens over wall time: what concurrency actually bought
+        "tokens_per_sec": stats["eval_tokens"] / wall if wall > 0 else 0.0,
+        "server_tokens_per_sec": stats["eval_tokens"] / stats["eval_sec"] if stats["eval_sec"] else 0.0,
+        "concurrency": concurrency,
+    }
@@ -0,0 +1,213 @@
+# aiforge/cli.py — `python -m aiforge` entry point
+#
+# Heavy modules (langchain, sentence-transformers) are imported inside the subcommands that
+# need them, so `generate` and `batch` start without loading the search stack.
+
+import argparse
+import json
+import os
+import sys
+
+
+def _loader(args):
+    from model_loader import ModelLoader
+
+    loader = ModelLoader(config_path=args.config)
+    loader.model_override = args.model  # this invocation only; config.json keeps its default
+    return loader
+
+
+def _search_manager(args):
+    from core.utils.local_search_manager import LocalSearchManager
+
+    settings = {}
+    if os.path.exists(args.config):
+        with open(args.config, "r", encoding="utf-8") as f:
+            settings = json.load(f).get("search", {})
+    embedder = dict(settings.get("embedder") or {})
+    if args.embedder:
+        embedder["backend"] = args.embedder
+    storage = getattr(args, "storage", None) or settings.get("storage", "float32")
+    return LocalSearchManager(persist_path=args.store, storage=storage, embedder_settings=embedder)
+
+
+def cmd_generate(args):
+    from prompt_tools import apply_template, load_prompt_template
+
+    loader = _loader(args)
+    prompt = args.prompt if args.prompt != "-" else sys.stdin.read()
+    if args.template:
+        prompt = apply_template(load_prompt_template(args.template), prompt)
+
+    if args.no_stream:
+        print(loader.generate_once(prompt)["response"])
+        return 0
+    for chunk in loader.generate_with_ollama_stream(prompt):
+        sys.stdout.write(chunk)
+        sys.stdout.flush()
+    sys.stdout.write("\n")
+    return 0
+
+
+def cmd_chain(args):
+    from prompt_tools import run_chain
+
+    loader = _loader(args)
+    user_input = args.input if args.input != "-" else sys.stdin.read()
+    try:
+        steps = run_chain(args.templates, user_input, loader)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    for name, prompt, response in steps:
+        if args.verbose:
+            print(f"── {name} prompt ──\n{prompt}\n")
+        print(f"── {name} ──\n{response}\n")
+    return 0
+
+
+def cmd_import(args):
+    manager = _search_manager(args)
+    failed = 0
+    for path in args.files:
+        try:
+            manager.import_document(path, collection=args.collection)
+            print(f"✅ Indexed {path} into '{args.collection}'")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {path}: {e}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def cmd_search(args):
+    manager = _search_manager(args)
+    print(manager.search(args.query, top_k=args.top_k, mode=args.mode, collections=args.collection,
+                         source=args.source, file_types=args.type, since=args.since, until=args.until))
+    return 0
+
+
+def cmd_batch(args):
+    from aiforge.batch import run_batch
+
+    loader = _loader(args)
+    summary = run_batch(loader, args.input, args.output, concurrency=args.concurrency,
+                        resume=not args.restart, timeout=args.timeout)
+    print(
+        f"📊 [Batch] {summary['ok']} ok, {summary['failed']} failed, {summary['skipped']} skipped "
+        f"in {summary['wall_sec']:.1f}s — {summary['prompts_per_sec']:.2f} prompts/s, "
+        f"{summary['tokens_per_sec']:.1f} tok/s aggregate "
+        f"({summary['server_tokens_per_sec']:.1f} tok/s per request)"
+    )
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 1 if summary["failed"] else 0
+
+
+def cmd_serve(args):
+    from aiforge.server import serve
+
+    serve(host=args.host, port=args.port, config_path=args.config, ollama_url=args.ollama_url,
+          ollama_concurrency=args.ollama_concurrency, search_concurrency=args.search_concurrency,
+          max_queue=args.max_queue, warm=not args.no_warm, watch=args.watch)
+    return 0
+
+
+def cmd_watch(args):
+    import time
+
+    from core.utils.folder_watcher import FolderWatcher
+
+    watcher = FolderWatcher(_search_manager(args), folders=args.folders, collection=args.collection,
+                            interval=args.interval, debounce=args.debounce).start()
+    try:
+        while True:
+            time.sleep(args.report)
+            stats = watcher.stats()
+            lag = f"{stats['last_lag_s']:.1f}s" if stats["last_lag_s"] is not None else "-"
+            print(f"📊 backlog {stats['backlog']}  indexed {stats['indexed_files']}  last lag {lag}  "
+                  f"failed {stats['failed']}")
+    finally:
+        watcher.stop()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="aiforge", description="Headless AI Forge")
+    parser.add_argument("--config", default="config.json", help="path to config.json")
+    parser.add_argument("--model", default=None, help="override the configured Ollama model")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("generate", help="generate a response for one prompt")
+    p.add_argument("prompt", help="prompt text, or - to read stdin")
+    p.add_argument("--template", help="apply a saved prompt template")
+    p.add_argument("--no-stream", action="store_true", help="print the response once it is complete")
+    p.set_defaults(func=cmd_generate)
+
+    p = sub.add_parser("chain", help="run saved templates in sequence")
+    p.add_argument("templates", nargs="+", help="template names, in order")
+    p.add_argument("--input", required=True, help="input text, or - to read stdin")
+    p.add_argument("-v", "--verbose", action="store_true", help="also print each step's prompt")
+    p.set_defaults(func=cmd_chain)
+
+    p = sub.add_parser("import", help="index documents for local search")
+    p.add_argument("files", nargs="+")
+    p.add_argument("--collection", default="default", help="named collection to add the files to")
+    p.add_argument("--embedder", choices=["huggingface", "onnx"], help="override config search.embedder.backend")
+    p.add_argument("--store", default="./vs_store.json")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("search", help="search indexed documents")
+    p.add_argument("query")
+    p.add_argument("--top-k", type=int, default=3)
+    p.add_argument("--mode", choices=["hybrid", "vector", "lexical"], default="hybrid",
+                   help="lexical (BM25) skips loading the embedding model")
+    p.add_argument("--storage", choices=["float32", "float16", "int8", "binary"],
+                   help="in-memory embedding codes; compact types rerank candidates exactly")
+    p.add_argument("--collection", action="append", help="search only this collection (repeatable; default all)")
+    p.add_argument("--source", help="glob on the source file name or path, e.g. '*.log'")
+    p.add_argument("--type", action="append", help="file extension to include (repeatable)")
+    p.add_argument("--since", help="imported at or after this ISO date/time")
+    p.add_argument("--until", help="imported at or before this ISO date/time")
+    p.add_argument("--embedder", choices=["huggingface", "onnx"], help="override config search.embedder.backend")
+    p.add_argument("--store", default="./vs_store.json")
+    p.set_defaults(func=cmd_search)
+
+    p = sub.add_parser("watch", help="keep local search in sync with folders until interrupted")
+    p.add_argument("folders", nargs="*", help="folders to watch besides plugins/local_search/docs")
+    p.add_argument("--collection", default="default")
+    p.add_argument("--interval", type=float, default=2.0, help="seconds between scans")
+    p.add_argument("--debounce", type=float, default=2.0, help="seconds a file must be unchanged before indexing")
+    p.add_argument("--report", type=float, default=30.0, help="seconds between backlog reports")
+    p.add_argument("--embedder", choices=["huggingface", "onnx"], help="override config search.embedder.backend")
+    p.add_argument("--store", default="./vs_store.json")
+    p.set_defaults(func=cmd_watch)
+
+    p = sub.add_parser("batch", help="run a JSONL file of prompts")
+    p.add_argument("input", help="JSONL with one {\"prompt\": ...} per line")
+    p.add_argument("output", help="JSONL results; doubles as the resume checkpoint")
+    p.add_argument("--concurrency", type=int, default=4)
+    p.add_argument("--timeout", type=float, default=300, help="per-prompt timeout in seconds")
+    p.add_argument("--restart", action="store_true", help="ignore existing results instead of resuming")
+    p.add_argument("--summary", help="also write the throughput summary as JSON")
+    p.set_defaults(func=cmd_batch)
+
+    p = sub.add_parser("serve", help="run the local HTTP API")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--ollama-url", default=None, help="talk to this Ollama instead of the configured one")
+    p.add_argument("--ollama-concurrency", type=int, default=2)
+    p.add_argument("--search-concurrency", type=int, default=1)
+    p.add_argument("--max-queue", type=int, default=64, help="waiting requests per backend before 429")
+    p.add_argument("--no-warm", action="store_true", help="don't preload the embedder at startup")
+    p.add_argument("--watch", action="store_true", help="also index watched folders in the background")
+    p.set_defaults(func=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except KeyboardInterrupt:
+        print("\n⛔ Interrupted", file=sys.stderr)
+        return 130
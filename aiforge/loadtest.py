@@ -0,0 +1,130 @@
+# aiforge/loadtest.py — load test for the local API against the mock Ollama
+#
+#   python -m aiforge.loadtest --requests 200 --clients 32 --ollama-concurrency 4
+#
+# Starts aiforge.mock_ollama and aiforge.server in this process on free ports, fires streaming
+# /generate requests from `clients` concurrent clients and reports latency, TTFT, throughput and
+# how many requests the queue limit rejected.
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import aiohttp
+from aiohttp import web
+
+from aiforge.mock_ollama import MockOllama
+from aiforge.server import ForgeServer
+
+
+async def start_site(app, host="127.0.0.1"):
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{port}"
+
+
+async def stream_one(session, base_url, prompt):
+    start = time.perf_counter()
+    ttft = None
+    async with session.post(f"{base_url}/generate", json={"prompt": prompt}) as resp:
+        if resp.status != 200:
+            return {"status": resp.status}
+        event = None
+        async for raw in resp.content:
+            line = raw.decode().strip()
+            if line.startswith("event:"):
+                event = line.split(":", 1)[1].strip()
+            elif line.startswith("data:") and event == "token" and ttft is None:
+                ttft = time.perf_counter() - start
+            elif line.startswith("data:") and event == "error":
+                return {"status": 502, "error": json.loads(line[5:])["error"]}
+    return {"status": 200, "latency": time.perf_counter() - start, "ttft": ttft}
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+async def run(args):
+    mock = MockOllama(tokens_per_sec=args.tokens_per_sec, default_num_predict=args.num_predict)
+    mock_runner, mock_url = await start_site(mock.app())
+
+    server = ForgeServer(config_path=args.config, ollama_url=mock_url, ollama_concurrency=args.ollama_concurrency,
+                         max_queue=args.max_queue, warm=False)
+    server_runner, server_url = await start_site(server.app())
+    print(f"🧪 Mock Ollama {mock_url} · API {server_url}")
+
+    queue = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(f"load test prompt {i}")
+    results = []
+
+    async def client(session):
+        while not queue.empty():
+            prompt = queue.get_nowait()
+            results.append(await stream_one(session, server_url, prompt))
+
+    start = time.perf_counter()
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        await asyncio.gather(*(client(session) for _ in range(args.clients)))
+    wall = time.perf_counter() - start
+
+    await server_runner.cleanup()
+    await mock_runner.cleanup()
+
+    ok = [r for r in results if r["status"] == 200]
+    latencies = [r["latency"] for r in ok]
+    ttfts = [r["ttft"] for r in ok if r["ttft"] is not None]
+    summary = {
+        "requests": len(results),
+        "ok": len(ok),
+        "rejected_429": sum(1 for r in results if r["status"] == 429),
+        "errors": sum(1 for r in results if r["status"] not in (200, 429)),
+        "wall_sec": wall,
+        "requests_per_sec": len(ok) / wall if wall else 0.0,
+        "tokens_per_sec": len(ok) * args.num_predict / wall if wall else 0.0,
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p95": percentile(latencies, 0.95),
+        "ttft_p50": percentile(ttfts, 0.5),
+        "ttft_p95": percentile(ttfts, 0.95),
+        "mean_latency": statistics.fmean(latencies) if latencies else float("nan"),
+    }
+    print(
+        f"📊 {summary['ok']}/{summary['requests']} ok, {summary['rejected_429']} rejected, "
+        f"{summary['errors']} errors in {wall:.2f}s — {summary['requests_per_sec']:.1f} req/s, "
+        f"{summary['tokens_per_sec']:.0f} tok/s\n"
+        f"   latency p50 {summary['latency_p50']:.3f}s p95 {summary['latency_p95']:.3f}s · "
+        f"TTFT p50 {summary['ttft_p50']:.3f}s p95 {summary['ttft_p95']:.3f}s"
+    )
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the AI Forge API against a mock Ollama")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--ollama-concurrency", type=int, default=4)
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--tokens-per-sec", type=float, default=200.0)
+    parser.add_argument("--num-predict", type=int, default=32)
+    parser.add_argument("--json", help="write the summary to this file")
+    args = parser.parse_args(argv)
+
+    summary = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
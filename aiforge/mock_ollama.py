@@ -0,0 +1,236 @@
+# aiforge/mock_ollama.py — offline stand-in for `ollama serve`
+#
+#   python -m aiforge.mock_ollama --port 11435 --tokens-per-sec 80 --latency-ms 150 --jitter 0.1
+#   AIFORGE_OLLAMA_URL=http://127.0.0.1:11435 python -m aiforge generate "hi"
+#
+# Implements GET /, GET /api/tags, GET /api/ps and POST /api/generate (streaming and not, with
+# keep_alive: an empty prompt only loads the model, keep_alive 0 unloads it). Response text is
+# deterministic (seeded from the prompt); timing is a fixed prompt-processing latency plus a fixed
+# token rate, each scaled by a seeded jitter, so runs with the same --seed produce the same
+# schedule. Final chunks carry the same counters real Ollama reports (eval_count, eval_duration, ...);
+# --load-ms adds a first-request delay, reported as load_duration, for models that aren't resident.
+# Replies carry a `context` array; sending it back means only the new prompt is "evaluated", and
+# --prompt-ms-per-token makes that evaluation cost scale with the prompt length.
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from aiohttp import web
+
+WORDS = ("forge", "model", "token", "cache", "stream", "vector", "prompt", "kernel", "batch", "latency",
+         "thread", "shard", "index", "query", "image", "pipeline", "memory", "quantized", "context", "embed")
+
+
+def fake_tokens(prompt: str, count: int) -> list[str]:
+    rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+    return [rng.choice(WORDS) + " " for _ in range(count)]
+
+
+def token_id(word: str) -> int:
+    return int.from_bytes(hashlib.sha256(word.strip().encode("utf-8")).digest()[:2], "little")
+
+
+DEFAULT_MODELS = ("mistral:latest", "llama3:8b", "codellama:7b")
+MODEL_SIZE = 4_100_000_000
+DEFAULT_KEEP_ALIVE = 300.0  # seconds, Ollama's 5m default
+
+
+def keep_alive_seconds(value) -> float:
+    """Ollama accepts seconds or a duration string ("30m", "1h"); negative means forever."""
+    if value is None:
+        return DEFAULT_KEEP_ALIVE
+    if isinstance(value, (int, float)):
+        return float(value)
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    for suffix in ("ms", "s", "m", "h"):
+        if value.endswith(suffix):
+            return float(value[:-len(suffix)]) * units[suffix]
+    return float(value)
+
+
+class MockOllama:
+    def __init__(self, tokens_per_sec: float = 50.0, default_num_predict: int = 64, latency_ms: float = 0.0,
+                 jitter: float = 0.0, seed: int = 0, models=DEFAULT_MODELS, load_ms: float = 0.0,
+                 prompt_ms_per_token: float = 0.0):
+        self.tokens_per_sec = tokens_per_sec
+        self.default_num_predict = default_num_predict
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.models = list(models)
+        self.load_ms = load_ms
+        self.prompt_ms_per_token = prompt_ms_per_token
+        self.loaded = {}  # model -> expiry (epoch seconds)
+        self.rng = random.Random(seed)
+        self.active = 0
+        self.served = 0
+
+    def _jittered(self, seconds: float) -> float:
+        if not self.jitter:
+            return seconds
+        return max(0.0, seconds * (1.0 + self.rng.uniform(-self.jitter, self.jitter)))
+
+    def final_chunk(self, model: str, prompt: str, eval_count: int, started: float,
+                    prompt_sec: float, eval_sec: float) -> dict:
+        elapsed_ns = int((time.perf_counter() - started) * 1e9)
+        return {
+            "model": model,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "response": "",
+            "done": True,
+            "total_duration": elapsed_ns,
+            "load_duration": 0,
+            "done_reason": "stop",
+            "prompt_eval_count": len(prompt.split()),
+            "prompt_eval_duration": max(1, int(prompt_sec * 1e9)),
+            "eval_count": eval_count,
+            "eval_duration": max(1, int(eval_sec * 1e9)),
+        }
+
+    async def root(self, request):
+        return web.Response(text="Ollama is running")
+
+    async def tags(self, request):
+        return web.json_response({"models": [
+            {
+                "name": name,
+                "model": name,
+                "modified_at": "2025-01-01T00:00:00Z",
+                "size": MODEL_SIZE,
+                "digest": hashlib.sha256(name.encode()).hexdigest(),
+                "details": {"format": "gguf", "family": name.split(":")[0], "quantization_level": "Q4_0"},
+            }
+            for name in self.models
+        ]})
+
+    async def ps(self, request):
+        now = time.time()
+        self.loaded = {name: expiry for name, expiry in self.loaded.items() if expiry > now}
+        return web.json_response({"models": [
+            {"name": name, "model": name, "size": MODEL_SIZE, "size_vram": 0,
+             "expires_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(min(expiry, 4e9)))}
+            for name, expiry in self.loaded.items()
+        ]})
+
+    async def _load(self, model: str, keep_alive) -> float:
+        """Marks `model` resident for `keep_alive`; returns the simulated load time in seconds."""
+        seconds = keep_alive_seconds(keep_alive)
+        load_sec = 0.0
+        if self.load_ms and self.loaded.get(model, 0.0) <= time.time():
+            load_sec = self._jittered(self.load_ms / 1000.0)
+            await asyncio.sleep(load_sec)
+        self.loaded[model] = float("inf") if seconds < 0 else time.time() + seconds
+        return load_sec
+
+    async def generate(self, request):
+        body = await request.json()
+        model = body.get("model", "mock")
+        prompt = body.get("prompt", "")
+        num_predict = (body.get("options") or {}).get("num_predict") or self.default_num_predict
+        if model not in self.models:
+            return web.json_response({"error": f"model '{model}' not found"}, status=404)
+        if body.get("keep_alive") in (0, "0", "0s", "0m"):
+            self.loaded.pop(model, None)
+            return web.json_response({"model": model, "response": "", "done": True, "done_reason": "unload"})
+        load_sec = await self._load(model, body.get("keep_alive"))
+        if not prompt:
+            return web.json_response({"model": model, "response": "", "done": True, "done_reason": "load",
+                                      "load_duration": int(load_sec * 1e9)})
+        tokens = fake_tokens(prompt, num_predict)
+        prompt_sec = self._jittered((self.latency_ms + self.prompt_ms_per_token * len(prompt.split())) / 1000.0)
+        context = list(body.get("context") or []) + [token_id(word) for word in prompt.split() + tokens]
+        delays = [self._jittered(1.0 / self.tokens_per_sec) for _ in tokens]
+        started = time.perf_counter()
+        self.active += 1
+        try:
+            await asyncio.sleep(prompt_sec)
+            if not body.get("stream", True):
+                await asyncio.sleep(sum(delays))
+                reply = self.final_chunk(model, prompt, len(tokens), started, prompt_sec, sum(delays))
+                reply["response"] = "".join(tokens)
+                reply["load_duration"] = int(load_sec * 1e9)
+                reply["context"] = context
+                return web.json_response(reply)
+
+            response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+            await response.prepare(request)
+            # sleep to absolute deadlines so per-chunk scheduling overhead doesn't accumulate
+            deadline = time.perf_counter()
+            for token, delay in zip(tokens, delays):
+                deadline += delay
+                await asyncio.sleep(max(0.0, deadline - time.perf_counter()))
+                await response.write((json.dumps({"model": model, "response": token, "done": False}) + "\n").encode())
+            final = self.final_chunk(model, prompt, len(tokens), started, prompt_sec, sum(delays))
+            final["load_duration"] = int(load_sec * 1e9)
+            final["context"] = context
+            await response.write((json.dumps(final) + "\n").encode())
+            await response.write_eof()
+            return response
+        finally:
+            self.active -= 1
+            self.served += 1
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/", self.root)
+        app.router.add_get("/api/tags", self.tags)
+        app.router.add_get("/api/ps", self.ps)
+        app.router.add_post("/api/generate", self.generate)
+        return app
+
+
+@contextmanager
+def serve_in_thread(mock: MockOllama, host: str = "127.0.0.1"):
+    """Runs `mock` on a free port in a background event loop; yields its base URL."""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    state = {}
+
+    async def start():
+        runner = web.AppRunner(mock.app())
+        await runner.setup()
+        site = web.TCPSite(runner, host, 0)
+        await site.start()
+        state["runner"] = runner
+        state["url"] = f"http://{host}:{site._server.sockets[0].getsockname()[1]}"
+        ready.set()
+
+    thread = threading.Thread(target=loop.run_forever, name="mock-ollama", daemon=True)
+    thread.start()
+    asyncio.run_coroutine_threadsafe(start(), loop)
+    ready.wait(10)
+    try:
+        yield state["url"]
+    finally:
+        asyncio.run_coroutine_threadsafe(state["runner"].cleanup(), loop).result(10)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(10)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mock Ollama server for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0)
+    parser.add_argument("--num-predict", type=int, default=64, help="tokens per reply when the request sets none")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="prompt-processing delay before the first token")
+    parser.add_argument("--jitter", type=float, default=0.0, help="relative +/- spread applied to every delay")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the jitter schedule")
+    parser.add_argument("--models", nargs="+", default=list(DEFAULT_MODELS))
+    parser.add_argument("--load-ms", type=float, default=0.0, help="delay for the first request to a non-resident model")
+    parser.add_argument("--prompt-ms-per-token", type=float, default=0.0, help="extra prompt-eval delay per prompt word")
+    args = parser.parse_args(argv)
+
+    mock = MockOllama(args.tokens_per_sec, args.num_predict, args.latency_ms, args.jitter, args.seed, args.models,
+                      args.load_ms, args.prompt_ms_per_token)
+    print(f"🧪 Mock Ollama on http://{args.host}:{args.port} ({args.tokens_per_sec:g} tok/s)")
+    web.run_app(mock.app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+# aiforge/server.py — optional local HTTP API for other tools on the same machine
+#
+#   python -m aiforge serve --port 8765
+#
+# Endpoints (JSON in, JSON out unless noted):
+#   GET    /health                    liveness plus whether Ollama answers
+#   GET    /stats                     per-backend queue/concurrency counters, telemetry summary and,
+#                                     with --watch, the folder watcher's backlog and ingestion lag
+#   GET    /models                    installed models (cached /api/tags) and what Ollama has resident (/api/ps)
+#   POST   /generate                  {"prompt", "model"?, "template"?, "stream"?=true, "conversation"?}
+#                                     -> SSE when streaming; turns sharing a "conversation" id reuse
+#                                     Ollama's context instead of re-sending the history
+#   POST   /chain                     {"templates": [...], "input"}
+#   POST   /search                    {"query", "top_k"?, "mode"?="hybrid"|"vector"|"lexical",
+#                                      "collections"?, "source"?, "file_types"?, "since"?, "until"?}
+#   POST   /search/many               {"queries": [...], "top_k"?, "mode"?, filters as above} -> hits per query
+#   POST   /import                    {"path", "collection"?}
+#   POST   /images                    {"prompts": [...], "seeds"?, "priority"?} -> {"job_id", "cached"}
+#   GET    /images/{job_id}           job status, results and progress
+#   DELETE /images/{job_id}           cancel
+#
+# Every backend (ollama, search) has its own concurrency limit and bounded wait queue; requests
+# beyond the queue get 429 instead of piling up. One ModelLoader, one LocalSearchManager (embedder)
+# and one image-queue client are shared by all requests, so they stay warm between calls.
+
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from aiohttp import web
+from requests.adapters import HTTPAdapter
+
+from core.utils import telemetry
+from core.utils.local_search_manager import SEARCH_MODES
+
+SEARCH_FILTERS = ("collections", "source", "file_types", "since", "until")
+
+
+class BackendLimiter:
+    """Caps concurrent work for one backend and rejects requests once `max_queue` are waiting."""
+    def __init__(self, name: str, concurrency: int, max_queue: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f"serve-{name}")
+        self.waiting = 0
+        self.running = 0
+        self.rejected = 0
+        self.completed = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise web.HTTPTooManyRequests(text=json.dumps({"error": f"{self.name} queue is full"}),
+                                          content_type="application/json")
+        self.waiting += 1
+        queued_at = time.perf_counter()
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        telemetry.record(f"serve.{self.name}.queue_wait", (time.perf_counter() - queued_at) * 1000.0, "ms")
+        self.running += 1
+        try:
+            yield self.executor
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self.semaphore.release()
+
+    async def run(self, func, *args):
+        async with self.slot() as executor:
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+    def stats(self) -> dict:
+        return {"concurrency": self.concurrency, "running": self.running, "waiting": self.waiting,
+                "max_queue": self.max_queue, "completed": self.completed, "rejected": self.rejected}
+
+
+class ForgeServer:
+    def __init__(self, config_path: str = "config.json", ollama_url: str | None = None,
+                 ollama_concurrency: int = 2, search_concurrency: int = 1, max_queue: int = 64,
+                 warm: bool = True, watch: bool = False):
+        from model_loader import ModelLoader
+
+        self.model_loader = ModelLoader(config_path=config_path)
+        if ollama_url:
+            self.model_loader.ollama_url = ollama_url.rstrip("/")
+        self.model_loader.session.mount("http://", HTTPAdapter(pool_maxsize=max(ollama_concurrency, 10)))
+        self.limits = {"ollama": (ollama_concurrency, max_queue), "search": (search_concurrency, max_queue)}
+        self.limiters = {}
+        self.warm = warm
+        self.watch = watch
+        self.watcher = None
+        self._search_manager = None
+        self._image_plugin = None
+        self._lazy_lock = threading.Lock()
+
+    # ── Shared backends ─────────────────────────────────
+    def search_manager(self):
+        with self._lazy_lock:
+            if self._search_manager is None:
+                from core.utils.local_search_manager import LocalSearchManager
+                with telemetry.span("serve.load_search"):
+                    settings = self.model_loader.config.get("search", {})
+                    self._search_manager = LocalSearchManager(storage=settings.get("storage", "float32"),
+                                                              embedder_settings=settings.get("embedder"))
+            return self._search_manager
+
+    def image_plugin(self):
+        with self._lazy_lock:
+            if self._image_plugin is None:
+                # the client only talks to the SQLite job queue; the worker process owns the pipelines
+                from plugins.image_gen.plugin import Plugin
+                self._image_plugin = Plugin()
+            return self._image_plugin
+
+    def _warm_search(self):
+        try:
+            self.search_manager().embedder  # the sentence-transformer loads lazily
+        except Exception as e:
+            print(f"⚠️ [Server] Search backend unavailable: {e}")
+
+    def _start_watcher(self):
+        from core.utils.folder_watcher import start_watcher
+
+        settings = dict(self.model_loader.config.get("search", {}).get("watch") or {}, enabled=True)
+        self.watcher = start_watcher(self.search_manager(), settings)
+
+    async def on_startup(self, app):
+        self.limiters = {name: BackendLimiter(name, c, q) for name, (c, q) in self.limits.items()}
+        if self.warm:
+            loop = asyncio.get_running_loop()
+            loop.run_in_executor(None, self.model_loader.warm_connection)
+            self.model_loader.warm_model_async()
+            loop.run_in_executor(None, self._warm_search)
+        if self.watch:
+            asyncio.get_running_loop().run_in_executor(None, self._start_watcher)
+
+    async def on_cleanup(self, app):
+        if self.watcher is not None:
+            self.watcher.stop()
+        for limiter in self.limiters.values():
+            limiter.executor.shutdown(wait=False, cancel_futures=True)
+        if self._search_manager is not None:
+            self._search_manager.close()
+
+    # ── Handlers ────────────────────────────────────────
+    @staticmethod
+    async def read_json(request) -> dict:
+        try:
+            body = await request.json()
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise web.HTTPBadRequest(text=json.dumps({"error": "body must be JSON"}), content_type="application/json")
+        if not isinstance(body, dict):
+            raise web.HTTPBadRequest(text=json.dumps({"error": "body must be a JSON object"}), content_type="application/json")
+        return body
+
+    async def health(self, request):
+        running = await asyncio.get_running_loop().run_in_executor(None, self.model_loader.is_ollama_running)
+        return web.json_response({"ok": True, "ollama": running})
+
+    async def models(self, request):
+        loop = asyncio.get_running_loop()
+        refresh = request.query.get("refresh") in ("1", "true")
+        installed = await loop.run_in_executor(None, self.model_loader.catalogue, refresh)
+        running = await loop.run_in_executor(None, self.model_loader.running_models)
+        return web.json_response({"models": installed, "running": running,
+                                  "keep_alive": self.model_loader.keep_alive()})
+
+    async def stats(self, request):
+        return web.json_response({
+            "backends": {name: limiter.stats() for name, limiter in self.limiters.items()},
+            "telemetry": telemetry.summary(),
+            "watcher": self.watcher.stats() if self.watcher is not None else None,
+        })
+
+    def _prompt(self, body: dict) -> str:
+        prompt = body.get("prompt", "")
+        if body.get("template"):
+            from prompt_tools import apply_template, load_prompt_template
+            prompt = apply_template(load_prompt_template(body["template"]), prompt)
+        return prompt
+
+    async def generate(self, request):
+        body = await self.read_json(request)
+        if not body.get("prompt"):
+            raise web.HTTPBadRequest(text=json.dumps({"error": "prompt is required"}), content_type="application/json")
+        prompt, model, conversation = self._prompt(body), body.get("model"), body.get("conversation")
+        limiter = self.limiters["ollama"]
+
+        if not body.get("stream", True):
+            reply = await limiter.run(lambda: self.model_loader.generate_once(
+                prompt, model_name=model, conversation_id=conversation))
+            return web.json_response(reply)
+
+        async with limiter.slot() as executor:
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+            await response.prepare(request)
+            loop = asyncio.get_running_loop()
+            chunks = asyncio.Queue()
+            stop = threading.Event()
+            stats = {}
+
+            def pump():
+                try:
+                    stream = self.model_loader.generate_with_ollama_stream(
+                        prompt, model_name=model, conversation_id=conversation, stats=stats)
+                    for chunk in stream:
+                        if stop.is_set():
+                            break  # client went away; closing the generator closes the Ollama stream
+                        loop.call_soon_threadsafe(chunks.put_nowait, ("token", chunk))
+                except Exception as e:
+                    loop.call_soon_threadsafe(chunks.put_nowait, ("error", str(e)))
+                finally:
+                    loop.call_soon_threadsafe(chunks.put_nowait, ("end", None))
+
+            start = time.perf_counter()
+            ttft, chars = None, 0
+            pumping = loop.run_in_executor(executor, pump)
+            try:
+                while True:
+                    kind, value = await chunks.get()
+                    if kind == "end":
+                        break
+                    if kind == "token":
+                        if not value:
+                            continue
+                        ttft = ttft if ttft is not None else time.perf_counter() - start
+                        chars += len(value)
+                        await response.write(f"event: token\ndata: {json.dumps({'text': value})}\n\n".encode())
+                    else:
+                        await response.write(f"event: error\ndata: {json.dumps({'error': value})}\n\n".encode())
+                done = {"chars": chars, "ttft_sec": ttft, "wall_sec": time.perf_counter() - start, **stats}
+                await response.write(f"event: done\ndata: {json.dumps(done)}\n\n".encode())
+            except (ConnectionResetError, asyncio.CancelledError):
+                stop.set()
+                raise
+            finally:
+                # hold the slot until the worker thread is really free
+                stop.set()
+                await asyncio.shield(pumping)
+            await response.write_eof()
+            return response
+
+    async def chain(self, request):
+        from prompt_tools import run_chain
+
+        body = await self.read_json(request)
+        templates, user_input = body.get("templates") or [], body.get("input", "")
+        try:
+            steps = await self.limiters["ollama"].run(run_chain, templates, user_input, self.model_loader)
+        except ValueError as e:
+            return web.json_response({"error": str(e)}, status=400)
+        return web.json_response({"steps": [{"template": n, "prompt": p, "response": r} for n, p, r in steps]})
+
+    def _search_args(self, body):
+        top_k, mode = int(body.get("top_k", 3)), body.get("mode", "hybrid")
+        if mode not in SEARCH_MODES:
+            raise web.HTTPBadRequest(text=json.dumps({"error": f"mode must be one of {', '.join(SEARCH_MODES)}"}),
+                                     content_type="application/json")
+        filters = {key: body[key] for key in SEARCH_FILTERS if key in body}
+        return top_k, mode, filters
+
+    async def search(self, request):
+        body = await self.read_json(request)
+        query = body.get("query", "")
+        top_k, mode, filters = self._search_args(body)
+        results = await self.limiters["search"].run(
+            lambda: self.search_manager().search(query, top_k=top_k, mode=mode, **filters))
+        return web.json_response({"results": results})
+
+    async def search_many(self, request):
+        body = await self.read_json(request)
+        queries = body.get("queries") or []
+        top_k, mode, filters = self._search_args(body)
+        try:
+            hits = await self.limiters["search"].run(
+                lambda: self.search_manager().search_many(queries, top_k=top_k, mode=mode, **filters))
+        except ValueError as e:
+            return web.json_response({"error": str(e)}, status=400)
+        return web.json_response({"results": hits})
+
+    async def import_document(self, request):
+        body = await self.read_json(request)
+        try:
+            path = await self.limiters["search"].run(lambda: self.search_manager().import_document(
+                body.get("path", ""), collection=body.get("collection", "default")))
+        except (FileNotFoundError, RuntimeError, ValueError) as e:
+            return web.json_response({"error": str(e)}, status=400)
+        return web.json_response({"imported": path})
+
+    async def submit_image(self, request):
+        body = await self.read_json(request)
+        prompts = body.get("prompts") or ([body["prompt"]] if body.get("prompt") else [])
+        if not prompts:
+            raise web.HTTPBadRequest(text=json.dumps({"error": "prompts are required"}), content_type="application/json")
+        loop = asyncio.get_running_loop()
+        plugin = await loop.run_in_executor(None, self.image_plugin)
+        job_id, cached = await loop.run_in_executor(
+            None, lambda: plugin.submit(prompts, body.get("seeds"), int(body.get("priority", 0))))
+        return web.json_response({"job_id": job_id, "cached": cached}, status=202)
+
+    async def image_status(self, request):
+        plugin = await asyncio.get_running_loop().run_in_executor(None, self.image_plugin)
+        job = plugin.get_status(int(request.match_info["job_id"]))
+        if job is None:
+            raise web.HTTPNotFound(text=json.dumps({"error": "no such job"}), content_type="application/json")
+        return web.json_response(job)
+
+    async def cancel_image(self, request):
+        plugin = await asyncio.get_running_loop().run_in_executor(None, self.image_plugin)
+        plugin.cancel(int(request.match_info["job_id"]))
+        return web.json_response({"cancelling": True})
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=8 * 1024 ** 2)
+        app.on_startup.append(self.on_startup)
+        app.on_cleanup.append(self.on_cleanup)
+        app.router.add_get("/health", self.health)
+        app.router.add_get("/stats", self.stats)
+        app.router.add_get("/models", self.models)
+        app.router.add_post("/generate", self.generate)
+        app.router.add_post("/chain", self.chain)
+        app.router.add_post("/search", self.search)
+        app.router.add_post("/search/many", self.search_many)
+        app.router.add_post("/import", self.import_document)
+        app.router.add_post("/images", self.submit_image)
+        app.router.add_get("/images/{job_id:\\d+}", self.image_status)
+        app.router.add_delete("/images/{job_id:\\d+}", self.cancel_image)
+        return app
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, **kwargs):
+    server = ForgeServer(**kwargs)
+    print(f"🌐 AI Forge API on http://{host}:{port}")
+    web.run_app(server.app(), host=host, port=port, print=None)
@@ -1,6 +1,10 @@
 import sys
+import os
+import io
+import base64
 import json
-import re
+import threading
+import uuid
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
 from PyQt6.QtGui import QIcon
 from PyQt6.QtWidgets import (
@@ -25,19 +29,33 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 import webbrowser
 from model_loader import ModelLoader
-import markdown2
-from pygments import highlight
-from pygments.lexers import guess_lexer, get_lexer_by_name
-from pygments.formatters import HtmlFormatter
 from PyQt6.QtWebEngineCore import QWebEnginePage
 from db import init_db
-from hardware_profile import get_system_profile, get_tuned_generation_settings
+from hardware_profile import needs_tuning, ensure_tuned
 from prompt_tools import load_templates, apply_template, chain_prompts, update_template_selector_state, load_prompt_template, save_prompt_template, chain_prompts
 from local_hf_runner import HFRunner, HF_MODEL_MAP
 from core.plugin_loader import load_plugins
 from plugins.image_gen.settings_dialog import ImageGenSettingsDialog
 from core.utils.local_search_manager import LocalSearchManager
+from core.utils.folder_watcher import start_watcher
 from core.utils.file_importer import run_import_dialog
+from core.utils import telemetry
+from core.utils.rendering import render_markdown, response_block, page_html, turn_footer
+
+IMAGE_PROMPT_SEPARATOR = "---"
+
+
+def split_image_prompts(text: str) -> list[str]:
+    """Splits the prompt box into image prompts on lines holding only IMAGE_PROMPT_SEPARATOR."""
+    prompts, current = [], []
+    for line in text.splitlines():
+        if line.strip() == IMAGE_PROMPT_SEPARATOR:
+            prompts.append("\n".join(current).strip())
+            current = []
+        else:
+            current.append(line)
+    prompts.append("\n".join(current).strip())
+    return [p for p in prompts if p]
 
 
 
@@ -53,16 +71,31 @@ class GenerationThread(QThread):
     result_ready = pyqtSignal(str)
     finished = pyqtSignal(str)
 
-    def __init__(self, model_loader, prompt):
+    def __init__(self, model_loader, prompt, plugins=None, conversation_id=None):
         super().__init__()
         self.model_loader = model_loader
         self.prompt = prompt
+        self.plugins = plugins
+        self.conversation_id = conversation_id
+        self.stats = {}  # filled from Ollama's final message once the stream completes
+
+    def run_pre_proc(self):
+        """Runs pre_proc plugins (e.g. retrieval) while the Ollama connection is being opened."""
+        if self.plugins is None:
+            self.model_loader.warm_connection()
+            return self.prompt
+        pending = self.plugins.submit_stage("pre_proc", {"prompt": self.prompt, "original_prompt": self.prompt})
+        self.model_loader.warm_connection()
+        return pending.result().get("prompt", self.prompt)
 
     def run(self):
         try:
             backend = self.model_loader.config["default_model"]["type"]
             if backend == "ollama":
-                for chunk in self.model_loader.generate_with_ollama_stream(self.prompt):
+                prompt = self.run_pre_proc()
+                stream = self.model_loader.generate_with_ollama_stream(
+                    prompt, conversation_id=self.conversation_id, stats=self.stats)
+                for chunk in stream:
                     self.result_ready.emit(chunk)
                 self.finished.emit(self.prompt)
             else:
@@ -77,11 +110,72 @@ class GenerationThread(QThread):
 
 
 
+class ImageGenerationThread(QThread):
+    image_ready = pyqtSignal(dict)
+    preview_ready = pyqtSignal(dict)
+    finished = pyqtSignal(dict)
+
+    def __init__(self, plugin, prompts):
+        super().__init__()
+        from plugins.image_gen.custom_pipelines.step_hooks import CancelToken
+
+        self.plugin = plugin
+        self.prompts = prompts
+        self.cancel_token = CancelToken()
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def emit_preview(self, preview):
+        # encode off the UI thread; the view just swaps in a data URI
+        buffer = io.BytesIO()
+        preview["image"].save(buffer, format="PNG")
+        data = base64.b64encode(buffer.getvalue()).decode("ascii")
+        self.preview_ready.emit({
+            "step": preview["step"],
+            "total_steps": preview["total_steps"],
+            "data_uri": f"data:image/png;base64,{data}",
+        })
+
+    def run(self):
+        try:
+            result = self.plugin.run({
+                "prompts": self.prompts,
+                "original_prompt": self.prompts[0],
+                "on_image": self.image_ready.emit,
+                "on_preview": self.emit_preview,
+                "cancel_token": self.cancel_token,
+            })
+        except Exception as e:
+            result = {"error": f"Image generation failed: {e}"}
+        if "error" not in result and "images" not in result:
+            # plugins without streaming support still hand back a single image
+            self.image_ready.emit(result)
+        self.finished.emit(result)
+
+
+class BenchmarkThread(QThread):
+    finished = pyqtSignal(dict)
+
+    def __init__(self, model_loader, parent=None):
+        super().__init__(parent)
+        self.model_loader = model_loader
+
+    def run(self):
+        try:
+            # the app's own loader: results land in the shared config without re-reading config.json
+            result = self.model_loader.run_performance_test()
+        except Exception as e:
+            result = {"error": str(e)}
+        self.finished.emit(result)
+
+
 class SettingsDialog(QDialog):
-    def __init__(self, parent, config):
+    def __init__(self, parent, model_loader):
         super().__init__(parent)
         self.setWindowTitle("Model Settings")
-        self.config = config
+        self.model_loader = model_loader
+        self.config = model_loader.config
         self.resize(400, 200)
 
         tabs = QTabWidget()
@@ -113,11 +207,7 @@ class SettingsDialog(QDialog):
         performance_layout.addWidget(self.benchmark_button)
 
         last_benchmark = self.config.get("performance", {}).get("last_benchmark", {})
-        cpu_time = last_benchmark.get("cpu", "Not run")
-        gpu_time = last_benchmark.get("gpu", "Not run")
-        self.benchmark_result = QLabel(
-            f"Last CPU: {cpu_time} sec | GPU: {gpu_time} sec"
-        )
+        self.benchmark_result = QLabel(self.format_benchmark(last_benchmark))
         performance_layout.addWidget(self.benchmark_result)
 
         performance_tab.setLayout(performance_layout)
@@ -132,7 +222,7 @@ class SettingsDialog(QDialog):
         self.temp_box = QSpinBox()
         self.temp_box.setRange(0, 100)
         self.temp_box.setValue(
-            int(config.get("generation", {}).get("temperature", 0.7) * 100)
+            int(self.config.get("generation", {}).get("temperature", 0.7) * 100)
         )
         temp_row.addWidget(temp_label)
         temp_row.addWidget(self.temp_box)
@@ -145,7 +235,7 @@ class SettingsDialog(QDialog):
         )
         self.token_box = QSpinBox()
         self.token_box.setRange(32, 2048)
-        self.token_box.setValue(config.get("generation", {}).get("max_tokens", 512))
+        self.token_box.setValue(self.config.get("generation", {}).get("max_tokens", 512))
         token_row.addWidget(token_label)
         token_row.addWidget(self.token_box)
 
@@ -168,12 +258,22 @@ class SettingsDialog(QDialog):
 
         self.setLayout(main_layout)
 
+    @staticmethod
+    def format_benchmark(last_benchmark):
+        cpu_time = last_benchmark.get("cpu") or "Not run"
+        gpu_time = last_benchmark.get("gpu") or "Not run"
+        rates = last_benchmark.get("tokens_per_sec", {})
+        text = f"Last CPU: {cpu_time} sec | GPU: {gpu_time} sec"
+        if rates.get("cpu") or rates.get("gpu"):
+            text += f"\nCPU: {rates.get('cpu')} tok/s | GPU: {rates.get('gpu')} tok/s"
+        return text
+
     def save_settings(self):
-        self.config.setdefault("generation", {})
-        self.config["generation"]["temperature"] = self.temp_box.value() / 100
-        self.config["generation"]["max_tokens"] = self.token_box.value()
-        self.config.setdefault("performance", {})
-        self.config["performance"]["backend"] = self.backend_selector.currentText()
+        self.model_loader.config_store.update({
+            "generation.temperature": self.temp_box.value() / 100,
+            "generation.max_tokens": self.token_box.value(),
+            "performance.backend": self.backend_selector.currentText(),
+        })
         self.accept()
 
     def reset_to_defaults(self):
@@ -184,87 +284,77 @@ class SettingsDialog(QDialog):
         )
 
     def run_benchmark(self):
-        sample_prompt = "Tell me a fantasy story about a lost sword in a cursed forest."
-
         self.benchmark_button.setEnabled(False)
         self.benchmark_button.setText("🔄 Running Benchmark...")
-        QApplication.processEvents()
-
-        from model_loader import ModelLoader
-
-        loader = ModelLoader()
-        times = loader.run_performance_test()
+        # the suite streams several generations per variant; keep it off the UI thread. Parented to
+        # the main window so closing the dialog mid-run doesn't destroy a running thread.
+        self.benchmark_thread = BenchmarkThread(self.model_loader, self.parent())
+        self.benchmark_thread.finished.connect(self.on_benchmark_finished)
+        self.benchmark_thread.finished.connect(self.benchmark_thread.deleteLater)
+        self.benchmark_thread.start()
+
+    def on_benchmark_finished(self, times):
+        self.benchmark_button.setEnabled(True)
+        self.benchmark_button.setText("Run Benchmark")
+        if "error" in times:
+            QMessageBox.warning(self, "Benchmark Failed", f"⚠️ {times['error']}")
+            return
 
         cpu_time = times.get("cpu", "Error")
         gpu_time = times.get("gpu", "Error")
+        rates = times.get("tokens_per_sec", {})
 
-        # determine best backend based on timing
-        if isinstance(cpu_time, (int, float)) and isinstance(gpu_time, (int, float)):
+        # determine best backend based on measured throughput, then timing
+        if rates.get("cpu") and rates.get("gpu"):
+            best = "gpu" if rates["gpu"] > rates["cpu"] else "cpu"
+        elif isinstance(cpu_time, (int, float)) and isinstance(gpu_time, (int, float)):
             best = "gpu" if gpu_time < cpu_time else "cpu"
         elif isinstance(gpu_time, (int, float)):
             best = "gpu"
         else:
             best = "cpu"
 
-        self.config["performance"]["last_benchmark"] = times
-        self.benchmark_result.setText(f"Last CPU: {cpu_time} sec | GPU: {gpu_time} sec")
+        self.benchmark_result.setText(self.format_benchmark(times))
 
         reply = QMessageBox.question(
             self,
             "Apply Best Performance Setting?",
             f"Benchmark complete.\n\n"
-            f"CPU: {cpu_time} sec\nGPU: {gpu_time} sec\n\n"
+            f"CPU: {cpu_time} sec ({rates.get('cpu')} tok/s)\n"
+            f"GPU: {gpu_time} sec ({rates.get('gpu')} tok/s)\n\n"
             f"Use {best.upper()} for best performance?",
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
         )
 
         if reply == QMessageBox.StandardButton.Yes:
-            self.config["performance"]["backend"] = best
-            from hardware_profile import get_system_profile, get_tuned_generation_settings
-            profile = get_system_profile()
-            recommended = get_tuned_generation_settings(profile)
-            self.config.setdefault("generation", {})
-            self.config["generation"]["temperature"] = recommended["temperature"]
-            self.config["generation"]["max_tokens"] = recommended["max_tokens"]
-            if hasattr(self.parent(), "model_loader"):
-                self.parent().model_loader.config["generation"]["temperature"] = recommended["temperature"]
-                self.parent().model_loader.config["generation"]["max_tokens"] = recommended["max_tokens"]
-            
-            self.temp_box.setValue(int(recommended["temperature"] * 100))
-            self.token_box.setValue(recommended["max_tokens"])
-
+            # only the backend and the knobs the benchmark measured; temperature and max tokens are the user's
+            changes = {"performance.backend": best}
+            if best == "cpu" and times.get("num_thread"):
+                changes["performance.num_thread"] = times["num_thread"]
+            self.model_loader.config_store.update(changes)
+            self.backend_selector.setCurrentText(best)
+
+            threads = f" with {changes['performance.num_thread']} threads" if "performance.num_thread" in changes else ""
             QMessageBox.information(
                 self,
-                "Backend & Settings Applied",
-                f"Processing will now use {best.upper()}.\n"
-                f"Settings updated: Temperature = {recommended['temperature']}, Max Tokens = {recommended['max_tokens']}"
+                "Backend Applied",
+                f"Processing will now use {best.upper()}{threads}."
             )
-            loader.config = self.config
-            loader.save_config()
-            if hasattr(self.parent(), "update_model_display"):
-                model_name = self.config.get("default_model", {}).get("model_name", "Unknown")
-                self.parent().update_model_display(model_name)
-        self.benchmark_button.setEnabled(True)
-        self.benchmark_button.setText("Run Benchmark")
 
 
 class AIForgeUI(QWidget):
+    config_changed = pyqtSignal(object)  # config keys changed, delivered on the UI thread
+
     def __init__(self):
         super().__init__()
         print("👷‍♂️ AIForgeUI.__init__() starting...")
 
-        # Load plugins early
-        from core.plugin_loader import load_plugins
+        # Discover plugins from their manifests; each one is imported on first use.
+        # Enabled state comes from plugin_state.json.
         print("🔌 Calling load_plugins()...")
-        self.plugins = load_plugins()
-        print(f"🔌 Plugins loaded: {len(self.plugins)}")
-
-        # Start with all plugins disabled; user will toggle them in the sidebar
-        self.enabled_plugins = {plugin.get_name(): False for plugin in self.plugins}
-
-        # Local search manager and mode flags
-        self.local_search_manager = LocalSearchManager()
-        
+        with telemetry.span("startup.load_plugins"):
+            self.plugins = load_plugins()
+        print(f"🔌 Plugins discovered: {len(self.plugins)}")
 
         # Window setup
         self.setWindowTitle("AI Forge")
@@ -273,20 +363,39 @@ class AIForgeUI(QWidget):
 
         # Model loader & HF runner
         self.model_loader = ModelLoader()
-        self.model_loader.load_model()
+        telemetry.configure(self.model_loader.config.get("telemetry"))
+        with telemetry.span("startup.load_model"):
+            self.model_loader.load_model()
+        # Load the default Ollama model in the background so the first prompt doesn't pay for it
+        if self.model_loader.config["default_model"].get("type") == "ollama":
+            self.model_loader.warm_model_async()
         self.hf_runner = HFRunner()
-        self.backend_used = self.model_loader.config["performance"].get("backend", "cpu")
 
-        # Tune generation settings based on hardware
-        profile = get_system_profile()
-        recommended = get_tuned_generation_settings(profile)
-        self.model_loader.config.setdefault("generation", {})
-        self.model_loader.config["generation"]["temperature"] = recommended["temperature"]
-        self.model_loader.config["generation"]["max_tokens"] = recommended["max_tokens"]
-        self.model_loader.save_config()
+        # Local search manager; "search.storage" picks the in-memory embedding codes and
+        # "search.embedder" the embedding backend (see core/utils/embedders.py)
+        search_settings = self.model_loader.config.get("search", {})
+        with telemetry.span("startup.local_search"):
+            self.local_search_manager = LocalSearchManager(
+                storage=search_settings.get("storage", "float32"),
+                embedder_settings=search_settings.get("embedder"))
+        # Index plugins/local_search/docs and any "search.watch.folders" in the background
+        self.folder_watcher = start_watcher(self.local_search_manager, search_settings.get("watch"))
+        self.backend_used = self.model_loader.config["performance"].get("backend", "cpu")
 
-        # Conversation history and theme
+        # Autotune performance knobs once per hardware fingerprint (runs off the UI thread)
+        if needs_tuning():
+            model_name = self.model_loader.config["default_model"].get("model_name", "mistral")
+            threading.Thread(
+                target=ensure_tuned,
+                args=(model_name,),
+                kwargs={"probe": self.model_loader.is_ollama_running()},
+                daemon=True,
+            ).start()
+
+        # Conversation history and theme; Ollama's context is reused across turns of one conversation
         self.history = []
+        self.conversation_id = uuid.uuid4().hex
+        self.last_turn_generated = False
         self.ui_color = self.model_loader.config.get("ui_color", "#009EEB")
 
         # Build the UI and apply theming
@@ -350,6 +459,10 @@ class AIForgeUI(QWidget):
 
         self.sidebar.addWidget(self.import_button)
 
+        self.performance_button = QPushButton("📈 Performance")
+        self.performance_button.clicked.connect(self.show_performance_panel)
+        self.sidebar.addWidget(self.performance_button)
+
         self.sidebar.addSpacing(10)
 
         # Prompt Template
@@ -451,6 +564,9 @@ class AIForgeUI(QWidget):
         button_row.addWidget(self.search_files_button)
 
         self.image_gen_button = QPushButton("🎨 Generate Image")
+        self.image_gen_button.setToolTip(
+            f"Generates from the whole prompt. To batch several prompts, separate them with a line containing only {IMAGE_PROMPT_SEPARATOR}."
+        )
         self.image_gen_button.clicked.connect(self.handle_image_gen)
         button_row.addWidget(self.image_gen_button)
 
@@ -459,6 +575,8 @@ class AIForgeUI(QWidget):
         
         self.model_display = QLabel()
         self.update_model_display(current)
+        self.config_changed.connect(self.on_config_changed)
+        self.model_loader.config_store.subscribe(self.config_changed.emit)
         button_row.addWidget(self.model_display)
         content_area.addLayout(button_row)
         self.prompt_input = QTextEdit()
@@ -537,11 +655,12 @@ class AIForgeUI(QWidget):
         )
 
     def on_model_changed(self, new_model):
-        current_model = self.model_loader.config["default_model"].get("model_name")
+        # no-op when unchanged; otherwise written with any other change made in the same moment
+        self.model_loader.config_store.set("default_model.model_name", new_model)
 
-        if new_model != current_model:
-            self.model_loader.config["default_model"]["model_name"] = new_model
-            self.model_loader.save_config()
+        # start loading the new Ollama model now; handle_generate will find it resident
+        if new_model and new_model not in HF_MODEL_MAP:
+            self.model_loader.warm_model_async(new_model)
 
         self.update_model_display(new_model)
 
@@ -561,9 +680,8 @@ class AIForgeUI(QWidget):
         return super().eventFilter(source, event)
 
     def open_settings(self):
-        dialog = SettingsDialog(self, self.model_loader.config)
+        dialog = SettingsDialog(self, self.model_loader)
         if dialog.exec():
-            self.model_loader.save_config()
             self.apply_theme_color()
 
     def save_prompt_as_template(self):
@@ -652,24 +770,24 @@ class AIForgeUI(QWidget):
         dropdown_model = self.model_selector.currentText()
 
         if dropdown_model in HF_MODEL_MAP:
-            self.model_loader.config["default_model"]["type"] = "huggingface"
-            self.model_loader.config["default_model"]["model_name"] = HF_MODEL_MAP[dropdown_model]
-            self.model_loader.save_config()
+            self.model_loader.config_store.update({
+                "default_model.type": "huggingface",
+                "default_model.model_name": HF_MODEL_MAP[dropdown_model],
+            })
             self.hf_runner = HFRunner(HF_MODEL_MAP[dropdown_model])
             result = self.hf_runner.generate(prompt)
             self.display_result(prompt, result)
             return
 
-        current_cfg = self.model_loader.config["default_model"].get("model_name")
-        if dropdown_model != current_cfg:
-            self.model_loader.config["default_model"]["model_name"] = dropdown_model
-            self.model_loader.config["default_model"]["type"] = "ollama"
-            self.model_loader.save_config()
+        self.model_loader.config_store.update({
+            "default_model.model_name": dropdown_model,
+            "default_model.type": "ollama",
+        })
 
         self.update_model_display(dropdown_model)
 
         self.generated_text = ""
-        self.thread = GenerationThread(self.model_loader, prompt)
+        self.thread = GenerationThread(self.model_loader, prompt, self.plugins, self.conversation_id)
         self.thread.result_ready.connect(self.append_stream_chunk)
         self.thread.finished.connect(self.finish_stream)
         self.thread.start()
@@ -703,97 +821,64 @@ class AIForgeUI(QWidget):
         self.generated_text += chunk
 
     def finish_stream(self, prompt):
-        self.display_result(prompt, self.generated_text)
-
-    def display_result(self, prompt: str, result: str):
+        stats = self.thread.stats
+        turn = None
+        if stats:
+            state = self.model_loader.conversation(self.conversation_id)
+            turn = {"conversation_id": self.conversation_id, "model": state["model"],
+                    "context": state["context"], "stats": stats}
+        self.display_result(prompt, self.generated_text, turn)
+
+    def display_result(self, prompt: str, result: str, turn: dict | None = None):
         from PyQt6.QtCore import QUrl
-        from pygments.formatters import HtmlFormatter
-        from db import get_connection
+        from db import save_turn
 
         plugin_input = {
             "text": result,
             "original_prompt": prompt  # ✅ Needed for keyword detection in plugins
         }
 
-        # 🔌 Run plugin pipeline
-        for plugin in self.plugins:
-            name = plugin.get_name()
-            if self.enabled_plugins.get(name, True):
-                try:
-                    if plugin.plugin_type() == "post_proc":
-                        plugin_input = plugin.run(plugin_input)
-                    elif plugin.plugin_type() == "image_gen" and prompt.lower().startswith("image:"):
-                        plugin.run(plugin_input)
-                except Exception as e:
-                    print(f"[Plugin Error] {name}: {e}")
+        # 🔌 Run enabled post_proc plugins whose manifest triggers match the prompt
+        plugin_input = self.plugins.run_stage("post_proc", plugin_input)
 
         result = plugin_input.get("text", result)
 
         # 📄 Convert to HTML
-        raw_html = markdown2.markdown(
-            result, extras=["fenced-code-blocks", "break-on-newline", "code-friendly"]
-        )
-
-        highlighted = self.highlight_code_blocks(raw_html)
-        block = f"""
-        <div class="ai-output">
-            <b style="color:#ff79c6;">Prompt:</b><br><i>{prompt}</i><hr>
-            <b style="color:#8be9fd;">Response:</b><br>{highlighted}
-            <hr><br>
-        </div>
-        """
+        with telemetry.span("ui.render_markdown", chars=len(result)):
+            highlighted = render_markdown(result)
+        block = response_block(prompt, highlighted, turn_footer(turn and turn["stats"]))
 
         if not hasattr(self, "html_history"):
             self.html_history = ""
 
         self.html_history += block
-        html = f"""
-        <html>
-        <head>
-        <style>
-            .highlight {{
-                background-color: #282a36;
-                padding: 12px;
-                border-radius: 6px;
-                overflow-x: auto;
-            }}
-            pre, code {{
-                font-family: Consolas, monospace;
-                font-size: 14px;
-                white-space: pre-wrap;
-                background: none;
-            }}
-            b, i {{
-                color: #bd93f9;
-            }}
-            hr {{
-                border: 0;
-                height: 1px;
-                background: #444;
-            }}
-        </style>
-        </head>
-        <body style="background-color: #1a1a2e; color: #f0f0f0; font-family: Consolas, monospace;">
-            {self.html_history}
-        </body>
-        </html>
-        """
+        html = page_html(self.html_history)
 
         self.output_box.setHtml(html, baseUrl=QUrl("about:blank"))
         self.history.append((prompt, result))
         self.history_list.addItem(prompt[:40] + "...")
 
-        with get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO history (prompt, response) VALUES (?, ?)", (prompt, result)
-            )
-            conn.commit()
+        self.last_turn_generated = turn is not None
+        with telemetry.span("db.write_history"):
+            save_turn(prompt, result, **(turn or {}))
 
         self.generate_button.setEnabled(True)
         self.output_box.page().runJavaScript("window.scrollTo(0, document.body.scrollHeight);")
 
 
+    def show_performance_panel(self):
+        from core.utils.performance_panel import PerformancePanel
+
+        if getattr(self, "performance_panel", None) is None:
+            self.performance_panel = PerformancePanel(self)
+        self.performance_panel.show()
+        self.performance_panel.raise_()
+        self.performance_panel.refresh()
+
+    def on_config_changed(self, keys):
+        if {"performance.backend", "performance.last_benchmark", "default_model.model_name"} & set(keys):
+            self.update_model_display(self.model_loader.config["default_model"].get("model_name"))
+
     def update_model_display(self, model_name):
         backend = self.model_loader.config["performance"].get("backend", "cpu")
 
@@ -805,9 +890,16 @@ class AIForgeUI(QWidget):
             f"<b>Processing with:</b> <span style='color:#56F1FF;'>{backend.upper()}</span>"
         )
 
+    def new_conversation(self):
+        """The next prompt starts without any earlier turns in the model's context."""
+        self.model_loader.forget_conversation(self.conversation_id)
+        self.conversation_id = uuid.uuid4().hex
+        self.last_turn_generated = False
+
     def clear_output(self):
         self.html_history = ""
         self.output_box.setHtml("")
+        self.new_conversation()
 
     def copy_output(self):
         clipboard = QApplication.clipboard()
@@ -817,6 +909,9 @@ class AIForgeUI(QWidget):
     def regenerate_last(self):
         if self.history:
             last_prompt, _ = self.history[-1]
+            if self.last_turn_generated:
+                # answer again from the context the last prompt started with, not the one it produced
+                self.model_loader.rewind_conversation(self.conversation_id)
             self.prompt_input.setPlainText(last_prompt)
             self.handle_generate()
 
@@ -836,12 +931,10 @@ class AIForgeUI(QWidget):
         if file_path:
             with open(file_path, "r", encoding="utf-8") as f:
                 self.history = json.load(f)
+            self.new_conversation()  # saved sessions hold text only, not the model's context
             self.history_list.clear()
             self.output_box.clear()
             for prompt, response in self.history:
-                html = markdown2.markdown(
-                    response, extras=["fenced-code-blocks", "break-on-newline"]
-                )
                 self.display_result(prompt, response)
                 self.history_list.addItem(prompt[:40] + "...")
             QMessageBox.information(self, "Loaded", "Session loaded successfully.")
@@ -880,20 +973,30 @@ class AIForgeUI(QWidget):
 
         print(f"[LocalSearch Triggered] Searching for: {prompt}")
 
-        try:
-            plugin = next(p for p in self.plugins if p.get_name() == "Local Document Search")
-        except StopIteration:
+        plugin = self.plugins.get("Local Document Search")
+        if plugin is None:
             QMessageBox.critical(self, "Search Plugin Missing", "Local Document Search plugin not found.")
             return
 
         plugin_input = {"text": "", "original_prompt": prompt}
-        output = plugin.run(plugin_input)
+        try:
+            output = plugin.run(plugin_input)
+        except Exception as e:
+            QMessageBox.warning(self, "Search Failed", str(e))
+            return
         result = output.get("text", "⚠️ No documents returned.")
 
         self.display_result(prompt, result)
 
 
     def handle_image_gen(self):
+        # while a run is active the button cancels it, whatever is in the prompt box
+        running = getattr(self, "image_thread", None)
+        if running is not None and running.isRunning():
+            running.cancel()
+            self.image_gen_button.setText("⏳ Cancelling...")
+            return
+
         prompt = self.prompt_input.toPlainText().strip()
         if not prompt:
             QMessageBox.warning(self, "Missing Prompt", "Please enter a description for your image.")
@@ -901,29 +1004,69 @@ class AIForgeUI(QWidget):
 
         print(f"[ImageGeneration Triggered] Generating image for: {prompt}")
 
-        try:
-            plugin = next(p for p in self.plugins if p.plugin_type() == "image_gen")
-        except StopIteration:
+        plugin = self.plugins.first_of_type("image_gen")
+        if plugin is None:
             QMessageBox.critical(self, "Image Plugin Missing", "Image Generation plugin not found.")
             return
 
-        plugin_input = {"original_prompt": prompt}
-        result = plugin.run(plugin_input)
-
-        if "error" in result:
-            QMessageBox.critical(self, "Image Error", result["error"])
-            return
+        # multi-line prompts stay one prompt; only an explicit separator line starts another,
+        # and each prompt is rendered with every seed in a single batched run
+        prompts = split_image_prompts(prompt)
+
+        self.image_gen_button.setText("⛔ Cancel Image")
+        self.image_gallery = []
+        self.image_preview = ""
+        self.image_thread = ImageGenerationThread(plugin, prompts)
+        self.image_thread.image_ready.connect(self.append_generated_image)
+        self.image_thread.preview_ready.connect(self.show_image_preview)
+        self.image_thread.finished.connect(self.finish_image_gen)
+        self.image_thread.start()
+
+    def show_image_preview(self, preview):
+        self.image_preview = (
+            f'<figure style="margin:0 0 12px 0;"><img src="{preview["data_uri"]}" '
+            f'style="width:100%;height:auto;image-rendering:pixelated;opacity:0.85;"/>'
+            f'<figcaption style="color:#bd93f9;font-family:Consolas,monospace;">'
+            f'Preview — step {preview["step"]}/{preview["total_steps"]}</figcaption></figure>'
+        )
+        self.render_image_gallery()
 
-        img_src = result.get("image_path") or result.get("url") or result.get("text")
-        if not img_src or not str(img_src).lower().endswith((".png", ".jpg", ".jpeg", ".gif")):
-            QMessageBox.critical(self, "Image Error", "Plugin didn’t return a valid image path or URL.")
-            return
+    def render_image_gallery(self):
+        from PyQt6.QtCore import QUrl
 
         html = f'''
         <html><body style="margin:0; background:#000;">
-            <img src="file:///{img_src}" style="width:100%;height:auto;"/>
+            {"".join(self.image_gallery)}{self.image_preview}
         </body></html>'''
-        self.output_box.setHtml(html)
+        self.output_box.setHtml(html, baseUrl=QUrl.fromLocalFile(os.getcwd() + os.sep))
+
+    def append_generated_image(self, image):
+        from PyQt6.QtCore import QUrl
+
+        img_src = image.get("image_path") or image.get("url")
+        if not img_src or not str(img_src).lower().endswith((".png", ".jpg", ".jpeg", ".gif")):
+            return
+
+        src = QUrl.fromLocalFile(img_src).toString() if os.path.exists(img_src) else img_src
+        self.image_gallery.append(
+            f'<figure style="margin:0 0 12px 0;"><img src="{src}" style="width:100%;height:auto;"/>'
+            f'<figcaption style="color:#8be9fd;font-family:Consolas,monospace;">'
+            f'{image.get("prompt", "")} (seed {image.get("seed", "?")})</figcaption></figure>'
+        )
+        self.image_preview = ""
+        self.render_image_gallery()
+
+    def finish_image_gen(self, result):
+        self.image_gen_button.setText("🎨 Generate Image")
+        self.image_preview = ""
+        if self.image_gallery:
+            self.render_image_gallery()
+        if result.get("cancelled"):
+            return
+        if "error" in result:
+            QMessageBox.critical(self, "Image Error", result["error"])
+        elif not self.image_gallery:
+            QMessageBox.critical(self, "Image Error", "Plugin didn’t return a valid image path or URL.")
 
 
 
@@ -933,34 +1076,6 @@ class AIForgeUI(QWidget):
         if 0 <= index < len(self.history):
             self.prompt_input.setPlainText(self.history[index][0])
 
-    def highlight_code_blocks(self, html_text):
-        code_block_pattern = re.compile(
-            r'<pre><code(?: class="language-(\w+)")?>(.*?)</code></pre>', re.DOTALL
-        )
-
-        def replacer(match):
-            lang = match.group(1) or "text"
-            code = match.group(2)
-
-            # unescape HTML
-            code = (
-                code.replace("&lt;", "<")
-                .replace("&gt;", ">")
-                .replace("&amp;", "&")
-                .replace("&quot;", '"')
-            )
-
-            try:
-                lexer = get_lexer_by_name(lang)
-            except Exception:
-                lexer = guess_lexer(code)
-
-            formatter = HtmlFormatter(noclasses=True, style="colorful", nowrap=True)
-            highlighted = highlight(code, lexer, formatter)
-            return f'<div class="highlight">{highlighted}</div>'
-
-        return code_block_pattern.sub(replacer, html_text)
-
 
 if __name__ == "__main__":
     init_db()
@@ -968,4 +1083,7 @@ if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = AIForgeUI()
     window.show()
-    sys.exit(app.exec())
+    exit_code = app.exec()
+    window.plugins.shutdown()
+    window.model_loader.config_store.flush()
+    sys.exit(exit_code)
@@ -0,0 +1,107 @@
+# benchmarks/embedder_check.py — ONNX embedder equivalence and throughput
+#
+#   python -m benchmarks.embedder_check
+#   python -m benchmarks.embedder_check --corpus README.md --limit 500
+#
+# Embeds the same chunks with the HuggingFace (PyTorch) backend, ONNX fp32 and ONNX int8,
+# reports chunks/sec for each and the cosine between each ONNX vector and its HuggingFace
+# counterpart. Exits 1 if fp32 drifts (min cosine < --fp32-min) or int8 loses too much
+# (mean cosine < --int8-mean), so a backend switch can't silently change search results.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, REPO_ROOT)
+
+from core.utils.chunker import stream_chunks  # noqa: E402
+from core.utils.embedders import create_embedder  # noqa: E402
+from core.utils.vector_codes import normalize  # noqa: E402
+
+BACKENDS = {
+    "huggingface": {"backend": "huggingface"},
+    "onnx_fp32": {"backend": "onnx"},
+    "onnx_int8": {"backend": "onnx", "quantize": True},
+}
+
+
+def load_corpus(paths, limit: int) -> list[str]:
+    texts = []
+    for path in paths:
+        for chunk in stream_chunks(path):
+            texts.append(chunk.page_content)
+            if len(texts) >= limit:
+                return texts
+    return texts
+
+
+def embed_all(settings: dict, texts, batch: int) -> tuple[np.ndarray, float]:
+    embedder = create_embedder(settings)
+    try:
+        embedder.embed_documents(texts[:batch])  # warm-up: model load, graph optimisation
+        start = time.perf_counter()
+        out = [np.asarray(embedder.embed_documents(texts[i:i + batch]), dtype=np.float32)
+               for i in range(0, len(texts), batch)]
+        elapsed = time.perf_counter() - start
+    finally:
+        if hasattr(embedder, "close"):
+            embedder.close()
+    return normalize(np.vstack(out)), len(texts) / max(elapsed, 1e-9)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare embedding backends on a corpus")
+    parser.add_argument("--corpus", nargs="+", default=[os.path.join(REPO_ROOT, "README.md")])
+    parser.add_argument("--limit", type=int, default=256, help="maximum chunks to embed")
+    parser.add_argument("--batch", type=int, default=64, help="chunks per embed_documents call")
+    parser.add_argument("--fp32-min", type=float, default=0.999)
+    parser.add_argument("--int8-mean", type=float, default=0.98)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args(argv)
+
+    texts = load_corpus(args.corpus, args.limit)
+    if not texts:
+        print("⚠️ No chunks in the corpus")
+        return 1
+    print(f"📊 {len(texts)} chunks from {len(args.corpus)} file(s)")
+
+    vectors, report = {}, {}
+    for name, settings in BACKENDS.items():
+        try:
+            vectors[name], rate = embed_all(settings, texts, args.batch)
+        except ImportError as e:
+            print(f"   {name:<12} skipped ({e})")
+            continue
+        report[name] = {"chunks_per_s": rate}
+        print(f"   {name:<12} {rate:9.1f} chunks/s")
+
+    failed = False
+    reference = vectors.get("huggingface")
+    if reference is None:
+        print("⚠️ HuggingFace backend unavailable; nothing to compare against")
+    for name, threshold in (("onnx_fp32", ("min", args.fp32_min)), ("onnx_int8", ("mean", args.int8_mean))):
+        if reference is None or name not in vectors:
+            continue
+        cosines = (vectors[name] * reference).sum(axis=1)
+        report[name].update(cos_min=float(cosines.min()), cos_mean=float(cosines.mean()))
+        stat, limit = threshold
+        ok = report[name][f"cos_{stat}"] >= limit
+        failed |= not ok
+        print(f"   {name:<12} cosine vs HF min {cosines.min():.5f} mean {cosines.mean():.5f} "
+              f"{'✅' if ok else f'❌ ({stat} < {limit})'}")
+        if "huggingface" in report:
+            report[name]["speedup"] = report[name]["chunks_per_s"] / report["huggingface"]["chunks_per_s"]
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
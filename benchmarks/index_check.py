@@ -0,0 +1,55 @@
+# benchmarks/index_check.py — import/remove bookkeeping of local search
+#
+#   python -m benchmarks.index_check
+#
+# Imports a multi-chunk file into a throwaway store (with a hash embedder, so no model is
+# loaded), re-imports it with replace, and removes it. Exits 1 if any chunk is not keyed on the
+# file's path, if the re-import leaves duplicates, or if removal leaves chunks behind: the
+# folder watcher relies on all three.
+
+import os
+import sys
+import tempfile
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.run_benchmarks import HashEmbedder  # noqa: E402
+from core.utils.local_search_manager import LocalSearchManager  # noqa: E402
+from core.utils.search_collection import source_key  # noqa: E402
+
+
+def main(argv=None):
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, "notes.csv")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("id,text\n")
+        f.writelines(f"{i},row {i} about the forge pipeline and its cache\n" for i in range(3000))
+    other = os.path.join(folder, "other.txt")
+    with open(other, "w", encoding="utf-8") as f:
+        f.write("an unrelated file that must survive the removal\n")
+
+    manager = LocalSearchManager(persist_path=os.path.join(folder, "vs_store.json"), embedder=HashEmbedder())
+    manager.import_document(other)
+    manager.import_document(path)
+    docs = manager.collection().docs
+    chunks = [doc for doc in docs if doc["source"] == "notes.csv"]
+    checks = {
+        "file splits into several chunks": len(chunks) > 1,
+        "every chunk is keyed on the file path": all(doc["path"] == source_key(path) for doc in chunks),
+    }
+    manager.import_document(path, replace=True)
+    checks["replace leaves no duplicates"] = len(manager.collection().docs) == len(docs)
+    removed = manager.remove_document(path)
+    checks["remove_document drops every chunk"] = removed == len(chunks)
+    checks["other files are kept"] = [doc["path"] for doc in manager.collection().docs] == [source_key(other)]
+    manager.close()
+
+    print(f"📊 {len(chunks)} chunks from {os.path.basename(path)}")
+    for name, ok in checks.items():
+        print(f"   {'✅' if ok else '❌'} {name}")
+    return 0 if all(checks.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+# benchmarks/quantization_report.py — memory vs recall for each embedding storage type
+#
+#   python -m benchmarks.quantization_report --store ./vs_store.json --k 10
+#   python -m benchmarks.quantization_report --synthetic 50000
+#
+# Queries are stored chunks with a little noise added, so no embedding model is needed.
+# Ground truth is the exact float32 top-k; recall@k is measured for the coarse scan alone
+# and after the exact rerank LocalSearchManager performs.
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, REPO_ROOT)
+
+from core.utils.local_search_manager import LocalSearchManager  # noqa: E402
+from core.utils.vector_codes import STORAGE_TYPES, normalize, top_indices  # noqa: E402
+
+
+def synthetic_corpus(size: int, dim: int = 384, clusters: int = 200, seed: int = 7) -> np.ndarray:
+    """Clustered unit vectors, closer to real sentence embeddings than isotropic noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size)
+    return normalize(centers[labels] + 0.6 * rng.standard_normal((size, dim)).astype(np.float32))
+
+
+def make_queries(embs: np.ndarray, count: int, noise: float = 0.3, seed: int = 11) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(embs), size=min(count, len(embs)), replace=False)
+    rows = np.asarray(embs[np.sort(picks)], dtype=np.float32)
+    return normalize(rows + noise * rng.standard_normal(rows.shape).astype(np.float32) / np.sqrt(rows.shape[1]))
+
+
+def evaluate(embs: np.ndarray, queries: np.ndarray, k: int = 10) -> dict:
+    truth = [set(top_indices(embs @ q, k).tolist()) for q in queries]
+    store_dir = tempfile.mkdtemp()
+    report = {}
+    for storage in STORAGE_TYPES:
+        collection = LocalSearchManager(persist_path=os.path.join(store_dir, f"{storage}.json"), embedder=object(),
+                                        storage=storage).collection()
+        collection.set_embeddings(embs)
+        coarse_hits, reranked_hits, latencies = 0, 0, []
+        for q, expected in zip(queries, truth):
+            start = time.perf_counter()
+            ranked = collection.rank_embedding(q, k)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            reranked_hits += len(expected.intersection(ranked.tolist()))
+            coarse = collection.coarse_ranking(q, k)
+            coarse_hits += len(expected.intersection(coarse.tolist()))
+        report[storage] = {
+            "memory_mb": collection.memory_bytes() / 1024 ** 2,
+            f"coarse_recall@{k}": coarse_hits / (k * len(queries)),
+            f"recall@{k}": reranked_hits / (k * len(queries)),
+            "query_ms": statistics.median(latencies),
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare embedding storage types on a corpus")
+    parser.add_argument("--store", default="./vs_store.json", help="LocalSearchManager store to measure")
+    parser.add_argument("--collection", default="default")
+    parser.add_argument("--synthetic", type=int, help="use N synthetic clustered vectors instead of a store")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        embs = synthetic_corpus(args.synthetic)
+    else:
+        embs = LocalSearchManager(persist_path=args.store, embedder=object()).collection(args.collection).embs
+        if not embs.size:
+            print(f"⚠️ No embeddings in {args.store}; import documents first or pass --synthetic N")
+            return 1
+    embs = np.ascontiguousarray(embs, dtype=np.float32)
+    report = evaluate(embs, make_queries(embs, args.queries), args.k)
+
+    print(f"📊 {len(embs)} chunks × {embs.shape[1]} dims, {args.queries} queries, k={args.k}")
+    for storage, row in report.items():
+        print(f"   {storage:<8} {row['memory_mb']:8.2f} MB  coarse recall {row[f'coarse_recall@{args.k}']:.3f}  "
+              f"recall {row[f'recall@{args.k}']:.3f}  {row['query_ms']:.2f} ms")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,417 @@
+# benchmarks/run_benchmarks.py — deterministic end-to-end performance suite
+#
+#   python -m benchmarks.run_benchmarks                   # run everything, compare with baselines
+#   python -m benchmarks.run_benchmarks --only search     # cases whose name contains "search"
+#   python -m benchmarks.run_benchmarks --update-baseline # record this machine's numbers
+#
+# Everything runs offline against aiforge.mock_ollama with a fixed token rate, latency and jitter
+# seed, so the model side of each timing is known in advance. Cases report the time AI Forge adds
+# on top of that ("overhead") plus pure CPU costs (rendering, search). A metric regresses when it
+# exceeds its baseline by more than the threshold; the exit code is 1 if anything regressed.
+#
+# Absolute timings are only comparable on the machine the baselines were recorded on: re-record
+# them with --update-baseline on each new machine. Pure-CPU cases also report "_vs_" ratios taken
+# within one run (float16 vs. float32 scans, search_many vs. a loop), which carry over between
+# machines; those are gated at --threshold, the raw CPU timings behind them more loosely.
+
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, REPO_ROOT)
+
+from aiforge.mock_ollama import MockOllama, serve_in_thread  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+DEFAULT_THRESHOLD = 0.25
+# "case.metric" pattern -> allowed relative slowdown; the first match wins, anything else uses --threshold
+METRIC_THRESHOLDS = {
+    "search_quantized.*_vs_float32": 0.75,  # each storage type is timed in turn, so load shifts between them
+    "search_quantized.*_query_ms": 1.5,  # raw numpy scan timings swing with load and CPU clocks
+    "search_sharded.*_ms": 1.5,
+    "search_vs_corpus.*_ms": 1.5,
+}
+RATIO_SLACK = 0.05  # absolute slack for "_vs_" ratios, the counterpart of the 2 ms for timings
+
+MOCK_SETTINGS = {"tokens_per_sec": 400.0, "default_num_predict": 64, "latency_ms": 20.0, "jitter": 0.0, "seed": 1234}
+
+
+def expected_model_sec(num_predict=MOCK_SETTINGS["default_num_predict"]):
+    return MOCK_SETTINGS["latency_ms"] / 1000.0 + num_predict / MOCK_SETTINGS["tokens_per_sec"]
+
+
+def make_loader(url):
+    from model_loader import ModelLoader
+
+    loader = ModelLoader(config_path=os.path.join(tempfile.mkdtemp(), "config.json"))
+    loader.ollama_url = url
+    return loader
+
+
+def median_ms(func, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return statistics.median(samples)
+
+
+class HashEmbedder:
+    """Deterministic stand-in for the sentence-transformer so search timing excludes model inference."""
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        return np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+
+    def embed_query(self, text):
+        return self._vector(text).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(t).tolist() for t in texts]
+
+
+# ── Cases ───────────────────────────────────────────
+def case_stream_model_loader(url, repeats):
+    loader = make_loader(url)
+    loader.warm_connection()
+
+    def stream():
+        for _ in loader.generate_with_ollama_stream("benchmark stream prompt"):
+            pass
+
+    wall = median_ms(stream, repeats)
+    return {"overhead_ms": wall - expected_model_sec() * 1000.0}
+
+
+def case_stream_generation_thread(url, repeats):
+    try:
+        from app import GenerationThread
+    except ImportError as e:
+        return {"skipped": f"Qt UI unavailable ({e})"}
+
+    loader = make_loader(url)
+    chunks = []
+
+    def run_thread():
+        thread = GenerationThread(loader, "benchmark stream prompt")
+        thread.result_ready.connect(chunks.append)
+        thread.run()  # run synchronously; signals go straight to the Python slot
+
+    wall = median_ms(run_thread, repeats)
+    return {"overhead_ms": wall - expected_model_sec() * 1000.0}
+
+
+def case_chain_latency(url, repeats):
+    import prompt_tools
+
+    steps = 3
+    template_dir = tempfile.mkdtemp()
+    original_dir = prompt_tools.TEMPLATE_DIR
+    prompt_tools.TEMPLATE_DIR = template_dir
+    try:
+        names = []
+        for i in range(steps):
+            name = f"bench_step_{i}"
+            prompt_tools.save_prompt_template(name, f"Step {i}: {{{{input}}}}\n\nPrevious: {{{{previous}}}}")
+            names.append(name)
+        loader = make_loader(url)
+        wall = median_ms(lambda: prompt_tools.run_chain(names, "benchmark chain input", loader), repeats)
+    finally:
+        prompt_tools.TEMPLATE_DIR = original_dir
+    return {"overhead_ms": wall - steps * expected_model_sec() * 1000.0}
+
+
+def case_render_long_session(url, repeats, turns=200):
+    from core.utils.rendering import render_markdown, response_block, page_html
+
+    reply = (
+        "Here is the fix:\n\n```python\ndef add(a, b):\n    return a + b\n```\n\n"
+        + "Some **markdown** with a [link](https://example.com) and a list:\n\n- one\n- two\n- three\n" * 3
+    )
+
+    def session():
+        history = ""
+        per_turn = []
+        for turn in range(turns):
+            start = time.perf_counter()
+            history += response_block(f"prompt {turn}", render_markdown(reply))
+            page_html(history)
+            per_turn.append((time.perf_counter() - start) * 1000.0)
+        return per_turn
+
+    runs = [session() for _ in range(repeats)]
+    first = statistics.median(r[0] for r in runs)
+    last = statistics.median(r[-1] for r in runs)
+    total = statistics.median(sum(r) for r in runs)
+    return {"turn_1_ms": first, f"turn_{turns}_ms": last, "session_total_ms": total}
+
+
+def case_search_vs_corpus(url, repeats, sizes=(1_000, 10_000, 50_000)):
+    from core.utils.local_search_manager import LocalSearchManager
+
+    embedder = HashEmbedder()
+    rng = np.random.default_rng(7)
+    results = {}
+    for size in sizes:
+        manager = LocalSearchManager(persist_path=os.path.join(tempfile.mkdtemp(), "vs_store.json"), embedder=embedder)
+        docs = [{"source": f"doc{i}.txt", "page_content": f"chunk {i} error E{i % 997:04d} in module_{i % 31}"}
+                for i in range(size)]
+        manager.collection().append(docs, rng.standard_normal((size, embedder.dim)), imported_at=time.time())
+        runs = 4 * repeats  # millisecond-scale calls: more samples keep the median steady
+        results[f"search_{size}_ms"] = median_ms(lambda: manager.search("benchmark query", top_k=5, mode="vector"), runs)
+        results[f"lexical_{size}_ms"] = median_ms(lambda: manager.search("error E0042", top_k=5, mode="lexical"), runs)
+        results[f"hybrid_{size}_ms"] = median_ms(lambda: manager.search("error E0042", top_k=5), runs)
+    return results
+
+
+def case_search_quantized(url, repeats, size=50_000, k=10):
+    from benchmarks.quantization_report import evaluate, make_queries, synthetic_corpus
+
+    embs = synthetic_corpus(size)
+    report = evaluate(embs, make_queries(embs, 50 * repeats), k)
+    results = {}
+    for storage, row in report.items():
+        results[f"{storage}_query_ms"] = row["query_ms"]
+        results[f"{storage}_memory_mb"] = row["memory_mb"]
+        results[f"{storage}_recall@{k}"] = row[f"recall@{k}"]
+        if storage != "float32":
+            results[f"{storage}_vs_float32"] = row["query_ms"] / report["float32"]["query_ms"]
+    return results
+
+
+def case_search_sharded(url, repeats, size=131_072, shard_rows=16_384, queries=200):
+    import core.utils.search_collection as search_collection
+    from core.utils.local_search_manager import LocalSearchManager
+
+    embedder = HashEmbedder()
+    rng = np.random.default_rng(3)
+    vectors = rng.standard_normal((size, embedder.dim)).astype(np.float32)
+    docs = [{"source": f"doc{i}.txt", "page_content": f"chunk {i}"} for i in range(size)]
+    questions = [f"benchmark question {i}" for i in range(queries)]
+    original_rows = search_collection.SHARD_ROWS
+    search_collection.SHARD_ROWS = shard_rows
+    results = {}
+    try:
+        store = os.path.join(tempfile.mkdtemp(), "vs_store.json")
+        LocalSearchManager(persist_path=store, embedder=embedder).collection().append(docs, vectors, time.time())
+        for workers in (1, None):
+            manager = LocalSearchManager(persist_path=store, embedder=embedder, search_workers=workers)
+            manager.collection()
+            results["query_serial_ms" if workers == 1 else "query_pool_ms"] = median_ms(
+                lambda: manager.search_ids("benchmark query", top_k=10, mode="vector"), repeats)
+            manager.close()
+        manager = LocalSearchManager(persist_path=store, embedder=embedder)
+        manager.collection()
+        # interleaved so both see the same machine load; the ratio is what's gated
+        loops, batches = [], []
+        for _ in range(max(3, repeats)):
+            loops.append(median_ms(lambda: [manager.search_ids(q, top_k=10, mode="vector") for q in questions], 1))
+            batches.append(median_ms(lambda: manager.search_many(questions, top_k=10, mode="vector"), 1))
+        results[f"loop_{queries}_ms"] = statistics.median(loops)
+        results[f"search_many_{queries}_ms"] = statistics.median(batches)
+        results["search_many_vs_loop"] = statistics.median(b / lp for b, lp in zip(batches, loops))
+        manager.close()
+    finally:
+        search_collection.SHARD_ROWS = original_rows
+    return results
+
+
+def case_model_switch(url, repeats, load_ms=400.0):
+    """First-token latency right after switching models, with and without the background warm-up."""
+    mock = MockOllama(**dict(MOCK_SETTINGS, load_ms=load_ms))
+    with serve_in_thread(mock) as switch_url:
+        loader = make_loader(switch_url)
+        loader.config_store.set("performance.keep_alive", -1)
+        models = list(mock.models)
+
+        def first_token(model):
+            start, first = time.perf_counter(), None
+            for chunk in loader.generate_with_ollama_stream("benchmark switch prompt", model):
+                if chunk and first is None:
+                    first = (time.perf_counter() - start) * 1000.0
+            return first
+
+        cold, warm = [], []
+        for i in range(repeats):
+            model = models[i % len(models)]
+            mock.loaded.clear()
+            cold.append(first_token(model))
+            mock.loaded.clear()
+            loader.warm_model(model)  # what selecting the model in the dropdown does
+            warm.append(first_token(model))
+    return {"cold_first_token_ms": statistics.median(cold), "warm_first_token_ms": statistics.median(warm)}
+
+
+def case_conversation_context(url, repeats, turns=6, ms_per_token=0.5):
+    """Prompt-eval time over a multi-turn conversation: resending the history vs. reusing Ollama's context."""
+    import db
+
+    original_db = db.DB_PATH
+    db.DB_PATH = os.path.join(tempfile.mkdtemp(), "history.db")
+    db.init_db()
+    mock = MockOllama(**dict(MOCK_SETTINGS, default_num_predict=32, prompt_ms_per_token=ms_per_token))
+    try:
+        with serve_in_thread(mock) as conv_url:
+            loader = make_loader(conv_url)
+            prompts = [f"turn {i} question about the forge pipeline and its cache" for i in range(turns)]
+
+            def run(reuse, conversation_id):
+                history, total = "", 0.0
+                for prompt in prompts:
+                    stats = {}
+                    sent = prompt if reuse else history + prompt
+                    reply = "".join(loader.generate_with_ollama_stream(
+                        sent, conversation_id=conversation_id if reuse else None, stats=stats))
+                    history += f"{prompt}\n{reply}\n"
+                    total += stats["prompt_eval_ms"]
+                return total
+
+            stateless = statistics.median(run(False, None) for _ in range(repeats))
+            reused = statistics.median(run(True, f"bench-{i}") for i in range(repeats))
+    finally:
+        db.DB_PATH = original_db
+    return {f"stateless_prompt_eval_{turns}_turns_ms": stateless, f"context_prompt_eval_{turns}_turns_ms": reused}
+
+
+def case_config_changes(url, repeats, changes=200):
+    """Caller-side cost of a burst of settings changes: a synchronous json.dump each vs. the debounced ConfigStore."""
+    from core.utils.config_store import DEFAULT_CONFIG, ConfigStore
+
+    folder = tempfile.mkdtemp()
+    models = [f"model-{i % 5}" for i in range(changes)]
+
+    def sync_saves():
+        path = os.path.join(folder, "sync.json")
+        config = json.loads(json.dumps(DEFAULT_CONFIG))
+        start = time.perf_counter()
+        for model in models:
+            config["default_model"]["model_name"] = model
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(config, f, indent=2)
+        return (time.perf_counter() - start) * 1000.0
+
+    def store_sets():
+        store = ConfigStore(os.path.join(folder, "store.json"), debounce=0.5)
+        initial_writes = store.writes
+        start = time.perf_counter()
+        for model in models:
+            store.set("default_model.model_name", model)
+        elapsed = (time.perf_counter() - start) * 1000.0
+        store.flush()
+        return elapsed, store.writes - initial_writes
+
+    sync_ms = statistics.median(sync_saves() for _ in range(repeats))
+    runs = [store_sets() for _ in range(repeats)]
+    return {
+        f"sync_save_{changes}_changes_ms": sync_ms,
+        f"store_set_{changes}_changes_ms": statistics.median(ms for ms, _ in runs),
+        "store_file_writes": max(writes for _, writes in runs),
+    }
+
+
+CASES = {
+    "stream_model_loader": case_stream_model_loader,
+    "stream_generation_thread": case_stream_generation_thread,
+    "chain_latency": case_chain_latency,
+    "render_long_session": case_render_long_session,
+    "search_vs_corpus": case_search_vs_corpus,
+    "search_quantized": case_search_quantized,
+    "search_sharded": case_search_sharded,
+    "model_switch": case_model_switch,
+    "conversation_context": case_conversation_context,
+    "config_changes": case_config_changes,
+}
+
+
+# ── Baselines ───────────────────────────────────────
+def load_baselines(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def metric_threshold(case, metric, default):
+    for pattern, threshold in METRIC_THRESHOLDS.items():
+        if fnmatch.fnmatchcase(f"{case}.{metric}", pattern):
+            return threshold
+    return default
+
+
+def compare(results, baselines, threshold):
+    """Returns a list of (case, metric, current, baseline, ratio) rows that got slower than allowed."""
+    regressions = []
+    for case, metrics in results.items():
+        for metric, value in metrics.items():
+            base = baselines.get("cases", {}).get(case, {}).get(metric)
+            if not isinstance(value, (int, float)) or base is None:
+                continue
+            # small absolute values are mostly noise; allow at least 2 ms (or 0.05 of a ratio) of slack
+            slack = RATIO_SLACK if "_vs_" in metric else 2.0
+            allowed = max(base * (1.0 + metric_threshold(case, metric, threshold)), base + slack)
+            if value > allowed:
+                regressions.append((case, metric, value, base, value / base if base else float("inf")))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AI Forge end-to-end performance suite")
+    parser.add_argument("--only", help="run cases whose name contains this text")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed relative slowdown")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--json", help="write raw results to this file")
+    args = parser.parse_args(argv)
+
+    selected = {name: case for name, case in CASES.items() if not args.only or args.only in name}
+    results = {}
+    with serve_in_thread(MockOllama(**MOCK_SETTINGS)) as url:
+        for name, case in selected.items():
+            print(f"⏱️ {name} ...", flush=True)
+            results[name] = case(url, args.repeats)
+            for metric, value in results[name].items():
+                shown = f"{value:.2f}" if isinstance(value, (int, float)) else value
+                print(f"   {metric}: {shown}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        baselines = load_baselines(args.baseline)
+        baselines.setdefault("cases", {}).update(
+            {name: {k: v for k, v in m.items() if isinstance(v, (int, float))} for name, m in results.items()
+             if "skipped" not in m}
+        )
+        baselines["machine"] = {"platform": platform.platform(), "python": platform.python_version(),
+                                "processor": platform.processor() or platform.machine()}
+        baselines["mock"] = MOCK_SETTINGS
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2)
+        print(f"💾 Baselines written to {args.baseline}")
+        return 0
+
+    regressions = compare(results, load_baselines(args.baseline), args.threshold)
+    for case, metric, value, base, ratio in regressions:
+        print(f"❌ {case}.{metric}: {value:.2f} vs baseline {base:.2f} ({ratio:.2f}x)")
+    if not regressions:
+        print("✅ No regressions beyond threshold")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
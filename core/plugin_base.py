@@ -1,4 +1,12 @@
 class AIForgePlugin:
+    """
+    Base class for plugins. Pipeline behaviour is declared in the plugin's config.json so it can be
+    planned without importing the plugin:
+      stage    "pre_proc" (before generation, input has "prompt") or "post_proc" (after, input has "text")
+      inputs   keys run() reads; only these are passed in
+      outputs  keys run() writes; only these are merged back
+      pure     True if run() has no side effects, so it may run concurrently and be cached
+    """
     def __init__(self, config: dict = {}):
         self.config = config
 
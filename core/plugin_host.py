@@ -0,0 +1,103 @@
+# plugin_host.py — runs one plugin in its own process for plugins whose manifest sets "isolated": true
+#
+# Protocol: one JSON object per line. The client writes {"input": {...}} to stdin and the host
+# answers {"output": {...}} or {"error": "..."} on stdout. Plugin prints are sent to stderr so
+# they can't corrupt the protocol stream. Non-JSON values (callbacks, tokens) are dropped.
+import json
+import os
+import subprocess
+import sys
+import threading
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _jsonable(data: dict) -> dict:
+    clean = {}
+    for key, value in data.items():
+        try:
+            json.dumps(value)
+            clean[key] = value
+        except (TypeError, ValueError):
+            pass
+    return clean
+
+
+class PluginHostClient:
+    def __init__(self, plugin_dir: str, entry_point: str = "plugin.py"):
+        self.plugin_dir = os.path.abspath(plugin_dir)
+        self.entry_point = entry_point
+        self.process = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self.process is not None and self.process.poll() is None:
+            return
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "core.plugin_host", self.plugin_dir, self.entry_point],
+            cwd=REPO_ROOT,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+
+    def run(self, input_data: dict, timeout=None) -> dict:
+        from core.plugin_loader import PluginTimeout
+
+        with self._lock:
+            self.start()
+            self.process.stdin.write(json.dumps({"input": _jsonable(input_data)}) + "\n")
+            self.process.stdin.flush()
+
+            reply = {}
+            reader = threading.Thread(target=lambda: reply.update(line=self.process.stdout.readline()), daemon=True)
+            reader.start()
+            reader.join(timeout)
+            if reader.is_alive():
+                # unlike a thread, a process can be stopped; the next run() starts a fresh one
+                self.close()
+                raise PluginTimeout(f"Isolated plugin {self.plugin_dir} did not finish within {timeout:g}s")
+
+            line = reply.get("line")
+            if not line:
+                self.close()
+                raise RuntimeError(f"Isolated plugin {self.plugin_dir} exited unexpectedly")
+            message = json.loads(line)
+            if "error" in message:
+                raise RuntimeError(message["error"])
+            return message["output"]
+
+    def close(self):
+        if self.process is not None:
+            if self.process.poll() is None:
+                self.process.kill()
+            self.process.wait()
+            self.process = None
+
+
+def main():
+    from core.plugin_loader import import_plugin_class
+
+    plugin_dir, entry_point = sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else "plugin.py"
+    protocol = sys.stdout
+    sys.stdout = sys.stderr
+
+    plugin = import_plugin_class(plugin_dir, entry_point)()
+    print(f"🧩 [PluginHost] {plugin.get_name()} ready (pid {os.getpid()})")
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            output = plugin.run(json.loads(line)["input"])
+            reply = {"output": _jsonable(output) if isinstance(output, dict) else output}
+        except Exception as e:
+            reply = {"error": f"{type(e).__name__}: {e}"}
+        protocol.write(json.dumps(reply) + "\n")
+        protocol.flush()
+
+
+if __name__ == "__main__":
+    main()
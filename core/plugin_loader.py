@@ -1,25 +1,256 @@
 # plugin_loader.py
+#
+# Plugins are discovered from their manifests (plugins/<folder>/config.json) without importing
+# plugin.py. A plugin's module is only imported, and its Plugin instantiated, the first time it
+# is used; manifests declare the name, type, triggers, capabilities, timeout and isolation mode.
 import importlib.util
+import json
 import os
+import threading
+import time
 from core.plugin_base import AIForgePlugin
+from core.utils import telemetry
+from core.plugin_pipeline import PluginPipeline, STAGES
 
 PLUGIN_FOLDER = "plugins"
+PLUGIN_STATE_PATH = "plugin_state.json"
+DEFAULT_TIMEOUT = 30.0
+
+MANIFEST_DEFAULTS = {
+    "description": "",
+    "type": "generic",
+    "entry_point": "plugin.py",
+    "triggers": [],         # prompt prefixes that route to the plugin; empty = every prompt
+    "capabilities": [],     # "text": run() returns the (possibly rewritten) input dict
+    "timeout": DEFAULT_TIMEOUT,  # seconds, or null for no limit
+    "isolated": False,      # run in a separate process via core.plugin_host
+    # pipeline declarations (see core/plugin_pipeline.py)
+    "stage": None,          # "pre_proc" or "post_proc"; defaults from type
+    "inputs": ["text", "original_prompt"],
+    "outputs": None,        # defaults to ["text"] for "text"-capable plugins, else []
+    "pure": False,
+    "order": 0,
+    "after": [],
+}
+
+
+class PluginTimeout(TimeoutError):
+    pass
+
+
+def read_manifest(plugin_dir: str) -> dict | None:
+    """Reads plugins/<folder>/config.json; the folder name stands in for a missing name."""
+    manifest = dict(MANIFEST_DEFAULTS, name=os.path.basename(plugin_dir))
+    manifest_path = os.path.join(plugin_dir, "config.json")
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest.update(json.load(f))
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Warning: Invalid manifest for {plugin_dir}: {e}")
+            return None
+    if not os.path.exists(os.path.join(plugin_dir, manifest["entry_point"])):
+        return None
+    if manifest["stage"] is None:
+        manifest["stage"] = manifest["type"] if manifest["type"] in STAGES else "post_proc"
+    if manifest["outputs"] is None:
+        manifest["outputs"] = ["text"] if "text" in manifest["capabilities"] else []
+    return manifest
+
+
+def import_plugin_class(plugin_dir: str, entry_point: str = "plugin.py"):
+    folder = os.path.basename(plugin_dir)
+    spec = importlib.util.spec_from_file_location(f"{folder}_plugin", os.path.join(plugin_dir, entry_point))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    plugin_class = getattr(module, "Plugin", None)
+    if plugin_class and issubclass(plugin_class, AIForgePlugin):
+        return plugin_class
+    raise ImportError(f"No valid Plugin class found in {folder}")
+
+
+class PluginHandle:
+    """
+    Lazy stand-in for a plugin. Exposes the AIForgePlugin interface from the manifest and only
+    imports/instantiates the real plugin (in-process or in a subprocess) on the first run().
+    """
+    def __init__(self, plugin_dir: str, manifest: dict, enabled: bool = False):
+        self.plugin_dir = plugin_dir
+        self.manifest = manifest
+        self.enabled = enabled
+        self._instance = None
+        self._host = None
+        self._lock = threading.Lock()
+        self.metrics = {"calls": 0, "errors": 0, "timeouts": 0, "total_sec": 0.0, "last_sec": 0.0, "load_sec": None}
+
+    def get_name(self):
+        return self.manifest["name"]
+
+    def plugin_type(self):
+        return self.manifest["type"]
+
+    @property
+    def loaded(self):
+        return self._instance is not None or self._host is not None
+
+    def has_capability(self, capability: str) -> bool:
+        return capability in self.manifest["capabilities"]
+
+    def matches(self, prompt: str) -> bool:
+        triggers = self.manifest["triggers"]
+        return not triggers or any(prompt.lower().startswith(t.lower()) for t in triggers)
+
+    def load(self):
+        with self._lock:
+            if self.loaded:
+                return self._instance or self._host
+            start = time.perf_counter()
+            if self.manifest["isolated"]:
+                from core.plugin_host import PluginHostClient
+                self._host = PluginHostClient(self.plugin_dir, self.manifest["entry_point"])
+            else:
+                plugin_class = import_plugin_class(self.plugin_dir, self.manifest["entry_point"])
+                self._instance = plugin_class()
+                if self._instance.get_name() != self.get_name():
+                    print(f"⚠️ Warning: {self.plugin_dir} manifest says '{self.get_name()}' "
+                          f"but plugin reports '{self._instance.get_name()}'")
+            self.metrics["load_sec"] = time.perf_counter() - start
+            telemetry.record("plugin.load", self.metrics["load_sec"] * 1000.0, "ms", plugin=self.get_name())
+            print(f"🧩 Loaded plugin: {self.get_name()} ({self.metrics['load_sec']:.2f}s)")
+            return self._instance or self._host
+
+    @property
+    def instance(self):
+        """The real plugin object (in-process plugins only)."""
+        return self.load() if not self.manifest["isolated"] else None
+
+    def run(self, input_data: dict, timeout=...) -> dict:
+        """Runs the plugin with its manifest timeout; raises PluginTimeout if it overruns."""
+        target = self.load()
+        timeout = self.manifest["timeout"] if timeout is ... else timeout
+        start = time.perf_counter()
+        self.metrics["calls"] += 1
+        try:
+            if self._host is not None:
+                return self._host.run(input_data, timeout)
+            if timeout is None:
+                return target.run(input_data)
+            return self._run_with_timeout(target, input_data, timeout)
+        except PluginTimeout:
+            self.metrics["timeouts"] += 1
+            raise
+        except Exception:
+            self.metrics["errors"] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.metrics["last_sec"] = elapsed
+            self.metrics["total_sec"] += elapsed
+            telemetry.record(f"plugin.run.{self.get_name()}", elapsed * 1000.0, "ms")
+
+    def _run_with_timeout(self, target, input_data, timeout):
+        outcome = {}
+
+        def call():
+            try:
+                outcome["result"] = target.run(input_data)
+            except Exception as e:
+                outcome["error"] = e
+
+        # an in-process thread can't be killed; on timeout it is abandoned and finishes in the background
+        worker = threading.Thread(target=call, name=f"plugin-{self.get_name()}", daemon=True)
+        worker.start()
+        worker.join(timeout)
+        if worker.is_alive():
+            raise PluginTimeout(f"{self.get_name()} did not finish within {timeout:g}s")
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["result"]
+
+    def shutdown(self):
+        if self._host is not None:
+            self._host.close()
+            self._host = None
+
+
+class PluginManager:
+    """All discovered plugins plus their enabled state (persisted in plugin_state.json)."""
+    def __init__(self, plugin_folder: str = PLUGIN_FOLDER, state_path: str = PLUGIN_STATE_PATH):
+        self.plugin_folder = plugin_folder
+        self.state_path = state_path
+        self.handles = []
+        self.discover()
+        self.pipeline = PluginPipeline(self)
+
+    def __iter__(self):
+        return iter(self.handles)
+
+    def __len__(self):
+        return len(self.handles)
+
+    def load_state(self) -> dict:
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("enabled_plugins", {})
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def save_state(self):
+        state = {"enabled_plugins": {h.get_name(): h.enabled for h in self.handles}}
+        with open(self.state_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+
+    def discover(self):
+        enabled = self.load_state()
+        self.handles = []
+        for folder in sorted(os.listdir(self.plugin_folder)):
+            plugin_dir = os.path.join(self.plugin_folder, folder)
+            if not os.path.isdir(plugin_dir):
+                continue
+            manifest = read_manifest(plugin_dir)
+            if manifest is None:
+                continue
+            handle = PluginHandle(plugin_dir, manifest, enabled.get(manifest["name"], False))
+            print(f"🧩 Found plugin: {manifest['name']} ({manifest['type']}, "
+                  f"{'enabled' if handle.enabled else 'disabled'})")
+            self.handles.append(handle)
+
+    def get(self, name: str) -> PluginHandle | None:
+        return next((h for h in self.handles if h.get_name() == name), None)
+
+    def first_of_type(self, plugin_type: str) -> PluginHandle | None:
+        return next((h for h in self.handles if h.plugin_type() == plugin_type), None)
+
+    def set_enabled(self, name: str, enabled: bool):
+        handle = self.get(name)
+        if handle is not None:
+            handle.enabled = enabled
+            self.save_state()
+
+    def triggered(self, prompt: str):
+        """Enabled plugins whose declared triggers match `prompt`."""
+        return [h for h in self.handles if h.enabled and h.matches(prompt)]
+
+    def run_stage(self, stage: str, plugin_input: dict) -> dict:
+        """Runs the triggered plugins of `stage`; only their declared outputs are merged back."""
+        return self.pipeline.run(stage, plugin_input)
+
+    def submit_stage(self, stage: str, plugin_input: dict):
+        return self.pipeline.submit(stage, plugin_input)
+
+    def metrics(self) -> dict:
+        return {h.get_name(): dict(h.metrics, loaded=h.loaded) for h in self.handles}
+
+    def shutdown(self):
+        self.pipeline.shutdown()
+        for handle in self.handles:
+            handle.shutdown()
+
 
 def load_plugins():
     print("🧩 Scanning plugins folder...")
-    plugins = []
-    for folder in os.listdir(PLUGIN_FOLDER):
-        plugin_path = os.path.join(PLUGIN_FOLDER, folder, "plugin.py")
-        if os.path.exists(plugin_path):
-            print(f"🧩 Found plugin: {folder}")
-            spec = importlib.util.spec_from_file_location(f"{folder}_plugin", plugin_path)
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-            plugin_class = getattr(module, "Plugin", None)
-            if plugin_class and issubclass(plugin_class, AIForgePlugin):
-                plugin_instance = plugin_class()
-                plugins.append(plugin_instance)
-            else:
-                print(f"⚠️ Warning: No valid Plugin class found in {folder}")
-    print(f"🧩 Finished loading {len(plugins)} plugin(s).")
-    return plugins
+    manager = PluginManager()
+    print(f"🧩 Found {len(manager)} plugin(s); each loads on first use.")
+    return manager
@@ -0,0 +1,117 @@
+# plugin_pipeline.py
+#
+# Runs one stage of plugins ("pre_proc" before generation, "post_proc" after it) as a dependency
+# graph. Each plugin declares in its manifest the keys it reads ("inputs") and writes ("outputs")
+# and whether it is "pure" (no side effects, output depends only on inputs). Plugins that touch
+# disjoint keys run concurrently; conflicting ones run in a deterministic order ("order", then name).
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from core.utils import telemetry
+
+STAGES = ("pre_proc", "post_proc")
+PURE_CACHE_SIZE = 128
+
+
+def _conflicts(a, b) -> bool:
+    """True if b must run after a: read-after-write, write-after-write or write-after-read."""
+    a_in, a_out = set(a.manifest["inputs"]), set(a.manifest["outputs"])
+    b_in, b_out = set(b.manifest["inputs"]), set(b.manifest["outputs"])
+    if a_out & (b_in | b_out) or a_in & b_out:
+        return True
+    # without declared purity we can't tell what external state two plugins share
+    return not a.manifest["pure"] and not b.manifest["pure"]
+
+
+def _input_key(name: str, inputs: dict) -> str | None:
+    try:
+        blob = json.dumps([name, inputs], sort_keys=True)
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class PluginPipeline:
+    def __init__(self, manager, max_workers: int = 4):
+        self.manager = manager
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="plugin-pipeline")
+        # whole-stage runs get their own pool so they never wait on the plugin pool they feed
+        self.stage_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="plugin-stage")
+        self._pure_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def plan(self, stage: str, prompt: str) -> list[list]:
+        """Topological levels for the enabled, triggered plugins of `stage`; each level can run in parallel."""
+        handles = sorted(
+            (h for h in self.manager.triggered(prompt) if h.manifest["stage"] == stage),
+            key=lambda h: (h.manifest["order"], h.get_name()),
+        )
+        names = {h.get_name() for h in handles}
+        depends = {h.get_name(): set() for h in handles}
+        for i, later in enumerate(handles):
+            for earlier in handles[:i]:
+                if _conflicts(earlier, later):
+                    depends[later.get_name()].add(earlier.get_name())
+            depends[later.get_name()].update(n for n in later.manifest["after"] if n in names)
+
+        levels, done = [], set()
+        pending = list(handles)
+        while pending:
+            ready = [h for h in pending if depends[h.get_name()] <= done]
+            if not ready:
+                cycle = ", ".join(h.get_name() for h in pending)
+                print(f"⚠️ [Pipeline] Dependency cycle between: {cycle}; running them in order")
+                ready = pending[:1]
+            levels.append(ready)
+            done.update(h.get_name() for h in ready)
+            pending = [h for h in pending if h not in ready]
+        return levels
+
+    def _run_one(self, handle, data: dict) -> dict:
+        inputs = {k: data[k] for k in handle.manifest["inputs"] if k in data}
+        cache_key = _input_key(handle.get_name(), inputs) if handle.manifest["pure"] else None
+        if cache_key is not None:
+            with self._cache_lock:
+                if cache_key in self._pure_cache:
+                    self._pure_cache.move_to_end(cache_key)
+                    return self._pure_cache[cache_key]
+
+        output = handle.run(dict(inputs))
+        outputs = {k: output[k] for k in handle.manifest["outputs"] if isinstance(output, dict) and k in output}
+
+        if cache_key is not None:
+            with self._cache_lock:
+                self._pure_cache[cache_key] = outputs
+                while len(self._pure_cache) > PURE_CACHE_SIZE:
+                    self._pure_cache.popitem(last=False)
+        return outputs
+
+    def run(self, stage: str, data: dict) -> dict:
+        """Runs `stage` over `data` and returns a new dict with every plugin's declared outputs merged in."""
+        data = dict(data)
+        with telemetry.span(f"plugins.{stage}"):
+            self._run_levels(stage, data)
+        return data
+
+    def _run_levels(self, stage: str, data: dict):
+        for level in self.plan(stage, data.get("original_prompt", "")):
+            if len(level) == 1:
+                futures = [(level[0], None)]
+            else:
+                futures = [(h, self.executor.submit(self._run_one, h, data)) for h in level]
+            for handle, future in futures:
+                try:
+                    outputs = future.result() if future is not None else self._run_one(handle, data)
+                    data.update(outputs)
+                except Exception as e:
+                    print(f"[Plugin Error] {handle.get_name()}: {e}")
+
+    def submit(self, stage: str, data: dict):
+        """Starts `stage` in the background and returns a Future, so it can overlap other work."""
+        return self.stage_executor.submit(self.run, stage, data)
+
+    def shutdown(self):
+        self.stage_executor.shutdown(wait=False, cancel_futures=True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
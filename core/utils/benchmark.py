@@ -0,0 +1,210 @@
+# core/utils/benchmark.py — Per-device Ollama benchmark harness
+
+import json
+import os
+import statistics
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# AIFORGE_OLLAMA_URL points every Ollama client at another server (e.g. aiforge.mock_ollama)
+OLLAMA_URL = os.environ.get("AIFORGE_OLLAMA_URL", "http://localhost:11434").rstrip("/")
+RESULTS_PATH = "benchmark_results.json"
+
+BENCHMARK_PROMPT = "Tell me a fantasy story about a lost sword in a cursed forest."
+BENCHMARK_NUM_PREDICT = 64
+
+
+class PeakMemorySampler:
+    """
+    Samples the resident memory of a set of processes in a background thread
+    and keeps the highest value seen. Used as a context manager around a trial.
+    """
+    def __init__(self, process_filter=None, interval: float = 0.05):
+        self.process_filter = process_filter or (lambda proc: proc.pid == os.getpid())
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _current_rss(self) -> int:
+        total = 0
+        for proc in psutil.process_iter(["name"]):
+            try:
+                if self.process_filter(proc):
+                    total += proc.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, self._current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if psutil is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self.peak_bytes = max(self.peak_bytes, self._current_rss())
+        return False
+
+    @property
+    def peak_mb(self):
+        return round(self.peak_bytes / (1024 ** 2), 1) if self.peak_bytes else None
+
+
+def _is_ollama_process(proc) -> bool:
+    return "ollama" in (proc.info.get("name") or "").lower()
+
+
+def build_variants(profile: dict | None = None) -> dict:
+    """
+    Returns the benchmark variants as name -> Ollama options.
+    "cpu" variants force `num_gpu=0` and sweep thread counts; "gpu" lets Ollama offload layers.
+    """
+    logical = os.cpu_count() or 1
+    physical = (psutil.cpu_count(logical=False) if psutil else None) or logical
+
+    variants = {"cpu": {"num_gpu": 0, "num_thread": physical}}
+    if logical != physical:
+        variants[f"cpu_t{logical}"] = {"num_gpu": 0, "num_thread": logical}
+    if physical >= 4:
+        variants[f"cpu_t{physical // 2}"] = {"num_gpu": 0, "num_thread": physical // 2}
+    if profile is None or profile.get("gpu_name", "None") != "None" or profile.get("gpu_mem_gb", 0) > 0:
+        variants["gpu"] = {}
+    return variants
+
+
+def run_trial(model: str, options: dict, prompt: str = BENCHMARK_PROMPT,
+              num_predict: int = BENCHMARK_NUM_PREDICT, timeout: int = 120) -> dict:
+    """
+    Runs one streaming generation and returns its timings.
+    Token rates come from Ollama's own `eval_count`/`eval_duration` counters.
+    """
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "stream": True,
+        "options": {**options, "num_predict": num_predict},
+    }
+
+    with PeakMemorySampler(_is_ollama_process) as sampler:
+        start = time.perf_counter()
+        ttft = None
+        final = {}
+        response = requests.post(f"{OLLAMA_URL}/api/generate", json=payload, stream=True, timeout=timeout)
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            try:
+                chunk = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if ttft is None and chunk.get("response"):
+                ttft = time.perf_counter() - start
+            if chunk.get("done"):
+                final = chunk
+                break
+        wall = time.perf_counter() - start
+
+    eval_count = final.get("eval_count", 0)
+    eval_ns = final.get("eval_duration", 0)
+    prompt_count = final.get("prompt_eval_count", 0)
+    prompt_ns = final.get("prompt_eval_duration", 0)
+
+    return {
+        "wall_sec": wall,
+        "ttft_sec": ttft,
+        "tokens_per_sec": eval_count / (eval_ns / 1e9) if eval_ns else None,
+        "prompt_tokens_per_sec": prompt_count / (prompt_ns / 1e9) if prompt_ns else None,
+        "load_sec": final.get("load_duration", 0) / 1e9,
+        "peak_mem_mb": sampler.peak_mb,
+    }
+
+
+def _median(values):
+    values = [v for v in values if v is not None]
+    return round(statistics.median(values), 3) if values else None
+
+
+def summarize_trials(trials: list[dict]) -> dict:
+    return {
+        "trials": len(trials),
+        "wall_sec": _median(t["wall_sec"] for t in trials),
+        "ttft_sec": _median(t["ttft_sec"] for t in trials),
+        "tokens_per_sec": _median(t["tokens_per_sec"] for t in trials),
+        "prompt_tokens_per_sec": _median(t["prompt_tokens_per_sec"] for t in trials),
+        "peak_mem_mb": max((t["peak_mem_mb"] for t in trials if t["peak_mem_mb"]), default=None),
+    }
+
+
+def run_benchmark_suite(model: str, variants: dict | None = None, profile: dict | None = None,
+                        trials: int = 3, warmup: int = 1, num_predict: int = BENCHMARK_NUM_PREDICT) -> dict:
+    """
+    Benchmarks every variant with warm-up runs followed by repeated timed trials.
+    Each trial prefixes the prompt with a nonce so Ollama's prompt cache can't skew prompt-eval rates.
+    """
+    if variants is None:
+        variants = build_variants(profile)
+
+    results = {}
+    for name, options in variants.items():
+        try:
+            for i in range(warmup):
+                run_trial(model, options, f"[warmup {i}] {BENCHMARK_PROMPT}", num_predict)
+            timed = [
+                run_trial(model, options, f"[trial {i}] {BENCHMARK_PROMPT}", num_predict)
+                for i in range(trials)
+            ]
+            results[name] = {"options": options, **summarize_trials(timed)}
+        except Exception as e:
+            print(f"[Benchmark error on {name.upper()}]: {e}")
+            results[name] = {"options": options, "error": str(e)}
+
+    return {
+        "model": model,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "profile": profile or {},
+        "variants": results,
+    }
+
+
+def best_variant(report: dict, prefix: str) -> tuple[str, dict] | tuple[None, None]:
+    """Returns the highest tokens/sec variant whose name starts with `prefix`."""
+    candidates = [
+        (name, stats) for name, stats in report.get("variants", {}).items()
+        if name.startswith(prefix) and stats.get("tokens_per_sec")
+    ]
+    if not candidates:
+        return None, None
+    return max(candidates, key=lambda item: item[1]["tokens_per_sec"])
+
+
+def save_benchmark_report(report: dict, path: str = RESULTS_PATH) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+
+def load_benchmark_report(path: str = RESULTS_PATH) -> dict:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError):
+        return {}
@@ -0,0 +1,133 @@
+# core/utils/chunker.py — streaming document chunker for local search
+#
+# Files are read incrementally by core/utils/extraction.py (PDFs page by page, text/logs in
+# fixed-size blocks, tables in row blocks) and cut with a token-budget sliding window, so
+# `stream_chunks` yields chunks while the file is still being read and memory stays flat no
+# matter how large the source is.
+
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from core.utils.extraction import iter_segments
+
+CHUNK_TOKENS = 200      # all-MiniLM-L6-v2 truncates at 256 word pieces; leave headroom
+OVERLAP_TOKENS = 40
+
+# a piece is a run of whitespace followed by a word, so "".join(pieces) rebuilds the text exactly
+PIECE_PATTERN = re.compile(r"\s*\S+")
+
+
+@dataclass
+class Chunk:
+    """Same shape as a LangChain Document (page_content + metadata), without the import."""
+    page_content: str
+    metadata: dict = field(default_factory=dict)
+
+
+# ── Token counting ──────────────────────────────────
+def _word_count(piece: str) -> int:
+    return 1
+
+
+def token_counter(embedder=None):
+    """
+    Returns a piece -> token count function. Uses the embedder's own tokenizer when it exposes one
+    (OnnxEmbedder.count_tokens, or HuggingFaceEmbeddings.client, a SentenceTransformer with
+    .tokenizer), else counts words.
+    """
+    counter = getattr(embedder, "count_tokens", None)
+    if counter is None:
+        tokenizer = getattr(getattr(embedder, "client", None), "tokenizer", None)
+        if tokenizer is None or not hasattr(tokenizer, "tokenize"):
+            return _word_count
+        counter = lambda word: len(tokenizer.tokenize(word))  # noqa: E731
+
+    @lru_cache(maxsize=65536)
+    def count(word: str) -> int:
+        return max(1, counter(word))
+
+    return lambda piece: count(piece.strip())
+
+
+# ── Sliding window ──────────────────────────────────
+def _iter_pieces(segments):
+    """
+    Splits segments into word pieces. A word cut by a block boundary, or whitespace trailing a
+    segment, is carried into the next segment with the same metadata.
+    """
+    carry, carry_meta = "", None
+    for text, metadata in segments:
+        if metadata != carry_meta:
+            if carry.strip():
+                yield carry, carry_meta
+            carry = ""
+        text = carry + text
+        carry, carry_meta = "", metadata
+        end = 0
+        pending = None
+        for match in PIECE_PATTERN.finditer(text):
+            if pending is not None:
+                yield pending, metadata
+            pending = match.group()
+            end = match.end()
+        if pending is not None:
+            if end == len(text):
+                carry = pending  # may continue in the next block
+            else:
+                yield pending, metadata
+                carry = text[end:]
+        else:
+            carry = text
+    if carry.strip():
+        yield carry, carry_meta
+
+
+def window_chunks(segments, chunk_tokens=CHUNK_TOKENS, overlap_tokens=OVERLAP_TOKENS, count_tokens=_word_count):
+    """
+    Packs word pieces into chunks of about `chunk_tokens` tokens, each starting with the last
+    `overlap_tokens` of the previous one. Prefers to cut at a paragraph break once the window is
+    three-quarters full, and starts a fresh window whenever the segment metadata (page, section, rows) changes.
+    """
+    overlap_tokens = min(overlap_tokens, chunk_tokens // 2)
+    window = deque()
+    total = 0
+    current_meta = None
+    fresh = 0  # tokens added since the last emitted chunk, so a pure-overlap tail isn't re-emitted
+
+    def emit():
+        text = "".join(piece for piece, _ in window).strip()
+        return Chunk(text, dict(current_meta)) if text else None
+
+    for piece, metadata in _iter_pieces(segments):
+        if metadata != current_meta:
+            if fresh and (chunk := emit()):
+                yield chunk
+            window.clear()
+            total = fresh = 0
+            current_meta = metadata
+        elif fresh and total >= chunk_tokens * 3 // 4 and "\n\n" in piece[: len(piece) - len(piece.lstrip())]:
+            if chunk := emit():
+                yield chunk
+            window.clear()
+            total = fresh = 0
+
+        n = count_tokens(piece)
+        window.append((piece, n))
+        total += n
+        fresh += n
+        if total >= chunk_tokens:
+            if chunk := emit():
+                yield chunk
+            while window and total > overlap_tokens:
+                total -= window.popleft()[1]
+            fresh = 0
+
+    if fresh and (chunk := emit()):
+        yield chunk
+
+
+def stream_chunks(file_path: str, chunk_tokens=CHUNK_TOKENS, overlap_tokens=OVERLAP_TOKENS, embedder=None):
+    """Yields Chunk objects for `file_path` as it is read; metadata always carries 'source'."""
+    return window_chunks(iter_segments(file_path), chunk_tokens, overlap_tokens, token_counter(embedder))
@@ -0,0 +1,249 @@
+# core/utils/config_store.py — one in-memory config.json per process, written in the background
+#
+# Every ModelLoader (and the settings dialog through it) shares the ConfigStore for its path, so
+# there is one copy of the settings and nothing re-reads the file. Changes go through
+# store.set("generation.temperature", 0.8) / store.update({...}): subscribers are told which keys
+# changed, and the file is rewritten at most once per `debounce` seconds, to a temp file that is
+# then renamed over config.json, so a crash never leaves half a file behind. set() with an
+# unchanged value does nothing, so startup doesn't rewrite the file.
+#
+# At load, values of the wrong type are dropped (with a warning) and missing keys are filled
+# from DEFAULT_CONFIG without touching anything the user set.
+
+import atexit
+import copy
+import json
+import os
+import threading
+
+DEFAULT_CONFIG = {
+    "default_model": {
+        "type": "ollama",
+        "model_name": "mistral:latest"
+    },
+    "generation": {
+        "temperature": 0.7,
+        "max_tokens": 512
+    },
+    "performance": {
+        "backend": "auto",
+        "last_benchmark": {
+            "cpu": None,
+            "gpu": None
+        }
+    }
+}
+
+NUMBER = (int, float)
+# dotted key -> (accepted types, allowed values or None); keys not listed here are kept as they are
+SCHEMA = {
+    "default_model": (dict, None),
+    "default_model.type": (str, ("ollama", "llama.cpp", "huggingface")),
+    "default_model.model_name": (str, None),
+    "default_model.model_path": (str, None),
+    "generation": (dict, None),
+    "generation.temperature": (NUMBER, None),
+    "generation.max_tokens": (int, None),
+    "generation.keep_context": (bool, None),
+    "performance": (dict, None),
+    "performance.backend": (str, ("auto", "cpu", "gpu")),
+    "performance.last_benchmark": (dict, None),
+    "performance.num_thread": ((int, type(None)), None),
+    "performance.keep_alive": ((str, int), None),
+    "performance.max_resident_models": (int, None),
+    "ollama_url": (str, None),
+    "ui_color": (str, None),
+    "search": (dict, None),
+    "telemetry": (dict, None),
+}
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def _type_ok(value, types) -> bool:
+    types = types if isinstance(types, tuple) else (types,)
+    if isinstance(value, bool) and bool not in types:
+        return False  # True is an int to isinstance, but not a valid max_tokens
+    return isinstance(value, types)
+
+
+def validate(config: dict, schema: dict = SCHEMA, prefix: str = "") -> list[str]:
+    """Drops values that don't match `schema` (so defaults replace them); returns what was dropped."""
+    problems = []
+    for key in list(config):
+        path = prefix + key
+        if path not in schema:
+            continue
+        types, allowed = schema[path]
+        value = config[key]
+        if not _type_ok(value, types) or (allowed is not None and value not in allowed):
+            problems.append(f"{path}={value!r}")
+            del config[key]
+        elif isinstance(value, dict):
+            problems += validate(value, schema, path + ".")
+    return problems
+
+
+def merge_defaults(config: dict, defaults: dict) -> dict:
+    """Adds missing keys from `defaults`, recursing into sections; existing values always win."""
+    for key, value in defaults.items():
+        if key not in config:
+            config[key] = copy.deepcopy(value)
+        elif isinstance(config[key], dict) and isinstance(value, dict):
+            merge_defaults(config[key], value)
+    return config
+
+
+class ConfigStore:
+    def __init__(self, path: str = "config.json", defaults: dict | None = None, debounce: float = 0.5):
+        self.path = path
+        self.defaults = DEFAULT_CONFIG if defaults is None else defaults
+        self.debounce = debounce
+        self.load_error = None  # set when config.json was unreadable and defaults were used
+        self.writes = 0
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._timer = None
+        self._pending = False  # a change()/update() is waiting to be written
+        self._written = None  # text of the last write, so identical saves are skipped
+        self.data = self.load()
+
+    # ── Load ────────────────────────────────────────────
+    def load(self) -> dict:
+        if not os.path.exists(self.path):
+            config = copy.deepcopy(self.defaults)
+            self._write(config)
+            return config
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+            if not isinstance(config, dict):
+                raise ValueError("expected a JSON object at the top level")
+        except (json.JSONDecodeError, OSError, ValueError) as e:
+            self.load_error = str(e)
+            print(f"⚠️ [Config] Failed to load {self.path}: {e}. A default config will be created.")
+            try:
+                os.replace(self.path, self.path + ".bad")  # keep the user's file for fixing by hand
+            except OSError:
+                pass
+            config = copy.deepcopy(self.defaults)
+            self._write(config)
+            return config
+
+        dropped = validate(config)
+        if dropped:
+            print(f"⚠️ [Config] Ignoring invalid settings in {self.path}: {', '.join(dropped)}")
+        merge_defaults(config, self.defaults)
+        self._written = json.dumps(config, indent=2)  # filled-in defaults alone don't rewrite the file
+        return config
+
+    # ── Read / change ───────────────────────────────────
+    def get(self, key: str, default=None):
+        """Value at a dotted key such as "performance.backend"."""
+        node = self.data
+        for part in key.split("."):
+            if not isinstance(node, dict) or part not in node:
+                return default
+            node = node[part]
+        return node
+
+    def set(self, key: str, value) -> bool:
+        """Sets one dotted key; returns False (and writes nothing) when the value is unchanged."""
+        return bool(self.update({key: value}))
+
+    def update(self, changes: dict) -> list[str]:
+        """Applies several dotted-key changes, notifies once and schedules one write."""
+        changed = []
+        with self._lock:
+            for key, value in changes.items():
+                *sections, name = key.split(".")
+                node = self.data
+                for part in sections:
+                    if not isinstance(node.get(part), dict):
+                        node[part] = {}
+                    node = node[part]
+                if name in node and node[name] == value:
+                    continue
+                node[name] = value
+                changed.append(key)
+        if changed:
+            self.changed(*changed)
+        return changed
+
+    def changed(self, *keys):
+        """For callers that edited `data` in place: notifies subscribers and schedules a write."""
+        for listener in list(self._listeners):
+            try:
+                listener(keys)
+            except Exception as e:
+                print(f"⚠️ [Config] Change listener failed: {e}")
+        self.save()
+
+    def subscribe(self, listener):
+        """`listener(keys)` is called after every change with the dotted keys that changed."""
+        self._listeners.append(listener)
+        return listener
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    # ── Write ───────────────────────────────────────────
+    def save(self):
+        """Schedules a write; changes within `debounce` seconds of each other share it."""
+        with self._lock:
+            if self.debounce <= 0:
+                self._write(self.data)
+                return
+            self._pending = True
+            if self._timer is None:
+                self._timer = threading.Timer(self.debounce, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """
+        Writes any pending change now (also runs at interpreter exit). Edits to `data` that never
+        went through changed()/update() are not pending, so they are not written.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._pending:
+                self._pending = False
+                self._write(self.data)
+
+    def _write(self, config: dict):
+        with self._lock:
+            text = json.dumps(config, indent=2)
+            if text == self._written:
+                return
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(text)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"⚠️ [Config] Could not save {self.path}: {e}")
+                return
+            self._written = text
+            self.writes += 1
+
+
+def get_store(path: str = "config.json") -> ConfigStore:
+    """The process-wide store for `path`, loaded on first use."""
+    key = os.path.abspath(path)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = ConfigStore(path)
+        return _stores[key]
+
+
+@atexit.register
+def _flush_all():
+    for store in list(_stores.values()):
+        store.flush()
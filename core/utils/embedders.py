@@ -0,0 +1,171 @@
+# core/utils/embedders.py — pluggable text embedders for local search
+#
+# An embedder is anything with embed_documents(texts) -> list of vectors and embed_query(text).
+# create_embedder() builds one from the "search.embedder" section of config.json:
+#   {"backend": "huggingface"}                  LangChain + sentence-transformers on PyTorch (default)
+#   {"backend": "onnx", "quantize": true}       ONNX Runtime, optionally int8 dynamic-quantized
+# Both run the same all-MiniLM-L6-v2 weights with mean pooling + L2 normalisation, so stores
+# built with one backend can be searched with the other (see benchmarks/embedder_check.py).
+
+import importlib.util
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+ONNX_CACHE_DIR = os.path.join("models", "onnx")
+MAX_SEQ_LENGTH = 256  # sentence-transformers' limit for this model
+
+
+def create_embedder(settings: dict | None = None):
+    settings = settings or {}
+    backend = settings.get("backend", "huggingface")
+    model_name = settings.get("model_name", DEFAULT_MODEL)
+    if backend == "onnx":
+        if importlib.util.find_spec("onnxruntime") is None:
+            raise ImportError(
+                "The ONNX embedder backend needs onnxruntime: pip install onnxruntime "
+                "(and onnx for \"quantize\": true), or set search.embedder.backend to \"huggingface\""
+            )
+        return OnnxEmbedder(
+            model_name,
+            quantize=settings.get("quantize", False),
+            workers=settings.get("workers"),
+            max_batch_tokens=settings.get("max_batch_tokens", OnnxEmbedder.MAX_BATCH_TOKENS),
+        )
+    if backend == "huggingface":
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+        return HuggingFaceEmbeddings(model_name=model_name, model_kwargs={"device": settings.get("device", "cpu")})
+    raise ValueError(f"Unknown embedder backend '{backend}' (expected huggingface or onnx)")
+
+
+# ── ONNX export ─────────────────────────────────────
+def export_onnx(model_name: str, model_dir: str, quantize: bool = False) -> str:
+    """
+    Exports the transformer to ONNX (once; needs torch + transformers) and optionally writes
+    an int8 dynamic-quantized copy. Returns the path of the model to load.
+    """
+    fp32_path = os.path.join(model_dir, "model.onnx")
+    int8_path = os.path.join(model_dir, "model.int8.onnx")
+    if not os.path.exists(fp32_path):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        print(f"📦 [Embedder] Exporting {model_name} to ONNX (one-time)...")
+        os.makedirs(model_dir, exist_ok=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        tokenizer.save_pretrained(model_dir)  # writes tokenizer.json for the runtime side
+        model = AutoModel.from_pretrained(model_name).eval()
+        sample = tokenizer(["export sample"], return_tensors="pt")
+        inputs = ("input_ids", "attention_mask", "token_type_ids")
+        axes = {name: {0: "batch", 1: "sequence"} for name in inputs + ("last_hidden_state",)}
+        tmp_path = fp32_path + ".tmp"
+        with torch.no_grad():
+            torch.onnx.export(model, tuple(sample[name] for name in inputs), tmp_path, input_names=list(inputs),
+                              output_names=["last_hidden_state"], dynamic_axes=axes, opset_version=14)
+        os.replace(tmp_path, fp32_path)
+    if not quantize:
+        return fp32_path
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print("📦 [Embedder] Writing int8 quantized model...")
+        quantize_dynamic(fp32_path, int8_path + ".tmp", weight_type=QuantType.QInt8)
+        os.replace(int8_path + ".tmp", int8_path)
+    return int8_path
+
+
+# ── ONNX Runtime embedder ───────────────────────────
+class OnnxEmbedder:
+    """
+    all-MiniLM-L6-v2 on ONNX Runtime. Texts are sorted by token length and packed into
+    batches of at most MAX_BATCH_TOKENS padded tokens, so short chunks aren't padded to the
+    longest one; batches run concurrently on a persistent thread pool (session.run releases the GIL).
+    """
+    MAX_BATCH_TOKENS = 8192
+    MAX_BATCH_SIZE = 128
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, quantize: bool = False, workers: int | None = None,
+                 max_batch_tokens: int = MAX_BATCH_TOKENS, model_dir: str | None = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_name = model_name
+        self.model_dir = model_dir or os.path.join(ONNX_CACHE_DIR, model_name.replace("/", "__"))
+        self.model_path = export_onnx(model_name, self.model_dir, quantize)
+        self.max_batch_tokens = max_batch_tokens
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(self.model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.no_padding()
+
+        cpus = os.cpu_count() or 1
+        self.workers = workers or max(1, min(4, cpus // 2))
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = max(1, cpus // self.workers)  # split cores between the batch workers
+        self.session = ort.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="onnx-embed")
+
+    def count_tokens(self, text: str) -> int:
+        """Word pieces without special tokens; used by the chunker to size windows."""
+        return len(self.tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def _batches(self, encodings):
+        order = sorted(range(len(encodings)), key=lambda i: len(encodings[i].ids))
+        batch = []
+        for i in order:
+            length = len(encodings[i].ids)  # ascending, so this is the batch's padded length
+            if batch and ((len(batch) + 1) * length > self.max_batch_tokens or len(batch) >= self.MAX_BATCH_SIZE):
+                yield batch
+                batch = []
+            batch.append(i)
+        if batch:
+            yield batch
+
+    def _run_batch(self, encodings, batch):
+        length = max(len(encodings[i].ids) for i in batch)
+        ids = np.zeros((len(batch), length), dtype=np.int64)
+        mask = np.zeros((len(batch), length), dtype=np.int64)
+        types = np.zeros((len(batch), length), dtype=np.int64)
+        for row, i in enumerate(batch):
+            enc = encodings[i]
+            n = len(enc.ids)
+            ids[row, :n] = enc.ids
+            mask[row, :n] = enc.attention_mask
+            types[row, :n] = enc.type_ids
+        feeds = {"input_ids": ids, "attention_mask": mask, "token_type_ids": types}
+        hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+        # mean pooling over real tokens, then L2 normalisation (what sentence-transformers does)
+        weights = mask[:, :, None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        return batch, pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    def embed_array(self, texts) -> np.ndarray:
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        encodings = self.tokenizer.encode_batch(texts)
+        batches = list(self._batches(encodings))
+        if len(batches) == 1:
+            results = [self._run_batch(encodings, batches[0])]
+        else:
+            results = self.pool.map(lambda b: self._run_batch(encodings, b), batches)
+        out = None
+        for batch, vectors in results:
+            if out is None:
+                out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            out[batch] = vectors
+        return out
+
+    def embed_documents(self, texts) -> list[list[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_array([text])[0].tolist()
+
+    def close(self):
+        self.pool.shutdown(wait=False)
@@ -0,0 +1,225 @@
+# core/utils/extraction.py — one text extraction engine for every supported format
+#
+# iter_segments(path) yields (text, metadata) segments in document order; metadata always has
+# "source" and, where the format has one, an address:
+#   PDF         one segment per page, {"page": n}; large files are extracted by a process pool
+#   CSV/TSV     blocks of SEGMENT_ROWS rows, {"rows": "2-257"} (row 1 is the header)
+#   XLSX/XLS    the same per sheet, {"sheet": name, "rows": ...}
+#   Markdown    one segment per line, {"section": "Title > Subsection"}
+#   DOCX, XML   paragraphs / element text; anything else is read as text in BLOCK_CHARS blocks
+# Only a bounded window of the file is in memory at once. file_loader.load_file joins the
+# segments; the chunker (core/utils/chunker.py) windows them into search chunks.
+
+import csv
+import multiprocessing
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+BLOCK_CHARS = 1 << 18   # text read size; only one block is held in memory at a time
+ROW_CHAR_LIMIT = 4000   # characters kept per table row, guards against runaway cells
+SEGMENT_ROWS = 256      # table rows per segment
+
+PDF_PAGES_PER_TASK = 8       # pages one worker extracts per task
+PDF_PARALLEL_MIN_PAGES = 32  # smaller PDFs aren't worth the process hop
+PDF_WORKERS = min(4, os.cpu_count() or 1)
+
+HEADER_PATTERN = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+
+
+# ── Text, Markdown, DOCX ────────────────────────────
+def _iter_text_blocks(file_path, source):
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        while True:
+            block = f.read(BLOCK_CHARS)
+            if not block:
+                break
+            yield block, {"source": source}
+
+
+def _iter_markdown(file_path, source):
+    # sections are tracked line by line so a header change starts a fresh window
+    headers = {}
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            match = HEADER_PATTERN.match(line)
+            if match:
+                level = len(match.group(1))
+                headers = {k: v for k, v in headers.items() if k < level}
+                headers[level] = match.group(2)
+            metadata = {"source": source}
+            if headers:
+                metadata["section"] = " > ".join(headers[k] for k in sorted(headers))
+            yield line, metadata
+
+
+def _iter_docx_paragraphs(file_path, source):
+    import docx
+
+    for paragraph in docx.Document(file_path).paragraphs:
+        if paragraph.text.strip():
+            yield paragraph.text + "\n\n", {"source": source}
+
+
+def _iter_xml_text(file_path, source):
+    # iterparse keeps only the open element path; finished subtrees are cleared as we go
+    from xml.etree.ElementTree import iterparse
+
+    metadata = {"source": source}
+    for _, elem in iterparse(file_path, events=("end",)):
+        parts = [elem.text] + [child.tail for child in elem]  # text around children comes after them
+        text = " ".join(part.strip() for part in parts if part and part.strip())
+        if text:
+            yield text + "\n", metadata
+        tail = elem.tail  # the parent still needs it; clear() would drop it
+        elem.clear()
+        elem.tail = tail
+
+
+# ── PDF ─────────────────────────────────────────────
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _extract_pdf_pages(file_path: str, start: int, stop: int) -> list[str]:
+    """Worker side: text of pages [start, stop). Each worker opens its own document handle."""
+    import fitz  # PyMuPDF
+
+    with fitz.open(file_path) as pdf:
+        return [pdf[i].get_text() for i in range(start, stop)]
+
+
+def _pool():
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # spawn, not fork: the GUI and server have live threads a forked child would inherit
+            _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pdf_pool
+
+
+def _iter_pdf_pages(file_path, source):
+    import fitz  # PyMuPDF
+
+    with fitz.open(file_path) as pdf:
+        page_count = pdf.page_count
+        if page_count < PDF_PARALLEL_MIN_PAGES or PDF_WORKERS < 2:
+            for number, page in enumerate(pdf, start=1):
+                yield page.get_text(), {"source": source, "page": number}
+            return
+
+    # page ranges go to the pool, but only 2 per worker are in flight, so a 1000-page PDF
+    # never has more than a few dozen pages of text waiting; results are yielded in order
+    pool = _pool()
+    ranges = iter(range(0, page_count, PDF_PAGES_PER_TASK))
+    pending = deque()
+
+    def submit():
+        start = next(ranges, None)
+        if start is not None:
+            stop = min(start + PDF_PAGES_PER_TASK, page_count)
+            pending.append((start, pool.submit(_extract_pdf_pages, file_path, start, stop)))
+
+    for _ in range(PDF_WORKERS * 2):
+        submit()
+    try:
+        while pending:
+            start, future = pending.popleft()
+            pages = future.result()
+            submit()
+            for offset, text in enumerate(pages):
+                yield text, {"source": source, "page": start + offset + 1}
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+def shutdown():
+    """Stops the PDF worker processes, if any were started."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(wait=False, cancel_futures=True)
+            _pdf_pool = None
+
+
+# ── Tables ──────────────────────────────────────────
+def _cell(value) -> str:
+    return "" if value is None else str(value).strip()
+
+
+def _iter_row_blocks(rows, source, extra=None):
+    """
+    Formats rows as "column: value; ..." lines and groups them SEGMENT_ROWS at a time.
+    The first non-empty row is the header; row numbers are 1-based like a spreadsheet's.
+    """
+    header = None
+    lines, first, last = [], None, None
+    for number, row in enumerate(rows, start=1):
+        cells = [_cell(value) for value in row]
+        if not any(cells):
+            continue
+        if header is None:
+            header = cells
+            continue
+        names = header if len(header) >= len(cells) else header + [f"col{i}" for i in range(len(header), len(cells))]
+        text = "; ".join(f"{name}: {cell}" for name, cell in zip(names, cells) if cell)
+        lines.append(text[:ROW_CHAR_LIMIT] + "\n")
+        first, last = first or number, number
+        if len(lines) >= SEGMENT_ROWS:
+            yield "".join(lines), dict(extra or {}, source=source, rows=f"{first}-{last}")
+            lines, first = [], None
+    if lines:
+        yield "".join(lines), dict(extra or {}, source=source, rows=f"{first}-{last}")
+
+
+def _iter_csv_rows(file_path, source):
+    delimiter = "\t" if file_path.lower().endswith(".tsv") else ","
+    with open(file_path, "r", encoding="utf-8", errors="replace", newline="") as f:
+        yield from _iter_row_blocks(csv.reader(f, delimiter=delimiter), source)
+
+
+def _iter_xlsx_rows(file_path, source):
+    import openpyxl
+
+    # read_only streams rows from the sheet XML instead of building the whole workbook
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            yield from _iter_row_blocks(sheet.iter_rows(values_only=True), source, {"sheet": sheet.title})
+    finally:
+        workbook.close()
+
+
+def _iter_xls_rows(file_path, source):
+    # legacy .xls has no streaming reader; pandas (xlrd) loads one sheet at a time
+    import pandas as pd
+
+    with pd.ExcelFile(file_path) as workbook:
+        for name in workbook.sheet_names:
+            frame = workbook.parse(name, header=None, dtype=str)
+            rows = frame.itertuples(index=False, name=None)
+            yield from _iter_row_blocks(([None if v != v else v for v in row] for row in rows), source,
+                                        {"sheet": name})
+
+
+READERS = {
+    ".pdf": _iter_pdf_pages,
+    ".docx": _iter_docx_paragraphs,
+    ".csv": _iter_csv_rows,
+    ".tsv": _iter_csv_rows,
+    ".xlsx": _iter_xlsx_rows,
+    ".xls": _iter_xls_rows,
+    ".xml": _iter_xml_text,
+    ".md": _iter_markdown,
+    ".markdown": _iter_markdown,
+}
+
+
+def iter_segments(file_path: str):
+    """Yields (text, metadata) segments of `file_path` in document order."""
+    ext = os.path.splitext(file_path)[1].lower()
+    reader = READERS.get(ext, _iter_text_blocks)  # txt, log and anything else readable as text
+    return reader(file_path, os.path.basename(file_path))
@@ -11,7 +11,7 @@ def run_import_dialog(parent, search_mgr: LocalSearchManager):
         parent,
         "Import Content",
         "",
-        "Supported Files (*.txt *.md *.markdown *.pdf);;All Files (*)"
+        "Supported Files (*.txt *.md *.markdown *.pdf *.docx *.csv *.tsv *.xlsx *.xls *.xml *.log);;All Files (*)"
     )
     if not file_path:
         return
@@ -2,12 +2,8 @@
 
 import os
 import shutil
-import fitz  # PyMuPDF
-import docx
-import csv
-import pandas as pd
-from xml.etree import ElementTree
-from bs4 import BeautifulSoup
+
+from core.utils.extraction import iter_segments
 
 SUPPORTED_EXTENSIONS = [".txt", ".md", ".log", ".pdf", ".docx", ".csv", ".xls", ".xlsx", ".xml"]
 
@@ -33,35 +29,14 @@ def ingest_file(filepath: str) -> str:
 
 def load_file(filepath: str) -> str:
     """
-    Loads and returns the text content of a file. Supports PDF, DOCX, TXT, CSV, XML, etc.
+    Loads and returns the text content of a file. Supports PDF, DOCX, TXT, CSV, XLSX, XML, etc.
+    Text comes from core.utils.extraction, the same page/row segments local search indexes;
+    use iter_segments directly for large files instead of building one string.
     """
-    ext = os.path.splitext(filepath)[1].lower()
+    if not is_supported(filepath):
+        return ""
     try:
-        if ext in [".txt", ".md", ".log"]:
-            with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
-                return f.read()
-
-        elif ext == ".pdf":
-            text = ""
-            with fitz.open(filepath) as doc:
-                for page in doc:
-                    text += page.get_text()
-            return text
-
-        elif ext == ".docx":
-            doc = docx.Document(filepath)
-            return "\n".join([para.text for para in doc.paragraphs])
-
-        elif ext in [".csv", ".xls", ".xlsx"]:
-            df = pd.read_csv(filepath) if ext == ".csv" else pd.read_excel(filepath)
-            return df.to_string(index=False)
-
-        elif ext == ".xml":
-            tree = ElementTree.parse(filepath)
-            root = tree.getroot()
-            return ElementTree.tostring(root, encoding="unicode", method="text")
-
+        return "".join(text for text, _ in iter_segments(filepath))
     except Exception as e:
         print(f"[FileLoader] Failed to load {filepath}: {e}")
-
     return ""
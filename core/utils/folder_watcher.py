@@ -0,0 +1,241 @@
+# core/utils/folder_watcher.py — keeps local search in sync with watched folders
+#
+# Polls the folders for (mtime, size) snapshots, so it needs no OS file-event service. A file
+# that is new, changed or deleted waits until it has been quiet for `debounce` seconds (editors
+# and copies write in bursts), then goes to a single low-priority worker that re-imports it in
+# place of its old chunks (or drops them). What is indexed is remembered in <store>.watch.json,
+# so restarts only pick up what changed while the app was closed.
+#
+#   "search": {"watch": {"enabled": true, "folders": ["D:/notes"], "interval": 2, "debounce": 2}}
+#
+# plugins/local_search/docs (where file_loader.ingest_file copies files) is always watched.
+
+import json
+import os
+import queue
+import threading
+import time
+
+from core.utils import telemetry
+from core.utils.file_loader import DOCS_DIR, SUPPORTED_EXTENSIONS
+from core.utils.search_collection import DEFAULT_COLLECTION, collection_stem, source_key
+
+
+def _lower_priority():
+    # Linux applies setpriority to a single thread when given its native id; elsewhere this is a no-op
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+    except (AttributeError, OSError):
+        pass
+
+
+class FolderWatcher:
+    def __init__(self, manager, folders=(), collection: str = DEFAULT_COLLECTION, interval: float = 2.0,
+                 debounce: float = 2.0, pause: float = 0.2, extensions=None):
+        self.manager = manager
+        self.folders = list(dict.fromkeys(os.path.abspath(f) for f in (DOCS_DIR, *folders)))
+        self.collection = collection
+        self.interval = interval
+        self.debounce = debounce
+        self.pause = pause  # idle time between files so foreground searches keep the CPU
+        self.extensions = set(extensions or SUPPORTED_EXTENSIONS)
+        self.state_path = collection_stem(manager.persist_path, collection) + ".watch.json"
+
+        self.indexed = self._load_state()  # path -> (mtime_ns, size) as last indexed
+        self._seen = dict(self.indexed)    # path -> (mtime_ns, size) at the last poll
+        self._changed_at = {}              # path -> (monotonic time of last change, wall time first seen)
+        self._queue = queue.Queue()
+        self._queued = {}                  # path -> wall time the change was first seen
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+        self.ingested = 0
+        self.removed = 0
+        self.failed = 0
+        self.last_lag = None
+
+    # ── State ───────────────────────────────────────────
+    def _load_state(self) -> dict:
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, "r", encoding="utf-8") as f:
+                    return {path: tuple(stat) for path, stat in json.load(f).items()}
+            except Exception as e:
+                print(f"⚠️ [Watcher] Ignoring unreadable {self.state_path}: {e}")
+        return {}
+
+    def _adopt_imported(self, snapshot: dict):
+        """
+        First run without a state file: files already imported by hand (same path, imported after
+        their last modification) count as indexed instead of being imported a second time.
+        """
+        times = self.manager.collection(self.collection).source_times()
+        for path, stat in snapshot.items():
+            imported_at = times.get(source_key(path))
+            if imported_at is not None and imported_at * 1e9 >= stat[0]:
+                self.indexed[path] = stat
+        self._seen = dict(self.indexed)
+        self._save_state()
+
+    def _save_state(self):
+        with self._lock:
+            state = dict(self.indexed)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    # ── Polling ─────────────────────────────────────────
+    def scan(self) -> dict:
+        """path -> (mtime_ns, size) for every supported file under the watched folders."""
+        snapshot = {}
+        for folder in self.folders:
+            if not os.path.isdir(folder):
+                # unplugged drive or unmounted share: keep what we knew rather than unindexing it all
+                prefix = os.path.join(folder, "")
+                snapshot.update((path, stat) for path, stat in self._seen.items() if path.startswith(prefix))
+                continue
+            for root, _, files in os.walk(folder):
+                for name in files:
+                    if os.path.splitext(name)[1].lower() not in self.extensions:
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue  # deleted between listing and stat
+                    snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def poll(self):
+        """One scan: records changes, and queues files that have been quiet for `debounce` seconds."""
+        snapshot = self.scan()
+        now, wall = time.monotonic(), time.time()
+        with self._lock:
+            for path in snapshot.keys() | self._seen.keys():
+                if snapshot.get(path) != self._seen.get(path):
+                    first_seen = self._changed_at.get(path, (now, wall))[1]
+                    self._changed_at[path] = (now, first_seen)
+            self._seen = snapshot
+            for path, (changed, first_seen) in list(self._changed_at.items()):
+                if now - changed < self.debounce:
+                    continue
+                del self._changed_at[path]
+                if snapshot.get(path) == self.indexed.get(path) or path in self._queued:
+                    continue  # changed back, or the worker will read the latest version anyway
+                self._queued[path] = first_seen
+                self._queue.put(path)
+
+    def _poll_loop(self):
+        try:
+            snapshot = self.scan()
+            with self.manager.write_lock:
+                # chunks from stores that keyed sources by file name move onto these files' paths
+                self.manager.collection(self.collection).adopt_paths(snapshot)
+            if not os.path.exists(self.state_path):
+                self._adopt_imported(snapshot)
+        except Exception as e:
+            print(f"⚠️ [Watcher] Could not read the existing index: {e}")
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"⚠️ [Watcher] Scan failed: {e}")
+            self._stop.wait(self.interval)
+
+    # ── Ingestion ───────────────────────────────────────
+    def _ingest(self, path: str):
+        try:
+            stat = os.stat(path)
+            stat = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stat = None
+        name = os.path.basename(path)
+        with telemetry.span("search.watch.ingest", action="remove" if stat is None else "import"):
+            # chunks are keyed by path, so a changed file replaces its old chunks in one step
+            if stat is None:
+                self.manager.remove_document(path, self.collection)
+                print(f"🗑️ [Watcher] Removed {name} from the index")
+                self.removed += 1
+            else:
+                self.manager.import_document(path, self.collection, replace=True)
+                print(f"📥 [Watcher] Indexed {name}")
+                self.ingested += 1
+        with self._lock:
+            if stat is None:
+                self.indexed.pop(path, None)
+            else:
+                self.indexed[path] = stat  # stat from before the import: a later write re-triggers
+        self._save_state()
+
+    def _work_loop(self):
+        _lower_priority()
+        while not self._stop.is_set():
+            try:
+                path = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self._ingest(path)
+            except Exception as e:
+                self.failed += 1
+                print(f"⚠️ [Watcher] Failed to index {os.path.basename(path)}: {e}")
+            finally:
+                with self._lock:
+                    first_seen = self._queued.pop(path, None)
+                if first_seen is not None:
+                    self.last_lag = time.time() - first_seen
+                    telemetry.record("search.watch.lag", self.last_lag * 1000.0, "ms")
+                self._queue.task_done()
+            self._stop.wait(self.pause)
+
+    # ── Lifecycle / status ──────────────────────────────
+    def start(self) -> "FolderWatcher":
+        os.makedirs(DOCS_DIR, exist_ok=True)
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._poll_loop, name="watch-poll", daemon=True),
+            threading.Thread(target=self._work_loop, name="watch-ingest", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        print(f"👀 [Watcher] Watching {len(self.folders)} folder(s) for collection '{self.collection}'")
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stats(self) -> dict:
+        """Backlog and lag: `backlog` counts files waiting out the debounce plus files queued for the worker."""
+        now = time.time()
+        with self._lock:
+            pending = [first_seen for _, first_seen in self._changed_at.values()] + list(self._queued.values())
+            return {
+                "folders": self.folders,
+                "collection": self.collection,
+                "backlog": len(pending),
+                "queued": len(self._queued),
+                "oldest_pending_s": now - min(pending) if pending else 0.0,
+                "last_lag_s": self.last_lag,
+                "indexed_files": len(self.indexed),
+                "ingested": self.ingested,
+                "removed": self.removed,
+                "failed": self.failed,
+            }
+
+
+def start_watcher(manager, settings: dict | None = None):
+    """Starts a FolderWatcher from the "search.watch" config section; None when disabled."""
+    settings = settings or {}
+    if not settings.get("enabled", True):
+        return None
+    return FolderWatcher(
+        manager,
+        folders=settings.get("folders", []),
+        collection=settings.get("collection", DEFAULT_COLLECTION),
+        interval=settings.get("interval", 2.0),
+        debounce=settings.get("debounce", 2.0),
+    ).start()
@@ -0,0 +1,148 @@
+# core/utils/lexical_index.py — BM25 inverted index for local search
+#
+# Catches what MiniLM embeddings miss: exact identifiers, error codes, function names.
+# Postings live in typed arrays (doc id, term frequency) so scoring a term is one NumPy pass.
+# Persistence is an append-only JSONL log of per-chunk term counts; importing a file appends
+# only the new chunks, loading replays the log, and removing chunks rewrites it.
+
+import json
+import os
+import re
+from array import array
+from collections import Counter
+
+import numpy as np
+
+# identifiers keep their inner dots/dashes/colons ("os.path.join", "ERR-504", "0x8007:0005");
+# the parts are indexed too so "join" still matches "os.path.join"
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_]+(?:[.\-:/][A-Za-z0-9_]+)*")
+PART_PATTERN = re.compile(r"[A-Za-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        parts = PART_PATTERN.findall(token)
+        if len(parts) > 1 or (parts and parts[0] != token):
+            tokens.extend(parts)
+    return tokens
+
+
+class LexicalIndex:
+    def __init__(self, persist_path=None, k1: float = 1.5, b: float = 0.75):
+        self.persist_path = persist_path
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # term -> (array('I') doc ids, array('f') term frequencies)
+        self.doc_lens = array("I")
+        self._np_cache = {}
+        if persist_path and os.path.exists(persist_path):
+            self._load()
+
+    def __len__(self):
+        return len(self.doc_lens)
+
+    def _load(self):
+        valid = 0
+        with open(self.persist_path, "rb") as f:
+            for line in f:
+                try:
+                    counts = json.loads(line)
+                except ValueError:
+                    break
+                self._add_counts(counts)
+                valid += len(line)
+        if valid < os.path.getsize(self.persist_path):
+            # torn tail from an interrupted import; drop it so appends stay parseable
+            with open(self.persist_path, "r+b") as f:
+                f.truncate(valid)
+
+    def _add_counts(self, counts: dict):
+        doc_id = len(self.doc_lens)
+        for term, tf in counts.items():
+            ids, tfs = self.postings.setdefault(term, (array("I"), array("f")))
+            ids.append(doc_id)
+            tfs.append(tf)
+        self.doc_lens.append(sum(counts.values()))
+
+    def add(self, texts):
+        """Indexes `texts` as the next doc ids and appends their counts to the log."""
+        batch = [dict(Counter(tokenize(text))) for text in texts]
+        self._np_cache.clear()  # NumPy views pin the arrays; release them before appending
+        for counts in batch:
+            self._add_counts(counts)
+        if self.persist_path and batch:
+            with open(self.persist_path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(counts) + "\n" for counts in batch))
+
+    def keep(self, mask: np.ndarray):
+        """
+        Drops every doc where `mask` is False and renumbers the rest in order, then rewrites
+        the log (removal is rare next to imports, so the log itself stays append-only).
+        """
+        mask = np.asarray(mask, dtype=bool)
+        new_ids = np.cumsum(mask, dtype=np.int64) - 1
+        self._np_cache.clear()
+        postings = {}
+        for term, (ids, tfs) in self.postings.items():
+            ids, tfs = np.frombuffer(ids, dtype=np.uint32), np.frombuffer(tfs, dtype=np.float32)
+            kept = mask[ids]
+            if kept.any():
+                postings[term] = (array("I", new_ids[ids[kept]].astype(np.uint32).tobytes()),
+                                  array("f", tfs[kept].tobytes()))
+        self.postings = postings
+        self.doc_lens = array("I", np.frombuffer(self.doc_lens, dtype=np.uint32)[mask].tobytes())
+        if not self.persist_path:
+            return
+        docs = [{} for _ in range(len(self.doc_lens))]
+        for term, (ids, tfs) in self.postings.items():
+            for doc_id, tf in zip(ids, tfs):
+                docs[doc_id][term] = int(tf)
+        tmp_path = self.persist_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("".join(json.dumps(counts) + "\n" for counts in docs))
+        os.replace(tmp_path, self.persist_path)
+
+    def _arrays(self, term):
+        cached = self._np_cache.get(term)
+        if cached is None:
+            ids, tfs = self.postings[term]
+            cached = self._np_cache[term] = (np.frombuffer(ids, dtype=np.uint32), np.frombuffer(tfs, dtype=np.float32))
+        return cached
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every indexed chunk for `query` (zeros where no term matches)."""
+        n_docs = len(self.doc_lens)
+        scores = np.zeros(n_docs, dtype=np.float32)
+        if not n_docs:
+            return scores
+        doc_lens = np.frombuffer(self.doc_lens, dtype=np.uint32).astype(np.float32)
+        avg_len = float(doc_lens.mean()) or 1.0
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            ids, tfs = self._arrays(term)
+            idf = np.log(1.0 + (n_docs - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * doc_lens[ids] / avg_len)
+            scores[ids] += idf * tfs * (self.k1 + 1.0) / (tfs + norm)
+        return scores
+
+    def search(self, query: str, top_k: int = 10):
+        """Returns [(doc_id, score)] for the best `top_k` chunks with a non-zero score."""
+        scores = self.scores(query)
+        hits = np.flatnonzero(scores)
+        if len(hits) > top_k:
+            hits = hits[np.argpartition(scores[hits], -top_k)[-top_k:]]
+        hits = hits[np.argsort(scores[hits])[::-1]]
+        return [(int(i), float(scores[i])) for i in hits]
+
+
+def reciprocal_rank_fusion(rankings, k: int = 60, top_k: int = 10):
+    """Fuses ranked lists of doc ids: score(d) = sum over lists of 1 / (k + rank)."""
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
@@ -1,105 +1,274 @@
 # core/utils/local_search_manager.py
 
+import glob
 import os
-import json
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import traceback
 
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from core.utils import extraction, telemetry
+from core.utils.lexical_index import reciprocal_rank_fusion
+from core.utils.search_collection import DEFAULT_COLLECTION, SearchCollection, collection_stem, source_key
+from core.utils.vector_codes import STORAGE_TYPES, normalize
+
+SEARCH_MODES = ("hybrid", "vector", "lexical")
+
 
 class LocalSearchManager:
     """
     Pure-Python fallback vector store using NumPy for embedding storage
-    and cosine-similarity search, with JSON persistence.
+    and cosine-similarity search. Chunks live in named collections
+    (core/utils/search_collection.py), each persisted on its own and opened on
+    first use. Embeddings are a memory-mapped float32 .npy per collection; with
+    storage set to float16/int8/binary only compact codes are held in RAM and the
+    best candidates are reranked exactly. A BM25 index is kept alongside for
+    exact-term matches.
     """
-    def __init__(self, persist_path: str = "./vs_store.json"):
+    EMBED_BATCH = 64  # chunks per embed_documents call during import
+    FUSION_DEPTH = 50  # candidates taken from each ranking before fusion
+
+    def __init__(self, persist_path: str = "./vs_store.json", embedder=None, storage: str = "float32",
+                 search_workers: int | None = None, embedder_settings: dict | None = None):
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"Unknown storage '{storage}' (expected one of {', '.join(STORAGE_TYPES)})")
         self.persist_path = persist_path
-        # initialize embedder
-        self.embedder = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={"device": "cpu"}
-        )
-        # determine embedding dimension by querying an empty string
-        try:
-            sample_emb = self.embedder.embed_query("")
-            dim = len(sample_emb)
-        except Exception:
-            dim = 384  # fallback dimension
-        
-        # load existing store or initialize empty arrays
+        self.storage = storage
+        # shards are scored in parallel; the pool only starts once a collection has several
+        self.search_workers = search_workers or min(8, os.cpu_count() or 1)
+        self._pool = None
+        self.collections = {}  # name -> SearchCollection, opened lazily
+        self._collections_lock = threading.Lock()
+        # held while a collection is rewritten (append/remove) and while a search reads one,
+        # so a background import (core/utils/folder_watcher.py) never swaps rows mid-query
+        self.write_lock = threading.RLock()
+        # anything with embed_query/embed_documents can be passed in; otherwise one is built from
+        # embedder_settings (core/utils/embedders.py) on first use, so lexical searches never pay for it
+        self._embedder = embedder
+        self.embedder_settings = embedder_settings or {}
+        self._embedder_lock = threading.Lock()
+
+    @property
+    def embedder(self):
+        with self._embedder_lock:
+            if self._embedder is None:
+                from core.utils.embedders import create_embedder
+
+                backend = self.embedder_settings.get("backend", "huggingface")
+                with telemetry.span("search.load_embedder", backend=backend):
+                    self._embedder = create_embedder(self.embedder_settings)
+            return self._embedder
+
+    def _embed(self, texts) -> np.ndarray:
+        # OnnxEmbedder hands back an array directly; LangChain embedders return lists
+        if hasattr(self.embedder, "embed_array"):
+            return self.embedder.embed_array(texts)
+        return np.asarray(self.embedder.embed_documents(list(texts)), dtype=np.float32)
+
+    # ── Collections ─────────────────────────────────────
+    def collection(self, name: str = DEFAULT_COLLECTION) -> SearchCollection:
+        """Opens (or creates) the named collection; only collections that are used get loaded."""
+        with self._collections_lock:
+            if name not in self.collections:
+                with telemetry.span("search.open_collection", collection=name):
+                    self.collections[name] = SearchCollection(self.persist_path, name, self.storage)
+            return self.collections[name]
+
+    def collection_names(self) -> list[str]:
+        """Collections on disk plus any opened in this session, without loading them."""
+        names = set(self.collections)
         if os.path.exists(self.persist_path):
-            try:
-                data = json.load(open(self.persist_path, "r", encoding="utf-8"))
-                self.docs = data.get("docs", [])
-                embs_list = data.get("embs", [])
-                self.embs = np.array(embs_list)
-            except Exception:
-                self.docs = []
-                self.embs = np.empty((0, dim))
-        else:
-            self.docs = []
-            self.embs = np.empty((0, dim))
-
-    def import_document(self, file_path: str) -> str:
+            names.add(DEFAULT_COLLECTION)
+        base = collection_stem(self.persist_path, DEFAULT_COLLECTION)
+        for path in glob.glob(glob.escape(base) + ".*.json"):
+            names.add(os.path.basename(path)[len(os.path.basename(base)) + 1:-len(".json")])
+        return sorted(names)
+
+    @property
+    def docs(self):
+        return self.collection().docs
+
+    def import_document(self, file_path: str, collection: str = DEFAULT_COLLECTION, replace: bool = False) -> str:
         """
-        Load, split, embed, and index file chunks using pure-Python store.
-        Requires implementing your own _load_and_split function.
+        Stream, embed, and index file chunks into `collection`.
+        Chunks are embedded EMBED_BATCH at a time as the file is read, and each batch's rows are
+        spilled to a temp file beside the store instead of being held in memory. The collection
+        only changes once the whole file is embedded. With `replace`, chunks from an earlier
+        import of the same file (by path) are dropped in the same step the new ones land.
         """
-        from core.utils.local_search_manager_fallback_loader import _load_and_split
+        from core.utils.chunker import stream_chunks
 
         if not os.path.isfile(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
 
         try:
-            # load and split
-            chunks = _load_and_split(file_path)
-            if not chunks:
-                raise RuntimeError("No chunks generated from the file.")
-
-            # embed texts
-            texts = [chunk.page_content for chunk in chunks]
-            new_embs = np.array(self.embedder.embed_documents(texts))
-
-            # add to store
-            for idx, chunk in enumerate(chunks):
-                self.docs.append({
-                    "source": chunk.metadata.get("source", ""),
-                    "page_content": chunk.page_content
-                })
-            if new_embs.ndim == 1:
-                new_embs = new_embs.reshape(1, -1)
-            self.embs = np.vstack([self.embs, new_embs]) if self.embs.size else new_embs
-
-            # persist
-            with open(self.persist_path, "w", encoding="utf-8") as f:
-                json.dump({
-                    "docs": self.docs,
-                    "embs": self.embs.tolist()
-                }, f)
+            target = self.collection(collection)
+            key = source_key(file_path)
+            new_docs = []
+            with tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(self.persist_path))) as spill:
+                batch = []
+                for chunk in stream_chunks(file_path, embedder=self.embedder):
+                    batch.append(chunk)
+                    if len(batch) >= self.EMBED_BATCH:
+                        self._embed_batch(batch, new_docs, spill, key)
+                        batch = []
+                if batch:
+                    self._embed_batch(batch, new_docs, spill, key)
+                if not new_docs:
+                    raise RuntimeError("No chunks generated from the file.")
+
+                spill.flush()
+                # mapped, not read: append() copies it into the shards one shard at a time
+                new_embs = np.memmap(spill, dtype=np.float32, mode="r").reshape(len(new_docs), -1)
+                with self.write_lock:
+                    if replace:
+                        target.adopt_paths([file_path])  # chunks an older store keyed by name alone
+                        target.remove_source(key)
+                    target.append(new_docs, new_embs, imported_at=time.time())
+                del new_embs  # unmap before the temp file is closed (Windows)
             return file_path
         except Exception as e:
             traceback.print_exc()
             raise RuntimeError(f"Import failed: {e}") from e
 
-    def search(self, query: str, top_k: int = 3) -> str:
+    def remove_document(self, file_path: str, collection: str = DEFAULT_COLLECTION) -> int:
+        """Drops every chunk imported from `file_path` (matched by path); returns the count."""
+        with self.write_lock, telemetry.span("search.remove", collection=collection) as attrs:
+            target = self.collection(collection)
+            target.adopt_paths([file_path])
+            attrs["chunks"] = target.remove_source(source_key(file_path))
+            return attrs["chunks"]
+
+    def _embed_batch(self, batch, new_docs, spill, key):
+        texts = [chunk.page_content for chunk in batch]
+        with telemetry.span("search.embed_documents", chunks=len(texts)):
+            embs = self._embed(texts)
+        spill.write(np.ascontiguousarray(embs.reshape(len(texts), -1), dtype=np.float32).tobytes())
+        for chunk in batch:
+            doc = {"source": chunk.metadata.get("source", ""), "path": key, "page_content": chunk.page_content}
+            for field in ("page", "section", "sheet", "rows"):
+                if field in chunk.metadata:
+                    doc[field] = chunk.metadata[field]
+            new_docs.append(doc)
+
+    # ── Retrieval ───────────────────────────────────────
+    @staticmethod
+    def _merge(per_collection, depth):
+        """Merges per-collection (rows, scores) into one [(collection, row)] ranking by score."""
+        hits = [(float(score), name, int(row)) for name, (rows, scores) in per_collection.items()
+                for row, score in zip(rows, scores)]
+        hits.sort(key=lambda hit: hit[0], reverse=True)
+        return [(name, row) for _, name, row in hits[:depth]]
+
+    @property
+    def pool(self):
+        if self._pool is None and self.search_workers > 1:
+            self._pool = ThreadPoolExecutor(max_workers=self.search_workers, thread_name_prefix="search-shard")
+        return self._pool
+
+    def _targets(self, collections, filters):
+        targets = []
+        for name in collections or self.collection_names():
+            target = self.collection(name)
+            mask = target.mask(**filters)
+            if len(target) and (mask is None or mask.any()):
+                targets.append((target, mask))
+        return targets
+
+    def _embed_queries(self, queries):
+        with telemetry.span("search.embed_query", queries=len(queries)):
+            if len(queries) == 1:
+                return normalize(self.embedder.embed_query(queries[0]))
+            return normalize(self._embed(queries))  # one batched forward pass
+
+    def _vector_rankings(self, q_embs, depth, targets):
+        rows = sum(len(c) for c, _ in targets)
+        pool = self.pool if any(len(c.shards) > 1 for c, _ in targets) else None
+        with telemetry.span("search.retrieval", docs=rows, top_k=depth, storage=self.storage, queries=len(q_embs)):
+            per_collection = {c.name: c.vector_hits_many(q_embs, depth, mask, pool) for c, mask in targets}
+            return [self._merge({name: hits[j] for name, hits in per_collection.items()}, depth)
+                    for j in range(len(q_embs))]
+
+    def _lexical_ranking(self, query, depth, targets):
+        rows = sum(len(c) for c, _ in targets)
+        with telemetry.span("search.lexical", docs=rows, top_k=depth):
+            return self._merge({c.name: c.lexical_hits(query, depth, mask) for c, mask in targets}, depth)
+
+    def _rank(self, queries, top_k, mode, collections, filters):
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}' (expected one of {', '.join(SEARCH_MODES)})")
+        targets = self._targets(collections, filters)
+        if not targets:
+            return [[] for _ in queries]
+        if mode == "lexical":
+            return [self._lexical_ranking(query, top_k, targets) for query in queries]
+        if mode == "vector":
+            return self._vector_rankings(self._embed_queries(queries), top_k, targets)
+
+        depth = max(top_k, self.FUSION_DEPTH)
+        vector = self._vector_rankings(self._embed_queries(queries), depth, targets)
+        return [
+            [hit for hit, _ in reciprocal_rank_fusion([v, self._lexical_ranking(query, depth, targets)], top_k=top_k)]
+            for query, v in zip(queries, vector)
+        ]
+
+    def search_ids(self, query: str, top_k: int = 3, mode: str = "hybrid", collections=None,
+                   **filters) -> list[tuple[str, int]]:
+        """
+        Returns (collection, row) pairs, best first.
+        mode: "vector" (cosine), "lexical" (BM25, no embedder call) or "hybrid"
+        (reciprocal rank fusion of both).
+        Filters narrow the candidates before any scoring: `collections` (names; default all),
+        `source` (glob on the file name or full path), `file_types` (extensions) and `since`/`until`
+        (import time as epoch seconds, datetime or ISO string).
+        """
+        with self.write_lock:
+            return self._rank([query], top_k, mode, collections, filters)[0]
+
+    def search_many(self, queries, top_k: int = 3, mode: str = "hybrid", collections=None,
+                    **filters) -> list[list[dict]]:
+        """
+        Runs many queries at once (e.g. a RAG evaluation set): the queries are embedded in one
+        batch and scored against each shard with a single matrix-matrix product.
+        Returns, per query, the hit chunks best first with their "collection" and "row" added.
+        """
+        queries = list(queries)
+        if not queries:
+            return []
+        with self.write_lock:
+            rankings = self._rank(queries, top_k, mode, collections, filters)
+            return [[dict(self.collections[name].docs[row], collection=name, row=row) for name, row in ranking]
+                    for ranking in rankings]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+        if hasattr(self._embedder, "close"):
+            self._embedder.close()
+        extraction.shutdown()
+
+    def search(self, query: str, top_k: int = 3, mode: str = "hybrid", **filters) -> str:
         """
-        Perform cosine-similarity search over stored embeddings.
+        Search stored chunks and format the hits for display (see search_ids for modes and filters).
         """
         try:
-            if len(self.docs) == 0:
+            names = filters.get("collections") or self.collection_names()
+            if not any(len(self.collection(name)) for name in names):
                 return "⚠️ No documents indexed yet. Please import a file first."
 
-            q_emb = np.array(self.embedder.embed_query(query))
-            # normalize
-            emb_norms = np.linalg.norm(self.embs, axis=1)
-            q_norm = np.linalg.norm(q_emb)
-            sims = (self.embs @ q_emb) / (emb_norms * q_norm + 1e-10)
-            idxs = np.argsort(sims)[-top_k:][::-1]
+            with self.write_lock:
+                hits = self.search_ids(query, top_k=top_k, mode=mode, **filters)
+                docs = [(name, self.collections[name].docs[i]) for name, i in hits]
+            if not hits:
+                return "⚠️ No matching documents found."
 
             results = []
-            for i in idxs:
-                doc = self.docs[i]
-                results.append(f"🔍 {doc['source']}\n{doc['page_content']}")
+            for name, doc in docs:
+                label = doc["source"] if name == DEFAULT_COLLECTION else f"[{name}] {doc['source']}"
+                results.append(f"🔍 {label}\n{doc['page_content']}")
             return "\n\n".join(results)
         except Exception as e:
             print(f"[LocalSearchManager] Search error: {e}")
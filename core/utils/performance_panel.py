@@ -0,0 +1,77 @@
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtWidgets import (
+    QWidget,
+    QVBoxLayout,
+    QHBoxLayout,
+    QPushButton,
+    QTableWidget,
+    QTableWidgetItem,
+    QHeaderView,
+    QFileDialog,
+    QMessageBox,
+    QLabel,
+)
+from core.utils import telemetry
+
+COLUMNS = ["Metric", "Count", "Last", "Mean", "p50", "p95", "Unit"]
+
+
+class PerformancePanel(QWidget):
+    """
+    Floating tool window that shows the telemetry ring buffer as a live summary table.
+    Refreshes on a timer rather than per event so bursts of spans never touch the UI thread.
+    """
+    def __init__(self, parent=None, refresh_ms: int = 1000):
+        super().__init__(parent, Qt.WindowType.Tool)
+        self.setWindowTitle("📈 Performance")
+        self.resize(560, 320)
+
+        layout = QVBoxLayout()
+        self.status_label = QLabel("No events recorded yet.")
+        layout.addWidget(self.status_label)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        export_button = QPushButton("💾 Export JSONL")
+        export_button.clicked.connect(self.export_events)
+        clear_button = QPushButton("🧹 Clear")
+        clear_button.clicked.connect(self.clear_events)
+        buttons.addWidget(export_button)
+        buttons.addWidget(clear_button)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(refresh_ms)
+        self.refresh()
+
+    def refresh(self):
+        if not self.isVisible():
+            return
+        stats = telemetry.summary()
+        self.table.setRowCount(len(stats))
+        for row, (name, s) in enumerate(sorted(stats.items())):
+            values = [name, str(s["count"]), f"{s['last']:.1f}", f"{s['mean']:.1f}",
+                      f"{s['p50']:.1f}", f"{s['p95']:.1f}", s["unit"]]
+            for col, value in enumerate(values):
+                self.table.setItem(row, col, QTableWidgetItem(value))
+        total = sum(s["count"] for s in stats.values())
+        self.status_label.setText(f"{total} event(s) in buffer" if total else "No events recorded yet.")
+
+    def export_events(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Telemetry", "telemetry_export.jsonl",
+                                              "JSON Lines (*.jsonl);;All Files (*)")
+        if not path:
+            return
+        count = telemetry.export(path)
+        QMessageBox.information(self, "Export Complete", f"✅ Exported {count} event(s) to {path}")
+
+    def clear_events(self):
+        telemetry.clear()
+        self.refresh()
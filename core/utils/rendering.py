@@ -0,0 +1,104 @@
+# core/utils/rendering.py — markdown/pygments rendering for the output view
+#
+# Kept free of Qt so the render cost of long sessions can be measured headless
+# (see benchmarks/run_benchmarks.py).
+
+import re
+
+import markdown2
+from pygments import highlight
+from pygments.formatters import HtmlFormatter
+from pygments.lexers import guess_lexer, get_lexer_by_name
+
+CODE_BLOCK_PATTERN = re.compile(
+    r'<pre><code(?: class="language-(\w+)")?>(.*?)</code></pre>', re.DOTALL
+)
+
+PAGE_TEMPLATE = """
+        <html>
+        <head>
+        <style>
+            .highlight {{
+                background-color: #282a36;
+                padding: 12px;
+                border-radius: 6px;
+                overflow-x: auto;
+            }}
+            pre, code {{
+                font-family: Consolas, monospace;
+                font-size: 14px;
+                white-space: pre-wrap;
+                background: none;
+            }}
+            b, i {{
+                color: #bd93f9;
+            }}
+            hr {{
+                border: 0;
+                height: 1px;
+                background: #444;
+            }}
+        </style>
+        </head>
+        <body style="background-color: #1a1a2e; color: #f0f0f0; font-family: Consolas, monospace;">
+            {body}
+        </body>
+        </html>
+        """
+
+
+def highlight_code_blocks(html_text):
+    def replacer(match):
+        lang = match.group(1) or "text"
+        code = match.group(2)
+
+        # unescape HTML
+        code = (
+            code.replace("&lt;", "<")
+            .replace("&gt;", ">")
+            .replace("&amp;", "&")
+            .replace("&quot;", '"')
+        )
+
+        try:
+            lexer = get_lexer_by_name(lang)
+        except Exception:
+            lexer = guess_lexer(code)
+
+        formatter = HtmlFormatter(noclasses=True, style="colorful", nowrap=True)
+        highlighted = highlight(code, lexer, formatter)
+        return f'<div class="highlight">{highlighted}</div>'
+
+    return CODE_BLOCK_PATTERN.sub(replacer, html_text)
+
+
+def render_markdown(text: str) -> str:
+    raw_html = markdown2.markdown(
+        text, extras=["fenced-code-blocks", "break-on-newline", "code-friendly"]
+    )
+    return highlight_code_blocks(raw_html)
+
+
+def response_block(prompt: str, highlighted: str, footer: str = "") -> str:
+    footer = f'<br><small style="color:#6272a4;">{footer}</small>' if footer else ""
+    return f"""
+        <div class="ai-output">
+            <b style="color:#ff79c6;">Prompt:</b><br><i>{prompt}</i><hr>
+            <b style="color:#8be9fd;">Response:</b><br>{highlighted}{footer}
+            <hr><br>
+        </div>
+        """
+
+
+def turn_footer(stats: dict | None) -> str:
+    """One line of per-turn Ollama counters, e.g. "⏱️ prompt eval 42 ms · 18 tokens · 1,024 from context"."""
+    if not stats:
+        return ""
+    line = f"⏱️ prompt eval {stats.get('prompt_eval_ms', 0):.0f} ms · {stats.get('prompt_eval_count', 0):,} tokens"
+    if stats.get("context_tokens"):
+        line += f" · {stats['context_tokens']:,} from context"
+    return line
+
+
+def page_html(body: str) -> str:
+    return PAGE_TEMPLATE.format(body=body)
@@ -0,0 +1,435 @@
+# core/utils/search_collection.py — one named, independently persisted chunk store
+#
+# A collection owns these files, sharing one stem ("vs_store" for the default collection,
+# "vs_store.<name>" for the others):
+#   <stem>.json          chunk text and display fields
+#   <stem>.embs.<i>.npy  normalized float32 embeddings in shards of SHARD_ROWS rows, memory-mapped
+#   <stem>.meta.npz      columnar metadata: source_id, page, imported_at (+ the source table)
+# A chunk's source is keyed by the normalized absolute path of its file (doc["path"]), so two
+# files with the same name in different folders stay apart; doc["source"] is only the display
+# name. Stores written before that keyed sources by file name; adopt_paths() moves them over.
+#   <stem>.bm25.jsonl    BM25 term counts (core/utils/lexical_index.py)
+# Filters are evaluated on the metadata columns first, so vector math only touches rows that pass.
+# Shards are scored independently (in a thread pool when one is passed in; NumPy releases the
+# GIL, and every thread reads the same mapped pages) and merged with a top-k pass. Importing
+# rewrites only the last, partly filled shard.
+
+import fnmatch
+import json
+import os
+import re
+import traceback
+from datetime import datetime
+
+import numpy as np
+
+from core.utils import telemetry
+from core.utils.lexical_index import LexicalIndex
+from core.utils.vector_codes import VectorCodes, normalize, top_indices
+
+DEFAULT_COLLECTION = "default"
+SHARD_ROWS = 65536
+NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def collection_stem(persist_path: str, name: str) -> str:
+    base = os.path.splitext(persist_path)[0]
+    return base if name == DEFAULT_COLLECTION else f"{base}.{name}"
+
+
+def source_key(path: str) -> str:
+    """The key chunks of `path` are stored under: its normalized absolute path."""
+    return os.path.normcase(os.path.abspath(path))
+
+
+def to_timestamp(value) -> float | None:
+    """Accepts epoch seconds, a datetime, or an ISO date/time string."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return datetime.fromisoformat(str(value)).timestamp()
+
+
+def merge_hits(parts, depth):
+    """Merges (rows, scores) pairs into the `depth` best overall, best first."""
+    parts = [part for part in parts if len(part[0])]
+    if not parts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    if len(parts) == 1:
+        return parts[0]
+    rows = np.concatenate([rows for rows, _ in parts])
+    scores = np.concatenate([scores for _, scores in parts])
+    best = top_indices(scores, depth)
+    return rows[best], scores[best]
+
+
+class EmbeddingShard:
+    """Rows [start, start + len) of a collection: mapped float32 embeddings plus optional codes."""
+    # coarse candidates kept per requested hit before the exact rerank; sign bits need the most
+    RERANK_FACTORS = {"float16": 4, "int8": 10, "binary": 40}
+    MIN_RERANK = 100
+
+    def __init__(self, start: int, embs, storage: str):
+        self.start = start
+        self.embs = embs
+        self.storage = storage
+        self.codes = None
+        if storage != "float32" and len(embs):
+            with telemetry.span("search.encode", rows=len(embs), storage=storage):
+                self.codes = VectorCodes.encode(embs, storage)
+
+    def __len__(self):
+        return len(self.embs)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes if self.codes is not None else int(self.embs.nbytes)
+
+    def hits(self, queries: np.ndarray, depth: int, mask=None):
+        """For each normalized query row, (collection rows, cosine scores) of the best `depth` rows."""
+        rows = None if mask is None else np.flatnonzero(mask)
+        if rows is not None and not len(rows):
+            return [(rows, np.empty(0, dtype=np.float32))] * len(queries)
+        out = []
+        if self.codes is None:
+            embs = self.embs if rows is None else self.embs[rows]
+            scores = np.asarray(queries @ embs.T)  # one matrix product for every query
+            for q_scores in scores:
+                best = top_indices(q_scores, depth)
+                out.append(((best if rows is None else rows[best]) + self.start, q_scores[best]))
+            return out
+        # coarse scan over the compact codes, then exact cosine on the candidates' float32 rows
+        codes = self.codes if rows is None else self.codes.take(rows)
+        n_candidates = max(depth * self.RERANK_FACTORS[self.storage], self.MIN_RERANK)
+        for q_emb, coarse in zip(queries, codes.scores_many(queries)):
+            candidates = top_indices(coarse, n_candidates)
+            if rows is not None:
+                candidates = rows[candidates]
+            candidates.sort()  # sequential reads from the memmap
+            exact = np.asarray(self.embs[candidates]) @ q_emb
+            best = top_indices(exact, depth)
+            out.append((candidates[best] + self.start, exact[best]))
+        return out
+
+    def coarse(self, q_emb: np.ndarray, depth: int):
+        """The codes-only ranking (no rerank), for measuring quantization recall."""
+        if self.codes is None:
+            return self.hits(q_emb[None, :], depth)[0]
+        scores = self.codes.scores(q_emb)
+        best = top_indices(scores, depth)
+        return best + self.start, scores[best]
+
+
+class SearchCollection:
+
+    def __init__(self, persist_path: str, name: str = DEFAULT_COLLECTION, storage: str = "float32"):
+        if not NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid collection name '{name}' (letters, digits, '-' and '_' only)")
+        self.name = name
+        self.storage = storage
+        stem = collection_stem(persist_path, name)
+        self.persist_path = stem + ".json"
+        self.stem = stem
+        self.meta_path = stem + ".meta.npz"
+
+        self.docs = []
+        self.shards = []
+        if os.path.exists(self.persist_path):
+            try:
+                data = json.load(open(self.persist_path, "r", encoding="utf-8"))
+                self.docs = data.get("docs", [])
+                self._load_shards(data)
+            except Exception:
+                traceback.print_exc()
+                self.docs = []
+                self.shards = []
+
+        self._load_meta()
+        self.lexical = LexicalIndex(stem + ".bm25.jsonl")
+        self._sync_lexical()
+
+    def __len__(self):
+        return len(self.docs)
+
+    # ── Metadata columns ────────────────────────────────
+    def _load_meta(self):
+        self.sources = []
+        self.source_id = np.empty(0, dtype=np.int32)
+        self.page = np.empty(0, dtype=np.int32)
+        self.imported_at = np.empty(0, dtype=np.float64)
+        if os.path.exists(self.meta_path):
+            try:
+                with np.load(self.meta_path) as meta:
+                    if len(meta["source_id"]) == len(self.docs):
+                        self.sources = meta["sources"].tolist()
+                        self.source_id, self.page, self.imported_at = meta["source_id"], meta["page"], meta["imported_at"]
+                        return
+            except Exception:
+                traceback.print_exc()
+        if self.docs:
+            # stores written before columnar metadata: import time is unknown, use the store's mtime
+            self.source_id, self.page, self.imported_at = self._columns(
+                self.docs, os.path.getmtime(self.persist_path), self.sources)
+            self._save_meta()
+
+    def _columns(self, docs, imported_at, sources):
+        """Builds (source_id, page, imported_at) columns for `docs`, extending `sources` in place."""
+        lookup = {source: i for i, source in enumerate(sources)}
+        source_id = np.empty(len(docs), dtype=np.int32)
+        for i, doc in enumerate(docs):
+            source = doc.get("path") or doc.get("source", "")  # file name only in older stores
+            if source not in lookup:
+                lookup[source] = len(sources)
+                sources.append(source)
+            source_id[i] = lookup[source]
+        page = np.array([doc.get("page", -1) for doc in docs], dtype=np.int32)
+        return source_id, page, np.full(len(docs), imported_at, dtype=np.float64)
+
+    def _save_meta(self):
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, sources=np.array(self.sources, dtype=str), source_id=self.source_id,
+                     page=self.page, imported_at=self.imported_at)
+        os.replace(tmp_path, self.meta_path)
+
+    def mask(self, source=None, file_types=None, since=None, until=None):
+        """Boolean row mask for the given filters, or None when nothing is filtered."""
+        since, until = to_timestamp(since), to_timestamp(until)
+        if source is None and not file_types and since is None and until is None:
+            return None
+        keep = np.ones(len(self.docs), dtype=bool)
+        if source is not None or file_types:
+            types = {t.lower() if t.startswith(".") else f".{t.lower()}" for t in (file_types or [])}
+            allowed = [
+                i for i, name in enumerate(self.sources)
+                if (source is None or fnmatch.fnmatch(os.path.basename(name), source) or fnmatch.fnmatch(name, source))
+                and (not types or os.path.splitext(name)[1].lower() in types)
+            ]
+            keep &= np.isin(self.source_id, allowed)
+        if since is not None:
+            keep &= self.imported_at >= since
+        if until is not None:
+            keep &= self.imported_at <= until
+        return keep
+
+    # ── Storage ─────────────────────────────────────────
+    def _sync_lexical(self):
+        # stores written before the BM25 index existed, or an import interrupted between
+        # the two writes, leave the log behind the docs; rebuild what's missing
+        if len(self.lexical) > len(self.docs):
+            os.remove(self.lexical.persist_path)
+            self.lexical = LexicalIndex(self.lexical.persist_path)
+        if len(self.lexical) < len(self.docs):
+            print(f"🔤 [LocalSearchManager] Indexing {len(self.docs) - len(self.lexical)} chunks for keyword search")
+            self.lexical.add(doc["page_content"] for doc in self.docs[len(self.lexical):])
+
+    def _shard_path(self, index: int) -> str:
+        return f"{self.stem}.embs.{index}.npy"
+
+    def _load_shards(self, data):
+        start = 0
+        while os.path.exists(self._shard_path(len(self.shards))):
+            shard = EmbeddingShard(start, np.load(self._shard_path(len(self.shards)), mmap_mode="r"), self.storage)
+            self.shards.append(shard)
+            start += len(shard)
+        if self.shards:
+            return
+        # older layouts: one <stem>.embs.npy, or raw vectors inside the JSON
+        single_path = self.stem + ".embs.npy"
+        if os.path.exists(single_path):
+            print("📦 [LocalSearchManager] Splitting embeddings into shards")
+            self._write_rows(np.load(single_path, mmap_mode="r"))
+            os.remove(single_path)
+        elif data.get("embs"):
+            print("📦 [LocalSearchManager] Moving embeddings out of the JSON store")
+            self._write_rows(np.asarray(data["embs"], dtype=np.float32))
+            self._save_docs()
+
+    def _write_shard(self, index: int, rows: np.ndarray):
+        path = self._shard_path(index)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.asarray(rows, dtype=np.float32))
+        if index < len(self.shards):
+            start = self.shards[index].start
+        else:
+            start = self.shards[-1].start + len(self.shards[-1]) if self.shards else 0
+        if index < len(self.shards):
+            self.shards[index] = None  # release the old mapping so the file can be replaced (Windows)
+        os.replace(tmp_path, path)
+        shard = EmbeddingShard(start, np.load(path, mmap_mode="r"), self.storage)
+        if index < len(self.shards):
+            self.shards[index] = shard
+        else:
+            self.shards.append(shard)
+
+    def _write_rows(self, new_embs: np.ndarray):
+        """
+        Appends rows to the shard files, topping up the last shard before starting new ones.
+        Rows are normalized a shard at a time, so a memory-mapped `new_embs` is never read whole.
+        """
+        if self.shards and len(self.shards[-1]) < SHARD_ROWS:
+            last = self.shards[-1]
+            room = SHARD_ROWS - len(last)
+            self._write_shard(len(self.shards) - 1, np.vstack([np.asarray(last.embs), normalize(new_embs[:room])]))
+            new_embs = new_embs[room:]
+        for offset in range(0, len(new_embs), SHARD_ROWS):
+            self._write_shard(len(self.shards), normalize(new_embs[offset:offset + SHARD_ROWS]))
+
+    def _save_docs(self):
+        with open(self.persist_path, "w", encoding="utf-8") as f:
+            json.dump({"docs": self.docs}, f)
+
+    def set_embeddings(self, embs):
+        """Installs in-memory normalized rows as shard views (no copy, not persisted); for benchmarks."""
+        self.shards = [EmbeddingShard(start, embs[start:start + SHARD_ROWS], self.storage)
+                       for start in range(0, len(embs), SHARD_ROWS)]
+
+    @property
+    def embs(self) -> np.ndarray:
+        """All embeddings as one array; a copy when there is more than one shard."""
+        if not self.shards:
+            return np.empty((0, 0), dtype=np.float32)
+        if len(self.shards) == 1:
+            return self.shards[0].embs
+        return np.concatenate([shard.embs for shard in self.shards])
+
+    def append(self, new_docs, new_embs, imported_at):
+        """Adds embedded chunks and rewrites the embeddings, metadata and BM25 log."""
+        self.docs.extend(new_docs)
+        self._write_rows(new_embs)
+        self._save_docs()
+        source_id, page, stamps = self._columns(new_docs, imported_at, self.sources)
+        self.source_id = np.concatenate([self.source_id, source_id])
+        self.page = np.concatenate([self.page, page])
+        self.imported_at = np.concatenate([self.imported_at, stamps])
+        self._save_meta()
+        # the BM25 log only grows by the new chunks
+        self.lexical.add(doc["page_content"] for doc in new_docs)
+
+    def adopt_paths(self, paths) -> int:
+        """
+        Re-keys sources that older stores recorded by file name alone onto the full path of the
+        file they came from, when exactly one of `paths` has that name. Returns how many moved.
+        """
+        keys_by_name = {}
+        for path in paths:
+            keys_by_name.setdefault(os.path.basename(path), set()).add(source_key(path))
+        moved = 0
+        for i, name in enumerate(list(self.sources)):
+            keys = keys_by_name.get(name) if name and os.path.basename(name) == name else None
+            if not keys or len(keys) > 1:
+                continue  # already a path, not among `paths`, or ambiguous
+            key = next(iter(keys))
+            rows = np.flatnonzero(self.source_id == i)
+            if key in self.sources:
+                self.source_id[rows] = self.sources.index(key)  # imported again since; merge the two
+            else:
+                self.sources[i] = key
+            for row in rows:
+                self.docs[row]["path"] = key
+            moved += 1
+        if moved:
+            self._save_docs()
+            self._save_meta()
+        return moved
+
+    def remove_source(self, source: str) -> int:
+        """
+        Drops every chunk imported from `source` (a source_key) and returns how many were removed. Shards before
+        the first affected row are left alone; later rows are compacted into rewritten shards.
+        """
+        if source not in self.sources:
+            return 0
+        keep = self.source_id != self.sources.index(source)
+        removed = len(keep) - int(keep.sum())
+        if not removed:
+            return 0
+
+        first = next(i for i, shard in enumerate(self.shards) if not keep[shard.start:shard.start + len(shard)].all())
+        old_count = len(self.shards)
+        index, carry = first, None
+        for i in range(first, old_count):
+            shard = self.shards[i]
+            rows = np.asarray(shard.embs[keep[shard.start:shard.start + len(shard)]])
+            if carry is not None:
+                rows = np.concatenate([carry, rows])
+            while len(rows) >= SHARD_ROWS:
+                self._replace_shard(index, rows[:SHARD_ROWS])
+                rows = rows[SHARD_ROWS:]
+                index += 1
+            carry = rows
+        if carry is not None and len(carry):
+            self._replace_shard(index, carry)
+            index += 1
+        for i in range(index, old_count):
+            self.shards[i] = None
+            os.remove(self._shard_path(i))
+        del self.shards[index:]
+
+        self.docs = [doc for doc, kept in zip(self.docs, keep) if kept]
+        self._save_docs()
+        self.source_id, self.page, self.imported_at = self.source_id[keep], self.page[keep], self.imported_at[keep]
+        self._save_meta()
+        self.lexical.keep(keep)
+        return removed
+
+    def _replace_shard(self, index: int, rows: np.ndarray):
+        """Writes shard `index` during compaction; its start follows the previous shard."""
+        start = self.shards[index - 1].start + len(self.shards[index - 1]) if index else 0
+        path = self._shard_path(index)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.asarray(rows, dtype=np.float32))
+        self.shards[index] = None  # release the old mapping so the file can be replaced (Windows)
+        os.replace(tmp_path, path)
+        self.shards[index] = EmbeddingShard(start, np.load(path, mmap_mode="r"), self.storage)
+
+    def source_times(self) -> dict:
+        """source key -> latest import time, for callers deciding whether a file needs re-indexing."""
+        latest = {}
+        for source_id, stamp in zip(self.source_id.tolist(), self.imported_at.tolist()):
+            name = self.sources[source_id]
+            latest[name] = max(stamp, latest.get(name, stamp))
+        return latest
+
+    def memory_bytes(self) -> int:
+        """RAM held for vector search: the codes, or the mapped float32 rows when uncompressed."""
+        return sum(shard.nbytes for shard in self.shards)
+
+    # ── Retrieval ───────────────────────────────────────
+    def vector_hits_many(self, queries: np.ndarray, depth: int, mask=None, pool=None):
+        """
+        For each normalized query row, (row indices, cosine scores) of the `depth` closest rows
+        that pass `mask`, best first. Shards run on `pool` when given.
+        """
+        def run(shard):
+            shard_mask = None if mask is None else mask[shard.start:shard.start + len(shard)]
+            return shard.hits(queries, depth, shard_mask)
+
+        if pool is not None and len(self.shards) > 1:
+            per_shard = list(pool.map(run, self.shards))
+        else:
+            per_shard = [run(shard) for shard in self.shards]
+        return [merge_hits([hits[j] for hits in per_shard], depth) for j in range(len(queries))]
+
+    def vector_hits(self, q_emb: np.ndarray, depth: int, mask=None, pool=None):
+        return self.vector_hits_many(q_emb[None, :], depth, mask, pool)[0]
+
+    def rank_embedding(self, q_emb: np.ndarray, depth: int, pool=None) -> np.ndarray:
+        """Indices of the `depth` rows closest to a normalized query vector, best first."""
+        return self.vector_hits(q_emb, depth, pool=pool)[0]
+
+    def coarse_ranking(self, q_emb: np.ndarray, depth: int) -> np.ndarray:
+        """Same as rank_embedding but from the compact codes alone, without the exact rerank."""
+        return merge_hits([shard.coarse(q_emb, depth) for shard in self.shards], depth)[0]
+
+    def lexical_hits(self, query: str, depth: int, mask=None):
+        """(row indices, BM25 scores) of the best `depth` matching rows that pass `mask`."""
+        scores = self.lexical.scores(query)
+        if mask is not None:
+            scores[~mask] = 0.0
+        hits = np.flatnonzero(scores)
+        best = hits[top_indices(scores[hits], depth)]
+        return best, scores[best]
@@ -0,0 +1,158 @@
+"""
+📈 Lightweight performance telemetry for AI Forge
+-------------------------------------------------
+
+Spans (timed blocks) and point metrics (TTFT, tokens/sec, ...) go into an in-memory
+ring buffer that the performance panel reads. A JSONL sink can be switched on in
+config.json ("telemetry": {"sink": "telemetry.jsonl"}); it is written from a
+background thread so recording never blocks the generation path.
+
+    from core.utils import telemetry
+
+    with telemetry.span("search.retrieval", top_k=3):
+        ...
+    telemetry.record("ollama.ttft", 412.0, unit="ms", model="mistral")
+"""
+
+import json
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+DEFAULT_BUFFER_SIZE = 5000
+
+_buffer = deque(maxlen=DEFAULT_BUFFER_SIZE)
+_lock = threading.Lock()
+_listeners = []
+_sink_queue = None
+_sink_thread = None
+
+
+def configure(settings: dict | None = None):
+    """Applies the "telemetry" section of config.json: buffer_size and an optional JSONL sink path."""
+    global _buffer, _sink_queue, _sink_thread
+    settings = settings or {}
+    size = int(settings.get("buffer_size", DEFAULT_BUFFER_SIZE))
+    with _lock:
+        if size != _buffer.maxlen:
+            _buffer = deque(_buffer, maxlen=size)
+
+    sink_path = settings.get("sink")
+    if sink_path and _sink_thread is None:
+        _sink_queue = queue.Queue()
+        _sink_thread = threading.Thread(target=_drain_sink, args=(sink_path, _sink_queue),
+                                        name="telemetry-sink", daemon=True)
+        _sink_thread.start()
+
+
+def _drain_sink(path: str, pending: queue.Queue):
+    with open(path, "a", encoding="utf-8") as f:
+        while True:
+            event = pending.get()
+            f.write(json.dumps(event, default=str) + "\n")
+            # batch whatever else is already queued before flushing
+            while not pending.empty():
+                f.write(json.dumps(pending.get_nowait(), default=str) + "\n")
+            f.flush()
+
+
+def _emit(event: dict):
+    with _lock:
+        _buffer.append(event)
+        listeners = list(_listeners)
+    if _sink_queue is not None:
+        _sink_queue.put(event)
+    for listener in listeners:
+        try:
+            listener(event)
+        except Exception as e:
+            print(f"[Telemetry] Listener error: {e}")
+
+
+def record(name: str, value: float, unit: str = "", **attrs):
+    """Records a point metric such as TTFT or tokens/sec."""
+    _emit({"ts": time.time(), "kind": "metric", "name": name, "value": value, "unit": unit, "attrs": attrs})
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Times the enclosed block in milliseconds. Attributes can be added via the yielded dict."""
+    start = time.perf_counter()
+    error = None
+    try:
+        yield attrs
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        event = {
+            "ts": time.time(),
+            "kind": "span",
+            "name": name,
+            "value": (time.perf_counter() - start) * 1000.0,
+            "unit": "ms",
+            "attrs": attrs,
+            "thread": threading.current_thread().name,
+        }
+        if error:
+            event["error"] = error
+        _emit(event)
+
+
+def events(name: str | None = None) -> list:
+    with _lock:
+        snapshot = list(_buffer)
+    return [e for e in snapshot if name is None or e["name"] == name]
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summary() -> dict:
+    """Per-name count, last, mean, p50 and p95 over everything still in the ring buffer."""
+    grouped = {}
+    for event in events():
+        grouped.setdefault(event["name"], []).append(event)
+    out = {}
+    for name, group in grouped.items():
+        values = sorted(e["value"] for e in group)
+        out[name] = {
+            "count": len(values),
+            "unit": group[-1]["unit"],
+            "last": group[-1]["value"],
+            "mean": sum(values) / len(values),
+            "p50": _percentile(values, 0.5),
+            "p95": _percentile(values, 0.95),
+        }
+    return out
+
+
+def export(path: str) -> int:
+    """Writes the ring buffer to `path` as JSONL for offline analysis; returns the event count."""
+    snapshot = events()
+    with open(path, "w", encoding="utf-8") as f:
+        for event in snapshot:
+            f.write(json.dumps(event, default=str) + "\n")
+    return len(snapshot)
+
+
+def subscribe(listener):
+    with _lock:
+        _listeners.append(listener)
+
+
+def unsubscribe(listener):
+    with _lock:
+        if listener in _listeners:
+            _listeners.remove(listener)
+
+
+def clear():
+    with _lock:
+        _buffer.clear()
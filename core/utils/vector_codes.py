@@ -0,0 +1,103 @@
+# core/utils/vector_codes.py — compact embedding codes for the coarse search pass
+#
+# LocalSearchManager keeps full-precision float32 embeddings memory-mapped on disk and holds
+# only one of these in RAM:
+#   float16  2 bytes/dim   dot product, upcast block by block
+#   int8     1 byte/dim    per-dimension scalar quantization (scale = max |x| / 127)
+#   binary   1 bit/dim     sign bits, scored by Hamming distance (XOR + popcount)
+# The coarse pass picks candidates; the caller reranks them exactly against the float32 rows.
+
+import numpy as np
+
+STORAGE_TYPES = ("float32", "float16", "int8", "binary")
+SCORE_BLOCK = 2048  # rows upcast per step; small enough to stay in cache
+
+# popcount of every byte value, for NumPy builds without np.bitwise_count (< 2.0)
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def normalize(embs) -> np.ndarray:
+    embs = np.asarray(embs, dtype=np.float32)
+    if embs.ndim == 1:
+        embs = embs.reshape(1, -1)
+    norms = np.linalg.norm(embs, axis=1, keepdims=True)
+    return embs / np.maximum(norms, 1e-10)
+
+
+def _popcount(x: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+    return _POPCOUNT[x.view(np.uint8)].reshape(*x.shape, -1).sum(axis=-1)
+
+
+def top_indices(scores: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the `n` highest scores, best first, without a full sort."""
+    n = min(n, len(scores))
+    if n <= 0:
+        return np.empty(0, dtype=np.int64)
+    idxs = np.argpartition(scores, -n)[-n:] if n < len(scores) else np.arange(len(scores))
+    return idxs[np.argsort(scores[idxs])[::-1]]
+
+
+class VectorCodes:
+    def __init__(self, kind: str, codes: np.ndarray, scale: np.ndarray | None = None, dim: int = 0):
+        self.kind = kind
+        self.codes = codes
+        self.scale = scale
+        self.dim = dim
+
+    @classmethod
+    def encode(cls, embs: np.ndarray, kind: str) -> "VectorCodes":
+        """`embs` should already be L2-normalized float32 rows."""
+        if kind not in STORAGE_TYPES or kind == "float32":
+            raise ValueError(f"Unknown code type '{kind}' (expected float16, int8 or binary)")
+        dim = embs.shape[1] if embs.ndim == 2 else 0
+        if kind == "float16":
+            return cls(kind, np.asarray(embs, dtype=np.float16), dim=dim)
+        if kind == "int8":
+            scale = np.abs(embs).max(axis=0) / 127.0 if len(embs) else np.ones(dim, dtype=np.float32)
+            scale = np.maximum(scale, 1e-8).astype(np.float32)
+            codes = np.clip(np.rint(embs / scale), -127, 127).astype(np.int8)
+            return cls(kind, codes, scale=scale, dim=dim)
+        bits = np.packbits(np.asarray(embs) > 0, axis=1)
+        if bits.shape[1] % 8 == 0:
+            bits = bits.view(np.uint64)  # 8x fewer XOR/popcount ops per row
+        return cls(kind, np.ascontiguousarray(bits), dim=dim)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def take(self, rows: np.ndarray) -> "VectorCodes":
+        """Codes for a subset of rows (used after metadata filters)."""
+        return VectorCodes(self.kind, self.codes[rows], scale=self.scale, dim=self.dim)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """Approximate similarity of every row to a normalized query; higher is closer."""
+        return self.scores_many(np.asarray(query, dtype=np.float32)[None, :])[0]
+
+    def scores_many(self, queries: np.ndarray) -> np.ndarray:
+        """(queries, rows) matrix of approximate similarities for a batch of normalized queries."""
+        queries = np.asarray(queries, dtype=np.float32)
+        if self.kind == "binary":
+            q_bits = np.packbits(queries > 0, axis=1)
+            if self.codes.dtype == np.uint64:
+                q_bits = q_bits.view(np.uint64)
+            out = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+            for j, bits in enumerate(q_bits):
+                out[j] = -_popcount(np.bitwise_xor(self.codes, bits)).sum(axis=1, dtype=np.int32)
+            return out
+
+        # int8 folds the per-dimension scale into the queries, so the codes are only upcast
+        q = queries * self.scale if self.kind == "int8" else queries
+        out = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        for start in range(0, len(self.codes), SCORE_BLOCK):
+            block = self.codes[start:start + SCORE_BLOCK].astype(np.float32)
+            out[:, start:start + len(block)] = q @ block.T
+        return out
+
+    def candidates(self, query: np.ndarray, n: int) -> np.ndarray:
+        return top_indices(self.scores(query), n)
@@ -2,10 +2,21 @@
 
 import sqlite3
 import os
+from array import array
 
 DB_TYPE = "sqlite"
 DB_PATH = os.path.join(os.path.dirname(__file__), "history.db")
 
+# columns added after the first release; init_db adds whichever an older history.db lacks
+HISTORY_COLUMNS = {
+    "conversation_id": "TEXT",
+    "model": "TEXT",
+    "context": "BLOB",          # Ollama's context tokens after this turn, packed int32
+    "prompt_eval_ms": "REAL",
+    "prompt_eval_count": "INTEGER",
+}
+CONTEXT_ROWS = 2  # rows per conversation that keep their context: the last turn and the one before
+
 def get_connection():
     if DB_TYPE == "sqlite":
         conn = sqlite3.connect(DB_PATH)
@@ -25,4 +36,59 @@ def init_db():
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
+        existing = {row["name"] for row in cursor.execute("PRAGMA table_info(history)")}
+        for name, kind in HISTORY_COLUMNS.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE history ADD COLUMN {name} {kind}")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_conversation ON history (conversation_id, id)")
+        conn.commit()
+
+def pack_context(context):
+    """4 bytes per token instead of a JSON list several times that size."""
+    return array("i", context).tobytes() if context else None
+
+def unpack_context(blob):
+    if not blob:
+        return None
+    context = array("i")
+    context.frombytes(blob)
+    return context.tolist()
+
+def save_turn(prompt, response, conversation_id=None, model=None, context=None, stats=None):
+    """
+    Stores one prompt/response row. For conversations, the context tokens are kept on the
+    last CONTEXT_ROWS rows only (enough to continue or regenerate), so the table stays small.
+    """
+    stats = stats or {}
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO history (prompt, response, conversation_id, model, context, prompt_eval_ms, prompt_eval_count) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (prompt, response, conversation_id, model, pack_context(context),
+             stats.get("prompt_eval_ms"), stats.get("prompt_eval_count")),
+        )
+        if conversation_id and context:
+            cursor.execute(
+                "UPDATE history SET context = NULL WHERE conversation_id = ? AND context IS NOT NULL AND id NOT IN "
+                "(SELECT id FROM history WHERE conversation_id = ? ORDER BY id DESC LIMIT ?)",
+                (conversation_id, conversation_id, CONTEXT_ROWS),
+            )
         conn.commit()
+        return cursor.lastrowid
+
+def load_conversation(conversation_id):
+    """The saved context state of a conversation, or None when it has none."""
+    with get_connection() as conn:
+        rows = conn.execute(
+            "SELECT model, context FROM history WHERE conversation_id = ? ORDER BY id DESC LIMIT ?",
+            (conversation_id, CONTEXT_ROWS),
+        ).fetchall()
+    if not rows or not rows[0]["context"]:
+        return None
+    parent = rows[1] if len(rows) > 1 and rows[1]["model"] == rows[0]["model"] else None
+    return {
+        "model": rows[0]["model"],
+        "context": unpack_context(rows[0]["context"]),
+        "parent_context": unpack_context(parent["context"]) if parent else None,
+    }
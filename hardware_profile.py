@@ -1,61 +1,234 @@
 import psutil
 import platform
+import hashlib
+import json
+import os
+from datetime import datetime
 try:
     import GPUtil
 except ImportError:
     GPUtil = None
 
+PROFILE_CACHE_PATH = "hardware_profile.json"
+TUNING_RETRY_SECONDS = 6 * 3600  # an unprobed tuning (Ollama was down) is redone at most this often
+
+_cached_profile = None
+_cached_tuning = None
+
+
+def _cheap_hardware_facts():
+    """Facts that are fast to read on every startup (no GPU driver calls)."""
+    return {
+        "system": platform.system(),
+        "machine": platform.machine(),
+        "cpu_name": platform.processor(),
+        "cpu_cores": psutil.cpu_count(logical=False) or os.cpu_count() or 1,
+        "cpu_threads": os.cpu_count() or 1,
+        "total_ram_gb": round(psutil.virtual_memory().total / (1024**3), 2),
+    }
+
+
+def hardware_fingerprint(facts=None):
+    facts = facts or _cheap_hardware_facts()
+    blob = json.dumps(facts, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()[:16]
+
+
+def load_profile_cache(path=PROFILE_CACHE_PATH):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError):
+        return {}
+
+
+def save_profile_cache(cache, path=PROFILE_CACHE_PATH):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2)
+
+
+def get_system_profile(refresh=False):
+    """
+    Returns the hardware profile. The GPU probe (GPUtil shells out to nvidia-smi) only runs
+    when the cheap CPU/RAM fingerprint differs from the cached one, or when `refresh` is set.
+    """
+    global _cached_profile, _cached_tuning
+    if _cached_profile is not None and not refresh:
+        return _cached_profile
+
+    facts = _cheap_hardware_facts()
+    fingerprint = hardware_fingerprint(facts)
+    cache = load_profile_cache()
+
+    if not refresh and cache.get("fingerprint") == fingerprint and cache.get("profile"):
+        _cached_profile = cache["profile"]
+        return _cached_profile
 
-def get_system_profile():
-    ram = round(psutil.virtual_memory().total / (1024**3), 2)
-    cpu = platform.processor()
     gpu_name = "None"
     gpu_mem_gb = 0
 
     if GPUtil:
-        gpus = GPUtil.getGPUs()
+        try:
+            gpus = GPUtil.getGPUs()
+        except Exception:
+            gpus = []
         if gpus:
             gpu_name = gpus[0].name
             gpu_mem_gb = round(gpus[0].memoryTotal / 1024, 2)
 
-    return {
-        "total_ram_gb": ram,
-        "cpu_name": cpu,
+    profile = {
+        **facts,
         "gpu_name": gpu_name,
         "gpu_mem_gb": gpu_mem_gb,
     }
 
+    # a different GPU invalidates earlier tuning, so re-fingerprint including it
+    full_fingerprint = hardware_fingerprint(profile)
+    if cache.get("profile_fingerprint") != full_fingerprint:
+        cache.pop("tuning", None)
+        _cached_tuning = None
+    cache.update({"fingerprint": fingerprint, "profile_fingerprint": full_fingerprint, "profile": profile})
+    save_profile_cache(cache)
+
+    _cached_profile = profile
+    return profile
+
+
+# ─── Autotuner ────────────────────────────────────────────
+NUM_CTX_CANDIDATES = [2048, 4096, 8192]
+NUM_BATCH_CANDIDATES = [256, 512]
+
+
+def recommend_num_ctx(profile):
+    """Largest context whose KV cache comfortably fits next to a 7B model."""
+    budget = max(profile.get("gpu_mem_gb", 0), profile.get("total_ram_gb", 8) / 2)
+    if budget >= 16:
+        return 8192
+    if budget >= 8:
+        return 4096
+    return 2048
+
 
-def get_tuned_generation_settings(profile=None):
+def recommend_quantization(profile):
+    """Ollama tag suffix to prefer when pulling models on this machine."""
+    budget = max(profile.get("gpu_mem_gb", 0), profile.get("total_ram_gb", 8) / 2)
+    if budget >= 24:
+        return "q8_0"
+    if budget >= 12:
+        return "q5_K_M"
+    return "q4_K_M"
+
+
+def recommend_model_residency(profile):
     """
-    Returns optimal generation settings (temperature and max_tokens) 
-    based on system specs like RAM, CPU, and GPU.
+    How many Ollama models may stay loaded at once and the memory (GB) they may share.
+    Uses the same budget as the num_ctx/quantization picks: VRAM, or half the RAM on CPU.
     """
-    if profile is None:
-        profile = get_system_profile()
+    budget = max(profile.get("gpu_mem_gb", 0), profile.get("total_ram_gb", 8) / 2)
+    if budget >= 24:
+        max_models = 3
+    elif budget >= 12:
+        max_models = 2
+    else:
+        max_models = 1
+    return {"max_models": max_models, "budget_gb": budget}
 
-    ram = profile.get("total_ram_gb", 8)
-    cpu = profile.get("cpu_name", "").lower()
-    gpu = profile.get("gpu_name", "").lower()
+
+def recommend_image_gen_defaults(profile):
     gpu_mem = profile.get("gpu_mem_gb", 0)
+    if gpu_mem >= 8:
+        return {"width": 1024, "height": 1024, "num_inference_steps": 30}
+    if gpu_mem >= 4:
+        return {"width": 768, "height": 768, "num_inference_steps": 25}
+    return {"width": 512, "height": 512, "num_inference_steps": 20}
 
-    #advanced logic
-    if "intel" in cpu and ram < 8:
-        return {"temperature": 0.6, "max_tokens": 512}
-    if "ryzen" in cpu and ram < 16:
-        return {"temperature": 0.7, "max_tokens": 768}
-    if "nvidia" in gpu and ram >= 16 and gpu_mem >= 8:
-        return {"temperature": 0.8, "max_tokens": 1024}
-    if "apple" in cpu or "m1" in cpu or "m2" in cpu:
-        return {"temperature": 0.75, "max_tokens": 1024}
-
-    # fallback tiered logic
-    if gpu_mem >= 12 and ram >= 32:
-        return {"temperature": 0.9, "max_tokens": 1536}
-    elif gpu_mem >= 8 and ram >= 16:
-        return {"temperature": 0.8, "max_tokens": 1024}
-    elif gpu_mem >= 4 or ram >= 12:
-        return {"temperature": 0.7, "max_tokens": 768}
-    else:
-        return {"temperature": 0.6, "max_tokens": 512}
 
+def _probe(model, options):
+    from core.utils.benchmark import run_trial
+    try:
+        return run_trial(model, options, num_predict=16, timeout=60).get("tokens_per_sec") or 0
+    except Exception as e:
+        print(f"[Autotune] Probe failed for {options}: {e}")
+        return 0
+
+
+def autotune(model, profile=None, probe=True):
+    """
+    Chooses performance knobs for this machine: `num_thread` and `num_batch` from short local
+    Ollama probes, `num_ctx` and the quantization variant from memory, and image-gen defaults
+    from VRAM. Probes are skipped when `probe` is False; needs_tuning() retries them later.
+    """
+    profile = profile or get_system_profile()
+    cores = profile.get("cpu_cores", 1)
+    threads = profile.get("cpu_threads", cores)
+
+    ollama = {"num_ctx": recommend_num_ctx(profile), "num_thread": cores, "num_batch": 512}
+    probed = False
+
+    if probe:
+        # the first call pays the model load, keep it out of the comparison
+        _probe(model, {"num_ctx": ollama["num_ctx"]})
+
+        thread_candidates = sorted({max(1, cores // 2), cores, threads})
+        rates = {n: _probe(model, {"num_ctx": ollama["num_ctx"], "num_thread": n}) for n in thread_candidates}
+        if any(rates.values()):
+            ollama["num_thread"] = max(rates, key=rates.get)
+            rates = {
+                b: _probe(model, {"num_ctx": ollama["num_ctx"], "num_thread": ollama["num_thread"], "num_batch": b})
+                for b in NUM_BATCH_CANDIDATES
+            }
+            if any(rates.values()):
+                ollama["num_batch"] = max(rates, key=rates.get)
+            probed = True
+
+    return {
+        "ollama": ollama,
+        "quantization": recommend_quantization(profile),
+        "image_gen": recommend_image_gen_defaults(profile),
+        "probed": probed,
+        "model": model,
+        "tuned_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def get_tuning():
+    """Returns the cached autotune result for the current hardware, or {}."""
+    global _cached_tuning
+    if _cached_tuning is None:
+        get_system_profile()
+        _cached_tuning = load_profile_cache().get("tuning", {})
+    return _cached_tuning
+
+
+def needs_tuning():
+    """True with no tuning yet, or when the last one couldn't probe Ollama and is older than the retry interval."""
+    tuning = get_tuning()
+    if not tuning:
+        return True
+    if tuning.get("probed"):
+        return False
+    try:
+        age = (datetime.now() - datetime.fromisoformat(tuning.get("tuned_at", ""))).total_seconds()
+    except ValueError:
+        return True
+    return age >= TUNING_RETRY_SECONDS
+
+
+def ensure_tuned(model, probe=True):
+    """
+    Runs the autotuner only if this hardware has no (probed) tuning yet and
+    caches the result next to the profile. Never touches user generation settings.
+    """
+    if not needs_tuning():
+        return get_tuning()
+
+    global _cached_tuning
+    tuning = autotune(model, probe=probe)
+    _cached_tuning = tuning
+    cache = load_profile_cache()
+    cache["tuning"] = tuning
+    save_profile_cache(cache)
+    print(f"[Autotune] {tuning['ollama']} (probed={tuning['probed']})")
+    return tuning
@@ -1,64 +1,75 @@
 import json
 import os
 import requests
-import subprocess
+import sys
+import threading
 import time
-from PyQt6.QtWidgets import QMessageBox
+from collections import OrderedDict
+from core.utils import telemetry
+from core.utils.config_store import get_store
+from core.utils.benchmark import run_benchmark_suite, save_benchmark_report, best_variant, OLLAMA_URL
+
+DEFAULT_KEEP_ALIVE = "30m"  # how long Ollama keeps a model loaded after its last request
+CATALOGUE_TTL = 60.0        # seconds the /api/tags listing is reused before asking again
+MAX_CONVERSATIONS = 64      # conversation contexts held in memory; older ones reload from history.db
 
 
 class ModelLoader:
     def __init__(self, config_path="config.json"):
         self.config_path = config_path
+        self.config_store = get_store(config_path)  # shared with every loader on the same file
         self.config = self.load_or_create_config()
+        self.model_override = None  # per-process model (the CLI's --model); never saved to the config
         self.model = None
+        # one keep-alive connection pool for every Ollama call
+        self.session = requests.Session()
+        self.ollama_url = self.config.get("ollama_url", OLLAMA_URL).rstrip("/")
+        self._catalogue = None
+        self._catalogue_at = 0.0
+        self._recent = OrderedDict()  # model -> last use (monotonic), most recent last
+        self._warming = set()
+        self._models_lock = threading.Lock()
+        self._conversations = OrderedDict()  # conversation id -> context state
+        self._conversations_lock = threading.Lock()
+        self.config_store.subscribe(self._on_config_changed)
 
     def load_or_create_config(self):
-        default_config = {
-            "default_model": {
-                "type": "ollama",
-                "model_name": "mistral:latest"
-            },
-            "generation": {
-                "temperature": 0.7,
-                "max_tokens": 512
-            },
-            "performance": {
-                "backend": "auto",
-                "last_benchmark": {
-                    "cpu": None,
-                    "gpu": None
-                }
-            }
-        }
-
-        if not os.path.exists(self.config_path):
-            self.save_config(default_config)
-            return default_config
+        """Config from the shared ConfigStore (core/utils/config_store.py); defaults only fill gaps."""
+        error, self.config_store.load_error = self.config_store.load_error, None
+        if error:
+            # only surface a dialog when running inside the Qt app; headless callers never import Qt
+            if "PyQt6.QtWidgets" in sys.modules:
+                from PyQt6.QtWidgets import QApplication, QMessageBox
+                if QApplication.instance() is not None:
+                    QMessageBox.warning(None, "Config Error",
+                        f"Failed to load config file:\n{error}\n\nA default config will be created.")
+        return self.config_store.data
 
-        try:
-            with open(self.config_path, "r", encoding="utf-8") as f:
-                config = json.load(f)
-
-            config.setdefault("default_model", {}).update(default_config["default_model"])
-            config.setdefault("generation", {}).update(default_config["generation"])
-            config.setdefault("performance", {}).update(default_config["performance"])
-            config["performance"].setdefault("backend", "auto")
-            config["performance"].setdefault("last_benchmark", {"cpu": None, "gpu": None})
-
-            return config
+    def save_config(self, config=None):
+        """Schedules a debounced write; prefer config_store.set/update, which also notify subscribers."""
+        if config is not None and config is not self.config:
+            self.config.clear()
+            self.config.update(config)
+        self.config_store.changed()
 
-        except (json.JSONDecodeError, IOError) as e:
-            QMessageBox.warning(None, "Config Error",
-                f"Failed to load config file:\n{str(e)}\n\nA default config will be created.")
-            self.save_config(default_config)
-            return default_config
+    def default_model_name(self) -> str:
+        """The model used when a call names none: `model_override`, else the configured default."""
+        return self.model_override or self.config["default_model"].get("model_name", "mistral")
 
-    def save_config(self, config=None):
-        with open(self.config_path, "w", encoding="utf-8") as f:
-            json.dump(config or self.config, f, indent=2)
+    def _on_config_changed(self, keys):
+        if "ollama_url" in keys:
+            self.ollama_url = self.config.get("ollama_url", OLLAMA_URL).rstrip("/")
 
     def choose_best_backend(self):
         times = self.config["performance"].get("last_benchmark", {})
+
+        # prefer measured decode throughput; fall back to wall-clock seconds from older benchmarks
+        rates = times.get("tokens_per_sec", {})
+        cpu_rate = rates.get("cpu")
+        gpu_rate = rates.get("gpu")
+        if cpu_rate is not None and gpu_rate is not None:
+            return "gpu" if gpu_rate > cpu_rate else "cpu"
+
         cpu_time = times.get("cpu")
         gpu_time = times.get("gpu")
 
@@ -67,13 +78,34 @@ class ModelLoader:
 
         return "gpu" if gpu_time < cpu_time else "cpu"
 
+    def get_ollama_options(self) -> dict:
+        """
+        Builds the Ollama `options` payload from the autotuned knobs (num_ctx, num_thread, num_batch)
+        plus the generation and performance config. A CPU backend forces `num_gpu=0` so the
+        benchmarked choice actually applies.
+        """
+        from hardware_profile import get_tuning
+
+        settings = self.get_generation_settings()
+        performance = self.config.get("performance", {})
+        options = dict(get_tuning().get("ollama", {}))
+        options["temperature"] = settings.get("temperature", 0.7)
+
+        backend = performance.get("backend", "auto")
+        if backend == "auto":
+            backend = self.choose_best_backend()
+        if backend == "cpu":
+            options["num_gpu"] = 0
+            if performance.get("num_thread"):
+                options["num_thread"] = performance["num_thread"]
+        return options
+
     def load_model(self):
         backend_pref = self.config["performance"].get("backend", "auto")
         if backend_pref == "auto":
             best_backend = self.choose_best_backend()
             print(f"[Auto-selected backend: {best_backend}]")
-            self.config["performance"]["backend"] = best_backend
-            self.save_config()
+            self.config_store.set("performance.backend", best_backend)
         else:
             best_backend = backend_pref
 
@@ -102,35 +134,148 @@ class ModelLoader:
 
     def is_ollama_running(self):
         try:
-            response = requests.get("http://localhost:11434")
+            response = requests.get(self.ollama_url)
             return response.status_code == 200
         except:
             return False
 
-    def generate_with_ollama_stream(self, prompt: str):
-        model_name = self.config["default_model"].get("model_name", "mistral")
-        settings = self.get_generation_settings()
+    def warm_connection(self):
+        """Opens the pooled connection to Ollama ahead of the first request."""
+        try:
+            self.session.head(self.ollama_url, timeout=2)
+        except requests.RequestException:
+            pass
 
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
+    # ── Conversation context ────────────────────────────
+    def conversation(self, conversation_id: str) -> dict:
+        """
+        Context state of a conversation: the model it belongs to, Ollama's `context` tokens after
+        the last turn and before it (for regenerating). Restored from history.db on first use.
+        """
+        with self._conversations_lock:
+            state = self._conversations.pop(conversation_id, None)
+            if state is None:
+                state = self._restore_conversation(conversation_id)
+            self._conversations[conversation_id] = state  # most recently used last
+            while len(self._conversations) > MAX_CONVERSATIONS:
+                self._conversations.popitem(last=False)
+            return state
+
+    @staticmethod
+    def _restore_conversation(conversation_id: str) -> dict:
+        state = {"model": None, "context": None, "parent_context": None}
+        try:
+            from db import load_conversation
+            state.update(load_conversation(conversation_id) or {})
+        except Exception as e:  # no history.db yet, or one from before conversations were saved
+            print(f"⚠️ [ModelLoader] Could not restore conversation {conversation_id}: {e}")
+        return state
+
+    def rewind_conversation(self, conversation_id: str):
+        """Steps back one turn, so the last prompt is regenerated from the context it started with."""
+        state = self.conversation(conversation_id)
+        state["context"], state["parent_context"] = state["parent_context"], None
+
+    def forget_conversation(self, conversation_id: str):
+        with self._conversations_lock:
+            self._conversations.pop(conversation_id, None)
+
+    def _context_for(self, conversation_id: str | None, model_name: str):
+        """(state, context to send) for a turn; no context when it belongs to another model."""
+        if not conversation_id or not self.config.get("generation", {}).get("keep_context", True):
+            return None, None
+        state = self.conversation(conversation_id)
+        if not state["context"]:
+            return state, None
+        if state["model"] != model_name:
+            print(f"🔄 [ModelLoader] Model changed from {state['model']} to {model_name}; "
+                  "the conversation continues without its earlier context")
+            return state, None
+        return state, state["context"]
+
+    @staticmethod
+    def _remember(state: dict | None, model_name: str, sent_context, reply: dict):
+        if state is not None and reply.get("context"):
+            state.update(model=model_name, parent_context=sent_context, context=reply["context"])
+
+    def _post_generate(self, payload: dict, **kwargs):
+        """
+        POSTs /api/generate. If Ollama rejects a request that carried context (e.g. it no longer
+        matches the loaded model), the turn is retried once without it.
+        """
+        response = self.session.post(f"{self.ollama_url}/api/generate", json=payload, **kwargs)
+        if response.status_code >= 400 and payload.get("context"):
+            print(f"⚠️ [ModelLoader] Ollama rejected the conversation context ({response.status_code}); retrying without it")
+            response.close()
+            payload.pop("context")
+            response = self.session.post(f"{self.ollama_url}/api/generate", json=payload, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def generate_with_ollama_stream(self, prompt: str, model_name: str | None = None,
+                                    conversation_id: str | None = None, stats: dict | None = None):
+        """
+        Streams response text. With `conversation_id`, the context Ollama returned for the previous
+        turn is sent back, so earlier turns aren't evaluated again. `stats`, if given, is filled
+        with the turn's counters (prompt_eval_ms, prompt_eval_count, eval_count, context_tokens).
+        """
+        model_name = model_name or self.default_model_name()
+        state, context = self._context_for(conversation_id, model_name)
+
+        with telemetry.span("ollama.generate", model=model_name) as attrs:
+            self._touch(model_name)
+            start = time.perf_counter()
+            payload = {
                 "model": model_name,
                 "prompt": prompt,
-                "temperature": settings.get("temperature", 0.7),
+                "options": self.get_ollama_options(),
+                "keep_alive": self.keep_alive(),
                 "stream": True
-            },
-            stream=True,
-            timeout=120
-        )
-        response.raise_for_status()
+            }
+            if context:
+                payload["context"] = context
+            response = self._post_generate(payload, stream=True, timeout=120)
+            attrs["context_tokens"] = len(payload.get("context") or ())
 
-        for line in response.iter_lines(decode_unicode=True):
-            if line:
-                try:
-                    chunk = json.loads(line)
+            first_token = True
+            for line in response.iter_lines(decode_unicode=True):
+                if line:
+                    try:
+                        chunk = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if first_token and chunk.get("response"):
+                        first_token = False
+                        telemetry.record("ollama.ttft", (time.perf_counter() - start) * 1000.0, "ms", model=model_name)
+                    if chunk.get("done"):
+                        self._record_ollama_stats(chunk, model_name, attrs)
+                        self._remember(state, model_name, payload.get("context"), chunk)
+                        if stats is not None:
+                            stats.update(self.turn_stats(chunk, attrs["context_tokens"]))
                     yield chunk.get("response", "")
-                except json.JSONDecodeError:
-                    continue
+
+    @staticmethod
+    def turn_stats(reply: dict, context_tokens: int = 0) -> dict:
+        """Per-turn counters from Ollama's final message, for display and history."""
+        return {
+            "prompt_eval_ms": reply.get("prompt_eval_duration", 0) / 1e6,
+            "prompt_eval_count": reply.get("prompt_eval_count", 0),
+            "eval_count": reply.get("eval_count", 0),
+            "context_tokens": context_tokens,
+        }
+
+    @staticmethod
+    def _record_ollama_stats(chunk: dict, model_name: str, attrs: dict):
+        """Ollama's final chunk carries server-side counters (durations in nanoseconds)."""
+        if chunk.get("eval_count") and chunk.get("eval_duration"):
+            tps = chunk["eval_count"] / (chunk["eval_duration"] / 1e9)
+            telemetry.record("ollama.tokens_per_sec", tps, "tok/s", model=model_name)
+            attrs["eval_count"] = chunk["eval_count"]
+        if chunk.get("prompt_eval_count") and chunk.get("prompt_eval_duration"):
+            telemetry.record("ollama.prompt_eval", chunk["prompt_eval_duration"] / 1e6, "ms",
+                             model=model_name, tokens=chunk["prompt_eval_count"])
+        if chunk.get("load_duration"):
+            telemetry.record("ollama.load", chunk["load_duration"] / 1e6, "ms", model=model_name)
 
     def generate_single_response(self, prompt: str) -> str:
         backend = self.config["default_model"]["type"]
@@ -141,64 +286,192 @@ class ModelLoader:
             return ''.join(chunks)
         return "[Only Ollama supported]"
     
+    def generate_once(self, prompt: str, model_name: str | None = None, timeout: float = 60,
+                      conversation_id: str | None = None) -> dict:
+        """
+        One non-streaming Ollama call. Returns Ollama's full reply (response text plus
+        eval_count/eval_duration counters) and raises on HTTP or connection errors.
+        `conversation_id` reuses context as in generate_with_ollama_stream.
+        """
+        model_name = model_name or self.default_model_name()
+        state, context = self._context_for(conversation_id, model_name)
+        self._touch(model_name)
+        payload = {
+            "model": model_name,
+            "prompt": prompt,
+            "options": self.get_ollama_options(),
+            "keep_alive": self.keep_alive(),
+            "stream": False
+        }
+        if context:
+            payload["context"] = context
+        reply = self._post_generate(payload, timeout=timeout).json()
+        self._remember(state, model_name, payload.get("context"), reply)
+        return reply
+
     def generate_sync(self, prompt: str) -> str:
         """
         Synchronously generate a full response using the configured backend.
         This is used for things like prompt chaining.
         """
-        model_name = self.config["default_model"].get("model_name", "mistral")
-        settings = self.get_generation_settings()
-
         try:
-            response = requests.post(
-                "http://localhost:11434/api/generate",
-                json={
-                    "model": model_name,
-                    "prompt": prompt,
-                    "temperature": settings.get("temperature", 0.7),
-                    "stream": False
-                },
-                timeout=60
-            )
-            response.raise_for_status()
-            data = response.json()
-            return data.get("response", "")
+            return self.generate_once(prompt).get("response", "")
         except Exception as e:
             return f"[Error in generate_sync: {str(e)}]"
 
 
-    def list_ollama_models(self):
+    # ── Model catalogue and residency ───────────────────
+    def catalogue(self, refresh: bool = False) -> list[dict]:
+        """
+        Installed models from Ollama's /api/tags (name, size, details), cached for CATALOGUE_TTL
+        seconds. When Ollama can't be reached the last known list is returned.
+        """
+        with self._models_lock:
+            if not refresh and self._catalogue is not None and time.monotonic() - self._catalogue_at < CATALOGUE_TTL:
+                return self._catalogue
         try:
-            result = subprocess.run(["ollama", "list"], capture_output=True, text=True, timeout=10)
-            if result.returncode != 0:
-                return []
-            lines = result.stdout.strip().split("\n")[1:]
-            return [line.split()[0] for line in lines if line]
-        except Exception:
+            response = self.session.get(f"{self.ollama_url}/api/tags", timeout=3)
+            response.raise_for_status()
+            models = response.json().get("models", [])
+        except (requests.RequestException, ValueError) as e:
+            print(f"⚠️ [ModelLoader] Could not list Ollama models: {e}")
+            return self._catalogue or []
+        with self._models_lock:
+            self._catalogue, self._catalogue_at = models, time.monotonic()
+        return models
+
+    def list_ollama_models(self, refresh: bool = False):
+        return [model["name"] for model in self.catalogue(refresh)]
+
+    def running_models(self) -> list[dict]:
+        """Models Ollama currently holds in memory (/api/ps): name, size, size_vram, expires_at."""
+        try:
+            response = self.session.get(f"{self.ollama_url}/api/ps", timeout=3)
+            response.raise_for_status()
+            return response.json().get("models", [])
+        except (requests.RequestException, ValueError):
             return []
 
-    def run_performance_test(self):
-        prompt = "Benchmarking system performance with this simple prompt."
-        model = self.config["default_model"]["model_name"]
-        results = {}
+    def keep_alive(self):
+        return self.config.get("performance", {}).get("keep_alive", DEFAULT_KEEP_ALIVE)
+
+    def _touch(self, model_name: str):
+        with self._models_lock:
+            self._recent.pop(model_name, None)
+            self._recent[model_name] = time.monotonic()
 
-        for device in ["cpu", "gpu"]:
+    def warm_model(self, model_name: str | None = None) -> bool:
+        """
+        Loads `model_name` ahead of its first prompt (an empty prompt makes Ollama load without
+        generating) using the same options as generation, so the runner isn't reloaded later.
+        """
+        model_name = model_name or self.default_model_name()
+        self._touch(model_name)
+        with telemetry.span("ollama.warm", model=model_name) as attrs:
             try:
-                start = time.time()
-                requests.post(
-                    "http://localhost:11434/api/generate",
-                    json={
-                        "model": model,
-                        "prompt": prompt,
-                        "stream": False
-                    },
-                    timeout=30
+                response = self.session.post(
+                    f"{self.ollama_url}/api/generate",
+                    json={"model": model_name, "prompt": "", "options": self.get_ollama_options(),
+                          "keep_alive": self.keep_alive(), "stream": False},
+                    timeout=300,
                 )
-                results[device] = round(time.time() - start, 2)
-            except Exception as e:
-                print(f"[Benchmark error on {device.upper()}]: {e}")
-                results[device] = None
-
-        self.config["performance"]["last_benchmark"] = results
-        self.save_config()
-        return results
\ No newline at end of file
+                response.raise_for_status()
+                attrs["load_ms"] = response.json().get("load_duration", 0) / 1e6
+            except (requests.RequestException, ValueError) as e:
+                print(f"⚠️ [ModelLoader] Could not preload {model_name}: {e}")
+                return False
+        self.enforce_residency()
+        return True
+
+    def warm_model_async(self, model_name: str | None = None):
+        """warm_model on a background thread; a model already being warmed isn't requested twice."""
+        model_name = model_name or self.default_model_name()
+        with self._models_lock:
+            if model_name in self._warming:
+                return
+            self._warming.add(model_name)
+
+        def run():
+            try:
+                self.warm_model(model_name)
+            finally:
+                with self._models_lock:
+                    self._warming.discard(model_name)
+
+        threading.Thread(target=run, name="ollama-warm", daemon=True).start()
+
+    def unload_model(self, model_name: str):
+        try:
+            self.session.post(f"{self.ollama_url}/api/generate",
+                              json={"model": model_name, "keep_alive": 0, "stream": False}, timeout=30)
+        except requests.RequestException as e:
+            print(f"⚠️ [ModelLoader] Could not unload {model_name}: {e}")
+
+    def residency_policy(self) -> dict:
+        """
+        {"max_models", "budget_gb"} from the hardware profile. An explicit
+        performance.max_resident_models replaces both: the user has sized it for their machine.
+        """
+        from hardware_profile import get_system_profile, recommend_model_residency
+
+        configured = self.config.get("performance", {}).get("max_resident_models")
+        if configured:
+            return {"max_models": int(configured), "budget_gb": float("inf")}
+        return recommend_model_residency(get_system_profile())
+
+    def enforce_residency(self) -> list[str]:
+        """
+        Unloads resident models beyond the policy, least recently used by this app first, and
+        always keeps the most recent one. Returns the names that were unloaded.
+        """
+        running = self.running_models()
+        if len(running) <= 1:
+            return []
+        policy = self.residency_policy()
+        with self._models_lock:
+            recent = dict(self._recent)
+        kept, used_gb, evicted = 0, 0.0, []
+        for model in sorted(running, key=lambda m: recent.get(m.get("name"), 0.0), reverse=True):
+            size_gb = model.get("size", 0) / 1024 ** 3
+            if kept == 0 or (kept < policy["max_models"] and used_gb + size_gb <= policy["budget_gb"]):
+                kept += 1
+                used_gb += size_gb
+            else:
+                evicted.append(model["name"])
+        for name in evicted:
+            print(f"💤 [ModelLoader] Unloading {name} (residency limit {policy['max_models']})")
+            self.unload_model(name)
+        return evicted
+
+    def run_performance_test(self, trials: int = 3):
+        """
+        Benchmarks the current model on CPU (`num_gpu=0`, several thread counts) and GPU,
+        persists the full report alongside the system profile, and returns
+        {"cpu": seconds, "gpu": seconds, "num_thread": best CPU thread count, ...} for the
+        settings dialog, which applies the thread count only if the user accepts.
+        """
+        from hardware_profile import get_system_profile
+
+        model = self.default_model_name()
+        report = run_benchmark_suite(model, profile=get_system_profile(refresh=True), trials=trials)
+        save_benchmark_report(report)
+
+        cpu_name, cpu_stats = best_variant(report, "cpu")
+        gpu_name, gpu_stats = best_variant(report, "gpu")
+
+        results = {
+            "cpu": cpu_stats["wall_sec"] if cpu_stats else None,
+            "gpu": gpu_stats["wall_sec"] if gpu_stats else None,
+            "tokens_per_sec": {
+                "cpu": cpu_stats["tokens_per_sec"] if cpu_stats else None,
+                "gpu": gpu_stats["tokens_per_sec"] if gpu_stats else None,
+            },
+            "ttft_sec": {
+                "cpu": cpu_stats["ttft_sec"] if cpu_stats else None,
+                "gpu": gpu_stats["ttft_sec"] if gpu_stats else None,
+            },
+        }
+
+        results["num_thread"] = cpu_stats["options"].get("num_thread") if cpu_stats else None
+        self.config_store.set("performance.last_benchmark", results)
+        return results
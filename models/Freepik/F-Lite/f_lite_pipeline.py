@@ -5,6 +5,13 @@ import PIL.Image
 
 # 🛠️ Local fallback version for older diffusers
 def randn_tensor(shape, generator=None, device=None, dtype=torch.float32):
+    if isinstance(generator, list):
+        # one generator per sample, drawn on the generator's own device for reproducibility
+        samples = [
+            torch.randn((1, *shape[1:]), generator=g, device=g.device, dtype=dtype)
+            for g in generator
+        ]
+        return torch.cat(samples, dim=0).to(device)
     if generator is not None:
         return torch.randn(shape, generator=generator, device=device, dtype=dtype)
     return torch.randn(shape, device=device, dtype=dtype)
@@ -25,7 +32,21 @@ class FLitePipeline(DiffusionPipeline):
             unet=unet,
             scheduler=scheduler,
         )
+        # optional caches, set by whoever loads the pipeline (AI Forge: pipeline_cache.install_caches)
+        self.embedding_cache = None
+        self.latent_cache = None
 
+    def _encode_prompt(self, prompt):
+        text_inputs = self.tokenizer(
+            prompt,
+            padding="max_length",
+            max_length=self.tokenizer.model_max_length,
+            truncation=True,
+            return_tensors="pt"
+        )
+        return self.text_encoder(text_inputs.input_ids.to(self.device))[0]
+
+    @torch.no_grad()
     def __call__(
         self,
         prompt: Union[str, List[str]],
@@ -36,36 +57,36 @@ class FLitePipeline(DiffusionPipeline):
         negative_prompt: Optional[Union[str, List[str]]] = None,
         num_images_per_prompt: int = 1,
         eta: float = 0.0,
-        generator: Optional[torch.Generator] = None,
+        generator: Optional[Union[torch.Generator, List[torch.Generator]]] = None,
+        output_type: str = "pil",
+        checkpoint_timesteps: Optional[List[int]] = None,
+        resume_from_checkpoint: bool = True,
+        callback=None,
+        callback_steps: int = 1,
+        cancel_token=None,
         **kwargs
     ):
         if isinstance(prompt, str):
             prompt = [prompt]
+        prompt = [p for p in prompt for _ in range(num_images_per_prompt)]
+        batch_size = len(prompt)
 
-        text_inputs = self.tokenizer(
-            prompt,
-            padding="max_length",
-            max_length=self.tokenizer.model_max_length,
-            truncation=True,
-            return_tensors="pt"
-        )
-        input_ids = text_inputs.input_ids.to(self.device)
-        text_embeddings = self.text_encoder(input_ids)[0]
+        # with an embedding cache, only unseen prompts (and the unconditional one, once) hit the encoder
+        cache = self.embedding_cache
+        if cache is not None:
+            text_embeddings = cache.encode(self.tokenizer, self.text_encoder, prompt, self.device)
+        else:
+            text_embeddings = self._encode_prompt(prompt)
 
         if guidance_scale > 1.0:
-            uncond_tokens = [""] * len(prompt)
-            uncond_input = self.tokenizer(
-                uncond_tokens,
-                padding="max_length",
-                max_length=self.tokenizer.model_max_length,
-                truncation=True,
-                return_tensors="pt"
-            )
-            uncond_embeddings = self.text_encoder(uncond_input.input_ids.to(self.device))[0]
+            if cache is not None:
+                uncond_embeddings = cache.uncond(self.tokenizer, self.text_encoder, len(prompt), self.device)
+            else:
+                uncond_embeddings = self._encode_prompt([""] * len(prompt))
             text_embeddings = torch.cat([uncond_embeddings, text_embeddings], dim=0)
 
         latents = randn_tensor(
-            (len(prompt), self.unet.in_channels, height // 8, width // 8),
+            (batch_size, self.unet.in_channels, height // 8, width // 8),
             generator=generator,
             device=self.device,
             dtype=text_embeddings.dtype
@@ -74,7 +95,22 @@ class FLitePipeline(DiffusionPipeline):
         self.scheduler.set_timesteps(num_inference_steps, device=self.device)
         latents = latents * self.scheduler.init_noise_sigma
 
-        for t in self.scheduler.timesteps:
+        # resume from the most advanced cached checkpoint this schedule passes through
+        timesteps = self.scheduler.timesteps
+        start, run_key = 0, None
+        checkpoints = self.latent_cache
+        if checkpoints is not None:
+            run_key = checkpoints.run_key(prompt, generator, height, width, self.scheduler)
+            if resume_from_checkpoint:
+                start, cached = checkpoints.resume(run_key, timesteps, self.scheduler, self.device)
+                if cached is not None:
+                    latents = cached.to(latents.dtype)
+        checkpoint_timesteps = set(checkpoint_timesteps or []) if checkpoints is not None else set()
+
+        for i, t in enumerate(timesteps[start:], start=start):
+            if int(t) in checkpoint_timesteps:
+                checkpoints.save(run_key, timesteps, i, latents, self.scheduler)
+
             latent_model_input = torch.cat([latents] * 2) if guidance_scale > 1.0 else latents
             latent_model_input = self.scheduler.scale_model_input(latent_model_input, t)
 
@@ -85,6 +121,14 @@ class FLitePipeline(DiffusionPipeline):
                 noise_pred = noise_pred_uncond + guidance_scale * (noise_pred_text - noise_pred_uncond)
 
             latents = self.scheduler.step(noise_pred, t, latents).prev_sample
+            # cancel_token: anything with raise_if_cancelled(), checked once per step
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            if callback is not None and callback_steps and i % callback_steps == 0:
+                callback(i, t, latents)
+
+        if output_type == "latent":
+            return {"images": latents}
 
         latents = 1 / 0.18215 * latents
         image = self.vae.decode(latents).sample
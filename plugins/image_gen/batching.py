@@ -0,0 +1,73 @@
+# plugins/image_gen/batching.py
+import hashlib
+import io
+import os
+
+import numpy as np
+import PIL.Image
+import torch
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# rough peak activation bytes per output pixel for one image with classifier-free guidance (fp32)
+ACTIVATION_BYTES_PER_PIXEL = 6000
+MEMORY_HEADROOM = 0.6
+
+
+def available_memory_bytes() -> int:
+    if torch.cuda.is_available():
+        free, _ = torch.cuda.mem_get_info()
+        return free
+    if psutil is not None:
+        return psutil.virtual_memory().available
+    return 4 * 1024 ** 3
+
+
+def estimate_batch_size(width: int, height: int, dtype=torch.float32, max_batch: int = 4) -> int:
+    """How many images fit in one UNet forward pass given the memory that's free right now."""
+    bytes_per_pixel = ACTIVATION_BYTES_PER_PIXEL * (0.5 if dtype in (torch.float16, torch.bfloat16) else 1.0)
+    per_image = width * height * bytes_per_pixel
+    fits = int(available_memory_bytes() * MEMORY_HEADROOM // per_image)
+    return max(1, min(max_batch, fits))
+
+
+def make_generators(seeds):
+    # CPU generators keep seeds reproducible across devices
+    return [torch.Generator("cpu").manual_seed(int(seed)) for seed in seeds]
+
+
+def decode_latent(pipe, latent):
+    """Decodes a single latent (1, C, H, W) to a PIL image, running the safety checker if the pipe has one."""
+    vae = pipe.vae
+    scaling = getattr(vae.config, "scaling_factor", 0.18215)
+    with torch.no_grad():
+        image = vae.decode(latent.to(vae.dtype) / scaling).sample
+
+        # diffusers' checker expects the raw [-1, 1] decoder output
+        if getattr(pipe, "safety_checker", None) is not None and hasattr(pipe, "run_safety_checker"):
+            image, _ = pipe.run_safety_checker(image, image.device, image.dtype)
+
+    image = (image / 2 + 0.5).clamp(0, 1)
+
+    array = image.cpu().permute(0, 2, 3, 1).float().numpy()[0]
+    return PIL.Image.fromarray((array * 255).round().astype(np.uint8))
+
+
+def save_content_addressed(image, output_dir: str) -> str:
+    """Writes `image` as PNG named by the SHA-256 of its bytes; identical images share one file."""
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    data = buffer.getvalue()
+    digest = hashlib.sha256(data).hexdigest()[:20]
+
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.abspath(os.path.join(output_dir, f"{digest}.png"))
+    if not os.path.exists(path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,63 @@
+# plugins/image_gen/benchmark.py — seconds/image and peak RSS per performance mode
+#
+# Usage (from the repo root):
+#   python -m plugins.image_gen.benchmark --model stabilityai/stable-diffusion-2-1 --modes quality fast
+
+import argparse
+import json
+import time
+
+from core.utils.benchmark import PeakMemorySampler
+from plugins.image_gen.performance import PERFORMANCE_MODES, apply_performance_mode, vae_mode
+from plugins.image_gen.engine import load_pipeline
+
+BENCH_PROMPT = "a lighthouse on a cliff at sunset, detailed, 35mm photo"
+
+
+def benchmark_modes(model_id, modes, width, height, steps, images):
+    pipe = load_pipeline(model_id, {})
+    results = {}
+
+    for mode in modes:
+        config = {"performance_mode": mode}
+        run_steps = apply_performance_mode(pipe, config, width, height, steps)
+
+        with vae_mode(pipe, config, width, height):
+            # one throwaway image so lazy kernel init doesn't land in the first mode's numbers
+            pipe(BENCH_PROMPT, num_inference_steps=2, width=width, height=height)
+
+            with PeakMemorySampler() as sampler:
+                start = time.perf_counter()
+                for _ in range(images):
+                    pipe(BENCH_PROMPT, num_inference_steps=run_steps, width=width, height=height)
+                elapsed = time.perf_counter() - start
+
+        results[mode] = {
+            "steps": run_steps,
+            "seconds_per_image": round(elapsed / images, 2),
+            "peak_rss_mb": sampler.peak_mb,
+        }
+        print(f"⏱️ [ImageGen Benchmark] {mode}: {results[mode]}")
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark image_gen performance modes")
+    parser.add_argument("--model", default="stabilityai/stable-diffusion-2-1")
+    parser.add_argument("--modes", nargs="+", default=["quality", "fast"], choices=PERFORMANCE_MODES)
+    parser.add_argument("--width", type=int, default=512)
+    parser.add_argument("--height", type=int, default=512)
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--images", type=int, default=2)
+    parser.add_argument("--out", default=None, help="optional JSON file for the results")
+    args = parser.parse_args()
+
+    results = benchmark_modes(args.model, args.modes, args.width, args.height, args.steps, args.images)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
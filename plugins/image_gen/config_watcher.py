@@ -0,0 +1,65 @@
+# plugins/image_gen/config_watcher.py
+import json
+import os
+import threading
+
+
+class ConfigWatcher:
+    """
+    Polls a JSON config file's mtime/size on a background thread and reloads it only
+    when it actually changes, calling `on_change(new_config)` afterwards.
+    """
+    def __init__(self, path, on_change=None, interval: float = 1.0):
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self.config = {}
+        self._stamp = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.check()
+
+    def _current_stamp(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def check(self) -> bool:
+        """Reloads the config if the file changed since the last check. Returns True on reload."""
+        stamp = self._current_stamp()
+        if stamp == self._stamp:
+            return False
+        self._stamp = stamp
+
+        if stamp is None:
+            print("⚠️ [ImageGen] No config found. Using defaults.")
+            self.config = {}
+        else:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.config = json.load(f)
+                print(f"🔁 [ImageGen] Reloaded config: {self.config}")
+            except (json.JSONDecodeError, IOError) as e:
+                # keep the last good config; a half-written file will be picked up next poll
+                print(f"⚠️ [ImageGen] Failed to reload config: {e}")
+                self._stamp = None
+                return False
+
+        if self.on_change:
+            self.on_change(self.config)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
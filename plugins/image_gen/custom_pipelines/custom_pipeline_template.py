@@ -9,6 +9,9 @@ Usage:
 1. Copy this file and rename it (e.g., `my_custom_pipeline.py`)
 2. Define your custom logic inside the `CustomPipeline` class.
 3. Add the model and pipeline path to `CUSTOM_PIPELINES` in `plugin.py`.
+4. Keep the embedding/latent caches: pass `checkpoint_timesteps=[...]` to store latents at those
+   timesteps, and later calls with the same prompt + seed resume from the latest one
+   (multistep schedulers only when the schedule up to it is unchanged; see pipeline_cache.py).
 
 Example:
     "my-org/my-model": {
@@ -23,6 +26,9 @@ from diffusers import DiffusionPipeline
 from diffusers.utils import randn_tensor
 import PIL.Image
 
+from plugins.image_gen.custom_pipelines.pipeline_cache import PromptEmbeddingCache, LatentCheckpointCache
+from plugins.image_gen.custom_pipelines.step_hooks import run_step_hooks
+
 
 class CustomPipeline(DiffusionPipeline):
     def __init__(self, vae, text_encoder, tokenizer, unet, scheduler):
@@ -44,6 +50,11 @@ class CustomPipeline(DiffusionPipeline):
             scheduler=scheduler,
         )
 
+        # Prompt embeddings and latent checkpoints are reused across calls (see pipeline_cache.py)
+        self.embedding_cache = PromptEmbeddingCache()
+        self.latent_cache = LatentCheckpointCache()
+
+    @torch.no_grad()
     def __call__(
         self,
         prompt: Union[str, List[str]],
@@ -53,39 +64,31 @@ class CustomPipeline(DiffusionPipeline):
         guidance_scale: float = 7.5,
         negative_prompt: Optional[Union[str, List[str]]] = None,
         num_images_per_prompt: int = 1,
-        generator: Optional[torch.Generator] = None,
+        generator: Optional[Union[torch.Generator, List[torch.Generator]]] = None,
+        output_type: str = "pil",
+        checkpoint_timesteps: Optional[List[int]] = None,
+        resume_from_checkpoint: bool = True,
+        callback=None,
+        callback_steps: int = 1,
+        cancel_token=None,
         **kwargs
     ):
         """
         Main image generation loop. This mimics StableDiffusionPipeline.
         You can replace this logic with anything — including ControlNet, IP-Adapter, or multi-prompt models.
+        Pass `output_type="latent"` to get the final latents back so the caller can decode them one by one.
         """
 
         if isinstance(prompt, str):
             prompt = [prompt]
+        prompt = [p for p in prompt for _ in range(num_images_per_prompt)]
 
-        # Encode text
-        text_inputs = self.tokenizer(
-            prompt,
-            padding="max_length",
-            max_length=self.tokenizer.model_max_length,
-            truncation=True,
-            return_tensors="pt"
-        )
-        input_ids = text_inputs.input_ids.to(self.device)
-        text_embeddings = self.text_encoder(input_ids)[0]
+        # Encode text (cached per prompt; the unconditional embedding is encoded once per model)
+        text_embeddings = self.embedding_cache.encode(self.tokenizer, self.text_encoder, prompt, self.device)
 
         # Classifier-free guidance setup
         if guidance_scale > 1.0:
-            uncond_tokens = [""] * len(prompt)
-            uncond_inputs = self.tokenizer(
-                uncond_tokens,
-                padding="max_length",
-                max_length=self.tokenizer.model_max_length,
-                truncation=True,
-                return_tensors="pt"
-            )
-            uncond_embeddings = self.text_encoder(uncond_inputs.input_ids.to(self.device))[0]
+            uncond_embeddings = self.embedding_cache.uncond(self.tokenizer, self.text_encoder, len(prompt), self.device)
             text_embeddings = torch.cat([uncond_embeddings, text_embeddings], dim=0)
 
         # Generate initial latent noise
@@ -99,8 +102,22 @@ class CustomPipeline(DiffusionPipeline):
         self.scheduler.set_timesteps(num_inference_steps, device=self.device)
         latents = latents * self.scheduler.init_noise_sigma
 
+        # Resume from the most advanced cached checkpoint this schedule passes through
+        # (see pipeline_cache.py for which schedulers can resume)
+        run_key = self.latent_cache.run_key(prompt, generator, height, width, self.scheduler)
+        timesteps = self.scheduler.timesteps
+        start, cached = 0, None
+        if resume_from_checkpoint:
+            start, cached = self.latent_cache.resume(run_key, timesteps, self.scheduler, self.device)
+        if cached is not None:
+            latents = cached.to(latents.dtype)
+        checkpoint_timesteps = set(checkpoint_timesteps or [])
+
         # Denoising loop
-        for t in self.scheduler.timesteps:
+        for i, t in enumerate(timesteps[start:], start=start):
+            if int(t) in checkpoint_timesteps:
+                self.latent_cache.save(run_key, timesteps, i, latents, self.scheduler)
+
             latent_model_input = torch.cat([latents] * 2) if guidance_scale > 1.0 else latents
             latent_model_input = self.scheduler.scale_model_input(latent_model_input, t)
 
@@ -115,6 +132,10 @@ class CustomPipeline(DiffusionPipeline):
                 noise_pred = noise_pred_uncond + guidance_scale * (noise_pred_text - noise_pred_uncond)
 
             latents = self.scheduler.step(noise_pred, t, latents).prev_sample
+            run_step_hooks(i, t, latents, callback, callback_steps, cancel_token)
+
+        if output_type == "latent":
+            return latents
 
         # Decode latents to image
         latents = 1 / 0.18215 * latents
@@ -0,0 +1,200 @@
+"""
+🗃️ Caches shared by AI Forge's custom diffusion pipelines
+---------------------------------------------------------
+
+The pipelines themselves don't import this module: install_caches(pipe) sets their
+`embedding_cache` / `latent_cache` attributes after loading (plugins/image_gen/engine.py),
+and a pipeline without them simply encodes every prompt and never checkpoints.
+
+PromptEmbeddingCache
+    LRU of text-encoder outputs keyed by (tokenizer, prompt). The unconditional ("")
+    embedding is computed once per model and never evicted.
+
+LatentCheckpointCache
+    Stores intermediate latents at chosen timesteps for a (prompt, seed, size, scheduler)
+    run, so a re-run can resume from the latest checkpoint its schedule passes through
+    instead of starting from pure noise. When resume applies:
+      - first-order schedulers (DDIM, DDPM, Euler, Euler ancestral): whenever the run reaches
+        the checkpointed timestep, e.g. after raising the step count or changing guidance
+      - multistep schedulers (DPM-Solver++, UniPC, DEIS): their model-output history is saved
+        with the latents and restored, which is only valid when every timestep up to the
+        checkpoint is the same, so they resume for a changed guidance scale but not for a
+        changed step count
+      - other schedulers with hidden per-step state (PNDM, LMS, Heun, KDPM2): never
+"""
+
+from collections import OrderedDict
+from typing import List, Optional
+
+import torch
+
+
+def tokenizer_key(tokenizer) -> tuple:
+    return (
+        getattr(tokenizer, "name_or_path", type(tokenizer).__name__),
+        len(tokenizer),
+        tokenizer.model_max_length,
+    )
+
+
+class PromptEmbeddingCache:
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._uncond = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _encode(self, tokenizer, text_encoder, prompts: List[str], device) -> torch.Tensor:
+        text_inputs = tokenizer(
+            prompts,
+            padding="max_length",
+            max_length=tokenizer.model_max_length,
+            truncation=True,
+            return_tensors="pt"
+        )
+        with torch.no_grad():
+            return text_encoder(text_inputs.input_ids.to(device))[0]
+
+    def encode(self, tokenizer, text_encoder, prompts: List[str], device) -> torch.Tensor:
+        """Returns stacked embeddings for `prompts`, running the encoder only for unseen prompts."""
+        tok = tokenizer_key(tokenizer)
+        missing = list(OrderedDict.fromkeys(p for p in prompts if (tok, p) not in self._entries))
+
+        if missing:
+            self.misses += len(missing)
+            embeddings = self._encode(tokenizer, text_encoder, missing, device)
+            for prompt, emb in zip(missing, embeddings):
+                self._entries[(tok, prompt)] = emb
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        self.hits += len(prompts) - len(missing)
+
+        out = []
+        for prompt in prompts:
+            self._entries.move_to_end((tok, prompt))
+            out.append(self._entries[(tok, prompt)])
+        return torch.stack(out).to(device)
+
+    def uncond(self, tokenizer, text_encoder, batch_size: int, device) -> torch.Tensor:
+        """The unconditional embedding, encoded once per tokenizer and broadcast to `batch_size`."""
+        tok = tokenizer_key(tokenizer)
+        if tok not in self._uncond:
+            self._uncond[tok] = self._encode(tokenizer, text_encoder, [""], device)[0]
+        return self._uncond[tok].to(device).unsqueeze(0).expand(batch_size, -1, -1)
+
+    def clear(self):
+        self._entries.clear()
+        self._uncond.clear()
+
+
+def generator_seeds(generator) -> Optional[tuple]:
+    """Seeds identify the starting noise; without them a run can't be matched to a checkpoint."""
+    if generator is None:
+        return None
+    generators = generator if isinstance(generator, list) else [generator]
+    return tuple(g.initial_seed() for g in generators)
+
+
+# per-step history of the multistep solvers (DPMSolverMultistep, UniPC, DEIS)
+MULTISTEP_STATE = ("model_outputs", "timestep_list", "lower_order_nums", "last_sample", "this_order")
+# history that isn't captured above; schedulers carrying it are never resumed
+UNSUPPORTED_STATE = ("ets", "derivatives", "prev_derivative", "cur_model_output", "sample")
+
+
+def _detach(value):
+    if isinstance(value, torch.Tensor):
+        return value.detach().to("cpu", copy=True)
+    if isinstance(value, (list, tuple)):
+        return type(value)(_detach(v) for v in value)
+    return value
+
+
+def _attach(value, device):
+    if isinstance(value, torch.Tensor):
+        return value.to(device)
+    if isinstance(value, (list, tuple)):
+        return type(value)(_attach(v, device) for v in value)
+    return value
+
+
+def scheduler_history(scheduler) -> Optional[dict]:
+    """The multistep state to restore on resume: {} for first-order schedulers, None if unsupported."""
+    if any(hasattr(scheduler, name) for name in UNSUPPORTED_STATE):
+        return None
+    return {name: _detach(getattr(scheduler, name)) for name in MULTISTEP_STATE if hasattr(scheduler, name)}
+
+
+class LatentCheckpointCache:
+    def __init__(self, max_runs: int = 8):
+        self.max_runs = max_runs
+        self._runs = OrderedDict()
+
+    @staticmethod
+    def run_key(prompts, generator, height, width, scheduler) -> Optional[tuple]:
+        seeds = generator_seeds(generator)
+        if seeds is None:
+            return None
+        return (tuple(prompts), seeds, height, width, type(scheduler).__name__)
+
+    def save(self, key, timesteps, index: int, latents: torch.Tensor, scheduler):
+        """Checkpoints the latents entering step `index`, with the scheduler history they depend on."""
+        history = scheduler_history(scheduler)
+        if key is None or history is None:
+            return
+        run = self._runs.setdefault(key, {})
+        run[int(timesteps[index])] = {
+            "latents": latents.detach().to("cpu", copy=True),
+            "history": history,
+            "schedule": tuple(int(t) for t in timesteps[:index + 1]),
+        }
+        self._runs.move_to_end(key)
+        while len(self._runs) > self.max_runs:
+            self._runs.popitem(last=False)
+
+    def resume_point(self, key, timesteps) -> tuple[int, Optional[dict]]:
+        """
+        Returns (index, checkpoint) for the most advanced step of `timesteps` that can resume
+        from a checkpoint, or (0, None) when the run must start from noise.
+        """
+        run = self._runs.get(key) if key is not None else None
+        if not run:
+            return 0, None
+        for index in range(len(timesteps) - 1, -1, -1):
+            checkpoint = run.get(int(timesteps[index]))
+            if checkpoint is None:
+                continue
+            # restored multistep history only fits the exact schedule it was recorded on
+            if checkpoint["history"] and checkpoint["schedule"] != tuple(int(t) for t in timesteps[:index + 1]):
+                continue
+            self._runs.move_to_end(key)
+            return index, checkpoint
+        return 0, None
+
+    def resume(self, key, timesteps, scheduler, device) -> tuple[int, Optional[torch.Tensor]]:
+        """
+        Finds the resume point, restores the scheduler's step index and history, and returns
+        (start index, latents) — or (0, None) to start from noise.
+        """
+        if scheduler_history(scheduler) is None:
+            return 0, None
+        index, checkpoint = self.resume_point(key, timesteps)
+        if checkpoint is None or not index:
+            return 0, None
+        if hasattr(scheduler, "set_begin_index"):
+            scheduler.set_begin_index(index)
+        for name, value in checkpoint["history"].items():
+            setattr(scheduler, name, _attach(value, device))
+        return index, checkpoint["latents"].to(device)
+
+    def clear(self):
+        self._runs.clear()
+
+
+def install_caches(pipe):
+    """Gives a custom pipeline that exposes `embedding_cache` / `latent_cache` slots its caches."""
+    if hasattr(pipe, "embedding_cache") and pipe.embedding_cache is None:
+        pipe.embedding_cache = PromptEmbeddingCache()
+    if hasattr(pipe, "latent_cache") and pipe.latent_cache is None:
+        pipe.latent_cache = LatentCheckpointCache()
+    return pipe
@@ -0,0 +1,66 @@
+"""
+⏱️ Per-step hooks for AI Forge's diffusion pipelines
+----------------------------------------------------
+
+CancelToken / GenerationCancelled
+    A thread-safe flag checked once per denoising step; the pipeline raises
+    GenerationCancelled as soon as it is set.
+
+latents_to_preview
+    Cheap latent-to-RGB approximation (a fixed 4x3 projection, no VAE decode) used for
+    low-resolution progress previews every K steps.
+"""
+
+import threading
+
+# Linear projection from SD 1.x/2.x latent channels to RGB
+LATENT_RGB_FACTORS = [
+    [0.3512, 0.2297, 0.3227],
+    [0.3250, 0.4974, 0.2350],
+    [-0.2829, 0.1762, 0.2721],
+    [-0.2120, -0.2616, -0.7177],
+]
+
+
+class GenerationCancelled(Exception):
+    pass
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise GenerationCancelled("Image generation was cancelled.")
+
+
+def latents_to_preview(latents, index: int = 0):
+    """Projects one latent (C, H/8, W/8) to a small RGB image. Costs a matmul, not a VAE pass."""
+    # imported here so the UI process can use CancelToken without loading torch
+    import numpy as np
+    import PIL.Image
+    import torch
+
+    latent = latents[index].detach().float().cpu()
+    if latent.shape[0] != len(LATENT_RGB_FACTORS):
+        # unknown latent layout: show the first three channels as a rough stand-in
+        rgb = latent[:3].permute(1, 2, 0)
+    else:
+        rgb = torch.einsum("chw,cr->hwr", latent, torch.tensor(LATENT_RGB_FACTORS))
+    rgb = ((rgb + 1) / 2).clamp(0, 1).numpy()
+    return PIL.Image.fromarray((rgb * 255).astype(np.uint8))
+
+
+def run_step_hooks(step, timestep, latents, callback=None, callback_steps=1, cancel_token=None):
+    """Called by pipelines once per denoising step."""
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+    if callback is not None and callback_steps and step % callback_steps == 0:
+        callback(step, timestep, latents)
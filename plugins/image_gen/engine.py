@@ -0,0 +1,208 @@
+# plugins/image_gen/engine.py — in-process image generation (pipelines, batching, previews)
+from hardware_profile import get_tuning
+from plugins.image_gen.pipeline_pool import PipelinePool
+from plugins.image_gen.config_watcher import ConfigWatcher
+from plugins.image_gen.performance import apply_performance_mode, load_dtype, device, resolve_mode, vae_mode
+from plugins.image_gen.batching import estimate_batch_size, make_generators, decode_latent, save_content_addressed
+from plugins.image_gen.custom_pipelines.pipeline_cache import install_caches
+from plugins.image_gen.custom_pipelines.step_hooks import latents_to_preview
+import torch
+import os
+import random
+import inspect
+from diffusers import StableDiffusionPipeline
+import importlib.util
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "image_gen_config.json")
+DEFAULT_MODEL_ID = "stabilityai/stable-diffusion-2-1"
+
+
+# ─── Pipeline Loading ──────────────────────────────────────
+def load_pipeline(model_id, config):
+    if model_id == "Freepik/F-Lite":
+        print(f"🧠 Loading custom pipeline for {model_id} from local file")
+
+        try:
+            file_path = os.path.join(os.path.dirname(__file__), "custom_pipelines", "f_lite_pipeline.py")
+            if not os.path.exists(file_path):
+                # fall back to the copy shipped next to the model weights
+                file_path = os.path.join("models", "Freepik", "F-Lite", "f_lite_pipeline.py")
+            spec = importlib.util.spec_from_file_location("f_lite_pipeline", file_path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            pipeline_cls = getattr(module, "FLitePipeline")
+
+            pipe = pipeline_cls.from_pretrained(
+                "./models/Freepik/F-Lite",
+                torch_dtype=load_dtype(config.get("cpu_dtype", "float32")),
+            )
+            # the model folder stays plugin-free; prompt-embedding and latent caches are injected here
+            return install_caches(pipe.to(device()))
+
+        except Exception as e:
+            print(f"💥 [ImageGen Error] Failed to import or load custom pipeline:\n{repr(e)}")
+            raise RuntimeError(repr(e))
+
+    else:
+        print(f"🧠 Loading standard pipeline for {model_id}")
+        # fp16 weight revisions only pay off where fp16 kernels exist
+        use_fp16_revision = torch.cuda.is_available() and ("1-5" in model_id or "2-1" in model_id)
+        return StableDiffusionPipeline.from_pretrained(
+            model_id,
+            torch_dtype=load_dtype(config.get("cpu_dtype", "float32")),
+            revision="fp16" if use_fp16_revision else None,
+        ).to(device())
+
+
+# ─── Engine ────────────────────────────────────────────────
+class ImageGenEngine:
+    """
+    Owns the warm pipeline pool and does the actual generation. Runs inside the
+    image worker process (see worker.py) so a diffusers crash can't take down the UI.
+    """
+    def __init__(self, config=None):
+        self.config = config or {}
+        self.pool = PipelinePool(self.load_pipeline, budget_bytes=self._budget_from_config(self.config))
+
+        # the watcher reloads the config only when the file changes and warms the selected model
+        self.watcher = ConfigWatcher(CONFIG_PATH, on_change=self.on_config_changed).start()
+
+    @staticmethod
+    def _budget_from_config(config):
+        budget_gb = config.get("pool_ram_gb")
+        return int(budget_gb * 1024 ** 3) if budget_gb else None
+
+    def on_config_changed(self, config):
+        self.config = config
+        if config.get("pool_ram_gb"):
+            self.pool.budget_bytes = self._budget_from_config(config)
+        model_id = config.get("model_id", DEFAULT_MODEL_ID)
+        print(f"🖼️ [ImageGen] Preloading model in background: {model_id}")
+        self.pool.preload(model_id)
+
+    def preload(self, model_id=None):
+        self.pool.preload(model_id or self.config.get("model_id", DEFAULT_MODEL_ID))
+
+    def run_batch(self, prompts, seeds=None, num_images_per_prompt=None, on_image=None,
+                  on_preview=None, cancel_token=None, settings=None):
+        """
+        Generates every (prompt, seed) pair, packing as many as fit in memory into each UNet
+        forward pass. Latents are decoded one at a time and `on_image(result)` is called as soon
+        as each image is saved, so callers can stream results. Every `preview_every` steps
+        `on_preview(preview)` gets a cheap low-res preview; setting `cancel_token` stops the run
+        at the next step with GenerationCancelled. `settings` overrides the watched config for
+        this run only (jobs carry a snapshot of the settings they were submitted with).
+        Returns the list of results.
+        """
+        config = {**self.config, **(settings or {})}
+        model_id = config.get("model_id", DEFAULT_MODEL_ID)
+        try:
+            pipe = self.pool.get(model_id)
+        except Exception as e:
+            print(f"💥 [ImageGen Error] Failed to load model '{model_id}': {e}")
+            raise RuntimeError(f"Failed to load model: {e}") from e
+
+        # hardware-tuned defaults apply only where the user config leaves a value unset
+        tuned = get_tuning().get("image_gen", {})
+        guidance_scale = config.get("guidance_scale", 7.5)
+        num_inference_steps = config.get("num_inference_steps", tuned.get("num_inference_steps", 50))
+        width = config.get("width", tuned.get("width", 512))
+        height = config.get("height", tuned.get("height", 512))
+        output_dir = config.get("output_dir", "generated_images")
+
+        if seeds is None:
+            count = num_images_per_prompt or config.get("num_images_per_prompt", 1)
+            seeds = [random.randrange(2 ** 32) for _ in range(count)]
+        jobs = [(prompt, seed) for prompt in prompts for seed in seeds]
+
+        num_inference_steps = apply_performance_mode(pipe, config, width, height, num_inference_steps)
+        batch_size = estimate_batch_size(width, height, pipe.dtype, config.get("max_batch_size", 4))
+        print(f"🧪 [ImageGen] Mode: {resolve_mode(config)}, Steps: {num_inference_steps}, "
+              f"Scale: {guidance_scale}, Res: {width}x{height}, Jobs: {len(jobs)}, Batch: {batch_size}")
+
+        results = []
+        for start in range(0, len(jobs), batch_size):
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            chunk = jobs[start:start + batch_size]
+            chunk_prompts = [prompt for prompt, _ in chunk]
+            batch_index = start // batch_size
+            print(f"🎨 [ImageGen] Batch {batch_index + 1}: {chunk_prompts}")
+
+            output = pipe(
+                chunk_prompts,
+                guidance_scale=guidance_scale,
+                num_inference_steps=num_inference_steps,
+                height=height,
+                width=width,
+                generator=make_generators([seed for _, seed in chunk]),
+                output_type="latent",
+                **self._checkpoint_kwargs(pipe, config),
+                **self._step_kwargs(pipe, config, num_inference_steps, batch_index, on_preview, cancel_token),
+            )
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            latents = self._extract_latents(output)
+
+            for i, (prompt, seed) in enumerate(chunk):
+                with vae_mode(pipe, config, width, height):
+                    image = decode_latent(pipe, latents[i:i + 1])
+                image_path = save_content_addressed(image, output_dir)
+                result = {"image_path": image_path, "prompt": prompt, "seed": seed}
+                results.append(result)
+                print(f"✅ [ImageGen] Image saved as '{image_path}'")
+                if on_image:
+                    on_image(result)
+
+        return results
+
+    @staticmethod
+    def _step_kwargs(pipe, config, total_steps, batch_index, on_preview, cancel_token):
+        """Wires previews and cancellation into either our custom pipelines or stock diffusers ones."""
+        preview_every = max(1, int(config.get("preview_every", 5)))
+
+        def emit_preview(step, latents):
+            if on_preview is not None:
+                on_preview({
+                    "step": step + 1,
+                    "total_steps": total_steps,
+                    "batch": batch_index,
+                    "image": latents_to_preview(latents),
+                })
+
+        if "cancel_token" in inspect.signature(pipe.__call__).parameters:
+            return {
+                "callback": lambda step, t, latents: emit_preview(step, latents),
+                "callback_steps": preview_every,
+                "cancel_token": cancel_token,
+            }
+
+        def on_step_end(pipeline, step, timestep, callback_kwargs):
+            if cancel_token is not None and cancel_token.is_set():
+                # stock pipelines skip the remaining steps once interrupted
+                pipeline._interrupt = True
+            elif step % preview_every == 0:
+                emit_preview(step, callback_kwargs["latents"])
+            return callback_kwargs
+
+        return {"callback_on_step_end": on_step_end}
+
+    @staticmethod
+    def _checkpoint_kwargs(pipe, config):
+        # only the custom pipelines (F-Lite, template) understand latent checkpoints
+        if getattr(pipe, "latent_cache", None) is None:
+            return {}
+        return {"checkpoint_timesteps": config.get("latent_checkpoint_timesteps", [])}
+
+    @staticmethod
+    def _extract_latents(output):
+        if isinstance(output, dict):
+            output = output["images"]
+        elif hasattr(output, "images"):
+            output = output.images
+        if isinstance(output, (list, tuple)):
+            output = torch.cat(list(output), dim=0)
+        return output
+
+    def load_pipeline(self, model_id):
+        return load_pipeline(model_id, self.config)
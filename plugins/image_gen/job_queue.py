@@ -0,0 +1,256 @@
+# plugins/image_gen/job_queue.py — SQLite-backed image job queue shared by the UI and the worker
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+import psutil
+
+JOBS_DB_PATH = os.path.join(os.path.dirname(__file__), "image_jobs.db")
+
+# a job that crashed the worker this many times is marked failed instead of retried
+MAX_ATTEMPTS = 2
+HEARTBEAT_TIMEOUT = 15.0
+
+ACTIVE_STATUSES = ("queued", "running", "cancelling")
+FINAL_STATUSES = ("done", "failed", "cancelled")
+
+
+def params_hash(params: dict) -> str:
+    """Hash of everything that determines the output: prompts, seeds and generation settings."""
+    blob = json.dumps(params, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()
+
+
+class JobQueue:
+    def __init__(self, db_path: str = JOBS_DB_PATH):
+        self.db_path = db_path
+        self.init_db()
+
+    def get_connection(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def init_db(self):
+        with self.get_connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    params_hash TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    results TEXT NOT NULL DEFAULT '[]',
+                    error TEXT,
+                    step INTEGER NOT NULL DEFAULT 0,
+                    total_steps INTEGER NOT NULL DEFAULT 0,
+                    preview_path TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    worker_pid INTEGER
+                )
+            """)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "worker_pid" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN worker_pid INTEGER")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, priority DESC, id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_hash ON jobs (params_hash, status)")
+            # the worker lease: one row, held by the live worker's pid (see reserve_worker/acquire_lease)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS worker (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    pid INTEGER,
+                    heartbeat REAL
+                )
+            """)
+
+    # ── Client side ─────────────────────────────────────
+    def submit(self, params: dict, priority: int = 0) -> tuple[int, bool]:
+        """
+        Queues a job and returns (job_id, cached). Identical params reuse an active job (dedup)
+        or a finished one whose images still exist on disk (result cache).
+        """
+        digest = params_hash(params)
+        with self.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE params_hash = ? AND status IN (?, ?, ?, 'done') "
+                    "ORDER BY id DESC LIMIT 1",
+                    (digest, *ACTIVE_STATUSES),
+                ).fetchone()
+                if row is not None:
+                    if row["status"] != "done":
+                        if priority > row["priority"]:
+                            conn.execute("UPDATE jobs SET priority = ? WHERE id = ?", (priority, row["id"]))
+                        conn.execute("COMMIT")
+                        return row["id"], False
+                    results = json.loads(row["results"])
+                    if results and all(os.path.exists(r["image_path"]) for r in results):
+                        conn.execute("COMMIT")
+                        return row["id"], True
+
+                cursor = conn.execute(
+                    "INSERT INTO jobs (params_hash, params, priority, created_at) VALUES (?, ?, ?, ?)",
+                    (digest, json.dumps(params), priority, time.time()),
+                )
+                conn.execute("COMMIT")
+                return cursor.lastrowid, False
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def get(self, job_id: int) -> dict | None:
+        with self.get_connection() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["results"] = json.loads(job["results"])
+        return job
+
+    def request_cancel(self, job_id: int):
+        with self.get_connection() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = CASE status WHEN 'queued' THEN 'cancelled' ELSE 'cancelling' END, "
+                "finished_at = CASE status WHEN 'queued' THEN ? ELSE finished_at END "
+                "WHERE id = ? AND status IN ('queued', 'running')",
+                (time.time(), job_id),
+            )
+
+    def backlog(self) -> int:
+        with self.get_connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    @staticmethod
+    def _lease_live(row) -> bool:
+        """A lease counts while its heartbeat is fresh and its process still exists."""
+        return (row is not None and row["pid"] is not None and row["heartbeat"] is not None
+                and time.time() - row["heartbeat"] < HEARTBEAT_TIMEOUT and psutil.pid_exists(row["pid"]))
+
+    def worker_alive(self) -> bool:
+        with self.get_connection() as conn:
+            return self._lease_live(conn.execute("SELECT pid, heartbeat FROM worker WHERE id = 1").fetchone())
+
+    def reserve_worker(self, spawn) -> bool:
+        """
+        Starts a worker unless one holds a live lease. `spawn()` runs inside the write transaction
+        and returns the new process's pid, which takes the lease at once, so a second client
+        (UI + `aiforge serve`) checking during the new worker's start-up sees it and doesn't
+        spawn another. Returns True when this call started the worker.
+        """
+        with self.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._lease_live(conn.execute("SELECT pid, heartbeat FROM worker WHERE id = 1").fetchone()):
+                    conn.execute("COMMIT")
+                    return False
+                self._write_lease(conn, spawn())
+                conn.execute("COMMIT")
+                return True
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _write_lease(conn, pid: int):
+        conn.execute(
+            "INSERT INTO worker (id, pid, heartbeat) VALUES (1, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET pid = excluded.pid, heartbeat = excluded.heartbeat",
+            (pid, time.time()),
+        )
+
+    # ── Worker side ─────────────────────────────────────
+    def acquire_lease(self, pid: int) -> bool:
+        """Takes the worker lease unless another live process holds it (e.g. a worker started by hand)."""
+        with self.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT pid, heartbeat FROM worker WHERE id = 1").fetchone()
+            if self._lease_live(row) and row["pid"] != pid:
+                conn.execute("COMMIT")
+                return False
+            self._write_lease(conn, pid)
+            conn.execute("COMMIT")
+            return True
+
+    def heartbeat(self, pid: int) -> bool:
+        """Renews the lease; False if another worker has taken it over."""
+        with self.get_connection() as conn:
+            cursor = conn.execute("UPDATE worker SET heartbeat = ? WHERE id = 1 AND pid = ?", (time.time(), pid))
+            return cursor.rowcount == 1
+
+    def recover_interrupted(self):
+        """
+        Re-queues jobs left running by a worker process that no longer exists; repeat offenders
+        are failed instead. Jobs held by a live worker are left alone.
+        """
+        with self.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, worker_pid FROM jobs WHERE status IN ('running', 'cancelling')"
+            ).fetchall()
+            own_pid = os.getpid()  # jobs claimed under a recycled pid of ours are orphans too
+            orphans = [row["id"] for row in rows
+                       if not row["worker_pid"] or row["worker_pid"] == own_pid or not psutil.pid_exists(row["worker_pid"])]
+            now = time.time()
+            for job_id in orphans:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'Worker crashed while running this job.', "
+                    "finished_at = ? WHERE id = ? AND status IN ('running', 'cancelling') AND attempts >= ?",
+                    (now, job_id, MAX_ATTEMPTS),
+                )
+                conn.execute("UPDATE jobs SET status = 'queued', worker_pid = NULL WHERE id = ? AND status = 'running'",
+                             (job_id,))
+                conn.execute("UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'cancelling'",
+                             (now, job_id))
+            conn.execute("COMMIT")
+
+    def claim_next(self) -> dict | None:
+        with self.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY priority DESC, id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, worker_pid = ? "
+                "WHERE id = ?",
+                (time.time(), os.getpid(), row["id"]),
+            )
+            conn.execute("COMMIT")
+        return self.get(row["id"])
+
+    def add_result(self, job_id: int, result: dict):
+        with self.get_connection() as conn:
+            conn.execute(
+                "UPDATE jobs SET results = json_insert(results, '$[#]', json(?)) WHERE id = ?",
+                (json.dumps(result), job_id),
+            )
+
+    def update_progress(self, job_id: int, step: int, total_steps: int, preview_path: str | None = None):
+        with self.get_connection() as conn:
+            conn.execute(
+                "UPDATE jobs SET step = ?, total_steps = ?, preview_path = COALESCE(?, preview_path) WHERE id = ?",
+                (step, total_steps, preview_path, job_id),
+            )
+
+    def finish(self, job_id: int, status: str, error: str | None = None):
+        with self.get_connection() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id),
+            )
+
+    def cancel_requested(self, job_id: int) -> bool:
+        with self.get_connection() as conn:
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row is None or row["status"] == "cancelling"
@@ -0,0 +1,112 @@
+# plugins/image_gen/performance.py
+import threading
+import weakref
+from contextlib import contextmanager
+
+import torch
+from diffusers import DPMSolverMultistepScheduler, UniPCMultistepScheduler
+
+PERFORMANCE_MODES = ["auto", "quality", "fast"]
+FAST_SCHEDULERS = {
+    "dpm++": lambda config: DPMSolverMultistepScheduler.from_config(
+        config, algorithm_type="dpmsolver++", use_karras_sigmas=True
+    ),
+    "unipc": lambda config: UniPCMultistepScheduler.from_config(config),
+}
+FAST_STEP_RANGE = (20, 25)
+
+# above this many pixels the VAE decode is tiled so 1536x1024 fits in modest RAM
+TILING_PIXELS = 1024 * 1024
+
+# the pipeline pool shares one VAE between checkpoints, so its slicing/tiling flags are set per decode
+_vae_locks = weakref.WeakKeyDictionary()
+_vae_locks_guard = threading.Lock()
+
+
+def device():
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def load_dtype(cpu_dtype: str = "float32"):
+    """float16 on CUDA; on CPU float32 (fp16 kernels are slow or missing) or bfloat16 if asked."""
+    if torch.cuda.is_available():
+        return torch.float16
+    return torch.bfloat16 if cpu_dtype == "bfloat16" else torch.float32
+
+
+def resolve_mode(config: dict) -> str:
+    mode = config.get("performance_mode", "auto")
+    if mode not in PERFORMANCE_MODES or mode == "auto":
+        return "quality" if torch.cuda.is_available() else "fast"
+    return mode
+
+
+def _scheduler_for(pipe, name: str):
+    """Builds schedulers once per pipeline from its original config and keeps them around."""
+    cache = getattr(pipe, "_aiforge_schedulers", None)
+    if cache is None:
+        cache = {"default": pipe.scheduler}
+        pipe._aiforge_schedulers = cache
+    if name not in cache:
+        cache[name] = FAST_SCHEDULERS[name](cache["default"].config)
+    return cache[name]
+
+
+def _toggle(target, enable_name: str, disable_name: str, enabled: bool):
+    method = getattr(target, enable_name if enabled else disable_name, None)
+    if callable(method):
+        method()
+        return True
+    return False
+
+
+def _low_memory(mode: str) -> bool:
+    return mode == "fast" or not torch.cuda.is_available()
+
+
+def apply_performance_mode(pipe, config: dict, width: int, height: int, steps: int) -> int:
+    """
+    Configures the scheduler and attention slicing on `pipe` for this run and returns the step count
+    to use. Fast mode swaps in a multistep solver (DPM-Solver++ or UniPC) clamped to 20–25 steps.
+    VAE slicing/tiling is not set here: the VAE may be shared, see vae_mode().
+    """
+    mode = resolve_mode(config)
+    scheduler_name = config.get("fast_scheduler", "dpm++") if mode == "fast" else "default"
+    if scheduler_name not in FAST_SCHEDULERS:
+        scheduler_name = "dpm++" if mode == "fast" else "default"
+
+    pipe.register_modules(scheduler=_scheduler_for(pipe, scheduler_name))
+    if mode == "fast":
+        steps = max(FAST_STEP_RANGE[0], min(steps, FAST_STEP_RANGE[1]))
+
+    # attention slicing trades a little speed for a much lower activation peak on CPU
+    # (the UNet is never shared between pooled pipelines, so this can stay set)
+    _toggle(pipe, "enable_attention_slicing", "disable_attention_slicing", _low_memory(mode))
+    return steps
+
+
+@contextmanager
+def vae_mode(pipe, config: dict, width: int, height: int):
+    """
+    Sets VAE slicing (low-memory modes) and tiling (>= TILING_PIXELS) for one decode and restores
+    the previous flags afterwards. Holds a per-VAE lock throughout, so a pipeline sharing the same
+    VAE with a different mode or size waits instead of flipping the flags mid-decode.
+    """
+    vae = getattr(pipe, "vae", None)
+    if vae is None:
+        yield
+        return
+    with _vae_locks_guard:
+        lock = _vae_locks.setdefault(vae, threading.Lock())
+    slicing, tiling = _low_memory(resolve_mode(config)), width * height >= TILING_PIXELS
+    with lock:
+        previous = getattr(vae, "use_slicing", None), getattr(vae, "use_tiling", None)
+        _toggle(vae, "enable_slicing", "disable_slicing", slicing)
+        _toggle(vae, "enable_tiling", "disable_tiling", tiling)
+        try:
+            yield
+        finally:
+            if previous[0] is not None:
+                _toggle(vae, "enable_slicing", "disable_slicing", previous[0])
+            if previous[1] is not None:
+                _toggle(vae, "enable_tiling", "disable_tiling", previous[1])
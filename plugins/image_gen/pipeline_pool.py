@@ -0,0 +1,195 @@
+# plugins/image_gen/pipeline_pool.py
+import gc
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import torch
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Components that are commonly identical across checkpoints of the same family
+SHAREABLE_COMPONENTS = ("vae", "text_encoder", "text_encoder_2")
+
+
+def module_bytes(module) -> int:
+    if not isinstance(module, torch.nn.Module):
+        return 0
+    return sum(p.numel() * p.element_size() for p in module.parameters())
+
+
+def component_signature(module) -> str | None:
+    """
+    Identifies a component by class, config and a digest of its first/last weights,
+    so two checkpoints that ship the same VAE or text encoder map to the same key.
+    """
+    if not isinstance(module, torch.nn.Module):
+        return None
+
+    config = getattr(module, "config", {})
+    if hasattr(config, "to_dict"):
+        config = config.to_dict()
+    config = {k: v for k, v in dict(config).items() if not k.startswith("_name_or_path")}
+
+    digest = hashlib.sha256()
+    digest.update(type(module).__name__.encode("utf-8"))
+    digest.update(json.dumps(config, sort_keys=True, default=str).encode("utf-8"))
+    params = list(module.parameters())
+    for p in (params[:1] + params[-1:]):
+        sample = p.detach().flatten()[:4096].float().cpu().numpy()
+        digest.update(f"{p.dtype}:{p.device}".encode("utf-8"))
+        digest.update(sample.tobytes())
+    return digest.hexdigest()
+
+
+def default_budget_bytes() -> int:
+    if torch.cuda.is_available():
+        return int(torch.cuda.get_device_properties(0).total_memory * 0.8)
+    if psutil is not None:
+        return int(psutil.virtual_memory().total * 0.5)
+    return 8 * 1024 ** 3
+
+
+class PipelinePool:
+    """
+    Keeps several loaded diffusion pipelines resident (LRU) up to a memory budget.
+    Identical VAEs / text encoders are shared between pipelines and counted once.
+    """
+    def __init__(self, loader, budget_bytes: int | None = None):
+        self.loader = loader
+        self.budget_bytes = budget_bytes or default_budget_bytes()
+        self.pipes = OrderedDict()      # model_id -> pipeline, most recently used last
+        self.own_bytes = {}             # model_id -> bytes of components not shared
+        self.shared = {}                # signature -> {"module", "bytes", "users"}
+        self.known_sizes = {}           # model_id -> total bytes, remembered across evictions
+        self._loading = {}              # model_id -> threading.Event
+        self._errors = {}               # model_id -> exception of its last failed load
+        self._lock = threading.RLock()
+
+    # ── Public API ──────────────────────────────────────
+    def get(self, model_id):
+        """
+        Returns a loaded pipeline. Only one caller loads a given model; concurrent callers
+        (and callers arriving during a preload) wait for that load instead of starting their own.
+        """
+        while True:
+            with self._lock:
+                if model_id in self.pipes:
+                    self.pipes.move_to_end(model_id)
+                    return self.pipes[model_id]
+                event = self._loading.get(model_id)
+                if event is None:
+                    self._loading[model_id] = threading.Event()  # claimed: this caller loads it
+                    break
+
+            event.wait()
+            with self._lock:
+                if model_id in self.pipes:
+                    self.pipes.move_to_end(model_id)
+                    return self.pipes[model_id]
+                error = self._errors.get(model_id)
+            if error is not None:
+                raise error
+
+        return self._load(model_id)
+
+    def preload(self, model_id):
+        """Loads `model_id` on a background thread unless it is resident or already loading."""
+        with self._lock:
+            if model_id in self.pipes or model_id in self._loading:
+                return
+            self._loading[model_id] = threading.Event()
+
+        def _worker():
+            try:
+                self._load(model_id)
+            except Exception as e:
+                print(f"💥 [ImageGen] Background preload of '{model_id}' failed: {e}")
+
+        threading.Thread(target=_worker, daemon=True).start()
+
+    def is_loaded(self, model_id) -> bool:
+        with self._lock:
+            return model_id in self.pipes
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            return sum(self.own_bytes.values()) + sum(c["bytes"] for c in self.shared.values())
+
+    def evict(self, model_id):
+        with self._lock:
+            pipe = self.pipes.pop(model_id, None)
+            self.own_bytes.pop(model_id, None)
+            for sig in [s for s, c in self.shared.items() if model_id in c["users"]]:
+                self.shared[sig]["users"].discard(model_id)
+                if not self.shared[sig]["users"]:
+                    del self.shared[sig]
+        if pipe is not None:
+            print(f"♻️ [ImageGen] Evicted '{model_id}' from pipeline pool")
+            del pipe
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+    # ── Internals ───────────────────────────────────────
+    def _load(self, model_id):
+        """Loads a model whose `_loading` event the caller has claimed; sets the event when done."""
+        with self._lock:
+            expected = self.known_sizes.get(model_id, 0)
+            self._evict_to_fit(expected, keep=model_id)
+
+        try:
+            pipe = self.loader(model_id)
+            with self._lock:
+                self._register(model_id, pipe)
+                self._evict_to_fit(0, keep=model_id)
+                self._errors.pop(model_id, None)  # an earlier failure no longer applies
+            return pipe
+        except Exception as e:
+            with self._lock:
+                self._errors[model_id] = e  # for the callers waiting on this load
+            raise
+        finally:
+            with self._lock:
+                event = self._loading.pop(model_id, None)
+            if event is not None:
+                event.set()
+
+    def _register(self, model_id, pipe):
+        components = getattr(pipe, "components", {}) or {}
+        own = sum(module_bytes(m) for name, m in components.items() if name not in SHAREABLE_COMPONENTS)
+        replacements = {}
+
+        for name in SHAREABLE_COMPONENTS:
+            module = components.get(name)
+            sig = component_signature(module)
+            if sig is None:
+                continue
+            entry = self.shared.get(sig)
+            if entry is not None:
+                replacements[name] = entry["module"]
+                print(f"🔗 [ImageGen] Sharing {name} of '{model_id}' with {sorted(entry['users'])}")
+            else:
+                entry = self.shared[sig] = {"module": module, "bytes": module_bytes(module), "users": set()}
+            entry["users"].add(model_id)
+
+        if replacements:
+            # swap in the already-resident modules so the duplicates can be freed
+            pipe.register_modules(**replacements)
+
+        self.pipes[model_id] = pipe
+        self.own_bytes[model_id] = own
+        self.known_sizes[model_id] = own + sum(
+            c["bytes"] for c in self.shared.values() if model_id in c["users"]
+        )
+
+    def _evict_to_fit(self, incoming_bytes, keep=None):
+        while self.pipes and self.memory_bytes() + incoming_bytes > self.budget_bytes:
+            victim = next((m for m in self.pipes if m != keep), None)
+            if victim is None:
+                break
+            self.evict(victim)
@@ -1,26 +1,39 @@
 # plugins/image_gen/plugin.py
 from core.plugin_base import AIForgePlugin
-import torch
-import json
+from plugins.image_gen.config_watcher import ConfigWatcher
+from plugins.image_gen.job_queue import JobQueue, FINAL_STATUSES
 import os
-from diffusers import StableDiffusionPipeline, DiffusionPipeline
-import importlib.util
+import random
+import subprocess
+import sys
+import time
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "image_gen_config.json")
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+POLL_INTERVAL = 0.25
+TRIGGER = "image:"
+
+
+def strip_trigger(prompt: str) -> str:
+    """Drops the "image:" trigger prefix (any case) that routes a prompt to this plugin."""
+    prompt = (prompt or "").strip()
+    if prompt.lower().startswith(TRIGGER):
+        prompt = prompt[len(TRIGGER):].strip()
+    return prompt
+
 
 # ─── Plugin Class ──────────────────────────────────────────
 class Plugin(AIForgePlugin):
+    """
+    Thin client for the image worker process: jobs go into a SQLite queue, the worker
+    (plugins/image_gen/worker.py) owns the pipelines, and this side polls for results.
+    """
     def __init__(self, config={}):
         super().__init__(config)
-        self.pipe = None
-        self.current_model_id = None
-
-        default_model_id = "stabilityai/stable-diffusion-2-1"
-        print(f"🖼️ [ImageGen] Loading default model: {default_model_id}")
-
-        try:
-            self.pipe = self.load_pipeline(default_model_id)
-            self.current_model_id = default_model_id
-        except Exception as e:
-            print(f"💥 [ImageGen Error] Failed to load default model: {e}")
+        self.queue = JobQueue()
+        self.watcher = ConfigWatcher(CONFIG_PATH, on_change=self.on_config_changed)
+        self.worker_process = None
+        self.ensure_worker()
 
     def get_name(self):
         return "Image Generation"
@@ -28,96 +41,121 @@ class Plugin(AIForgePlugin):
     def plugin_type(self):
         return "image_gen"
 
-    def run(self, input_data: dict):
-        print("🎨 [ImageGen] run() called")
+    def on_config_changed(self, config):
+        self.config = config
+
+    def ensure_worker(self):
+        """
+        Starts the worker unless one holds the lease in the job database (this process's or
+        another client's); a crashed worker's lease lapses with its pid, so it is simply replaced.
+        """
+        if self.worker_process is not None and self.worker_process.poll() is None:
+            return
+        if self.queue.worker_alive():
+            return  # cheap read; the locked check below settles races between clients
+
+        def spawn():
+            print("🖼️ [ImageGen] Starting image worker process")
+            self.worker_process = subprocess.Popen(
+                [sys.executable, "-m", "plugins.image_gen.worker", "--parent-pid", str(os.getpid())],
+                cwd=REPO_ROOT,
+            )
+            return self.worker_process.pid
 
-        config_path = os.path.join(os.path.dirname(__file__), "image_gen_config.json")
-        if os.path.exists(config_path):
-            try:
-                with open(config_path, "r", encoding="utf-8") as f:
-                    self.config = json.load(f)
-                print(f"🔁 [ImageGen] Reloaded config: {self.config}")
-            except Exception as e:
-                print(f"⚠️ [ImageGen] Failed to reload config: {e}")
-        else:
-            print("⚠️ [ImageGen] No config found. Using defaults.")
-
-        prompt = input_data.get("original_prompt", "") or input_data.get("text", "")
-        if not prompt:
-            return {"error": "No prompt provided."}
-        if prompt.lower().startswith("image:"):
-            prompt = prompt.split("image:", 1)[-1].strip()
+        self.queue.reserve_worker(spawn)
+
+    def submit(self, prompts, seeds=None, priority=0):
+        """Queues a generation job and returns (job_id, cached)."""
+        self.watcher.check()
+        if seeds is None:
+            count = self.config.get("num_images_per_prompt", 1)
+            seeds = [random.randrange(2 ** 32) for _ in range(count)]
+        params = {"prompts": list(prompts), "seeds": list(seeds), "settings": self.config}
+        job_id, cached = self.queue.submit(params, priority)
+        if not cached:
+            self.ensure_worker()
+        return job_id, cached
+
+    def get_status(self, job_id):
+        return self.queue.get(job_id)
 
-        model_id = self.config.get("model_id", "stabilityai/stable-diffusion-2-1")
+    def cancel(self, job_id):
+        self.queue.request_cancel(job_id)
 
-        if self.current_model_id != model_id:
-            print(f"🔄 [ImageGen] Switching to model: {model_id}")
-            try:
-                self.pipe = self.load_pipeline(model_id)
-                self.current_model_id = model_id
-            except Exception as e:
-                print(f"💥 [ImageGen Error] Failed to load model '{model_id}': {e}")
-                return {"error": f"Failed to load model: {e}"}
+    def run(self, input_data: dict):
+        print("🎨 [ImageGen] run() called")
 
-        guidance_scale = self.config.get("guidance_scale", 7.5)
-        num_inference_steps = self.config.get("num_inference_steps", 50)
-        width = self.config.get("width", 512)
-        height = self.config.get("height", 512)
+        prompts = input_data.get("prompts")
+        if not prompts:
+            prompt = input_data.get("original_prompt", "") or input_data.get("text", "")
+            prompts = [prompt]
+        prompts = [p for p in (strip_trigger(p) for p in prompts) if p]
+        if not prompts:
+            return {"error": "No prompt provided."}
 
-        print(f"🧪 [ImageGen] Steps: {num_inference_steps}, Scale: {guidance_scale}, Res: {width}x{height}")
-        print(f"🎨 [ImageGen] Prompt: {prompt}")
+        job_id, cached = self.submit(prompts, input_data.get("seeds"), input_data.get("priority", 0))
+        if cached:
+            print(f"♻️ [ImageGen] Job {job_id} served from result cache")
+        job = self.wait(
+            job_id,
+            on_image=input_data.get("on_image"),
+            on_preview=input_data.get("on_preview"),
+            cancel_token=input_data.get("cancel_token"),
+        )
+
+        if job["status"] == "cancelled":
+            return {"error": "Image generation was cancelled.", "cancelled": True, "job_id": job_id}
+        if job["status"] != "done" or not job["results"]:
+            return {"error": job.get("error") or "Image generation failed.", "job_id": job_id}
+
+        results = job["results"]
+        return {
+            "job_id": job_id,
+            "image_path": results[0]["image_path"],
+            "image_paths": [r["image_path"] for r in results],
+            "images": results,
+        }
+
+    def wait(self, job_id, on_image=None, on_preview=None, cancel_token=None):
+        """Polls a job until it finishes, forwarding new images and previews as they appear."""
+        seen_results = 0
+        seen_preview = None
+        cancel_sent = False
+
+        while True:
+            job = self.queue.get(job_id)
+            if job is None:
+                return {"status": "failed", "error": f"Job {job_id} disappeared.", "results": []}
+
+            for result in job["results"][seen_results:]:
+                if on_image:
+                    on_image(result)
+            seen_results = len(job["results"])
+
+            preview_key = (job["preview_path"], job["step"])
+            if on_preview and job["preview_path"] and preview_key != seen_preview and job["status"] == "running":
+                seen_preview = preview_key
+                self._forward_preview(job, on_preview)
+
+            if job["status"] in FINAL_STATUSES:
+                return job
+
+            if cancel_token is not None and cancel_token.is_set() and not cancel_sent:
+                self.cancel(job_id)
+                cancel_sent = True
+
+            # a crashed worker leaves the job running; a fresh one re-queues it on start-up
+            if job["status"] in ("queued", "running"):
+                self.ensure_worker()
+            time.sleep(POLL_INTERVAL)
+
+    @staticmethod
+    def _forward_preview(job, on_preview):
+        import PIL.Image
 
         try:
-            output = self.pipe(
-                prompt,
-                guidance_scale=guidance_scale,
-                num_inference_steps=num_inference_steps,
-                height=height,
-                width=width
-            )
-            print("✅ Pipeline executed successfully.")
-
-            if isinstance(output, list):
-                image = output[0]
-            elif hasattr(output, "images"):
-                image = output.images[0]
-            else:
-                image = output
-
-            image_path = "generated_image.png"
-            image.save(image_path)
-            print(f"✅ [ImageGen] Image saved as '{image_path}'")
-            return {"image_path": image_path}
-
-        except Exception as e:
-            print(f"💥 [ImageGen Error] {e}")
-            return {"error": f"Image generation failed: {e}"}
-
-    def load_pipeline(self, model_id):
-        if model_id == "Freepik/F-Lite":
-            print(f"🧠 Loading custom pipeline for {model_id} from local file")
-
-            try:
-                file_path = os.path.join(os.path.dirname(__file__), "custom_pipelines", "f_lite_pipeline.py")
-                spec = importlib.util.spec_from_file_location("f_lite_pipeline", file_path)
-                module = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(module)
-                pipeline_cls = getattr(module, "FLitePipeline")
-
-                pipe = pipeline_cls.from_pretrained(
-                    "./models/Freepik/F-Lite",
-                    torch_dtype=torch.float16,
-                )
-                return pipe.to("cuda" if torch.cuda.is_available() else "cpu")
-
-            except Exception as e:
-                print(f"💥 [ImageGen Error] Failed to import or load custom pipeline:\n{repr(e)}")
-                raise RuntimeError(repr(e))
-
-        else:
-            print(f"🧠 Loading standard pipeline for {model_id}")
-            return StableDiffusionPipeline.from_pretrained(
-                model_id,
-                torch_dtype=torch.float16,
-                revision="fp16" if "1-5" in model_id or "2-1" in model_id else None,
-            ).to("cuda" if torch.cuda.is_available() else "cpu")
+            with PIL.Image.open(job["preview_path"]) as image:
+                image.load()
+                on_preview({"step": job["step"], "total_steps": job["total_steps"], "image": image.copy()})
+        except (OSError, ValueError):
+            pass  # preview being replaced; the next poll picks up the new one
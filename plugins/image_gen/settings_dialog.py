@@ -1,9 +1,12 @@
 # plugins/image_gen/image_settings_dialog.py
-from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLabel, QSlider, QPushButton, QComboBox
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QLabel, QSlider, QPushButton, QComboBox, QSpinBox
 from PyQt6.QtCore import Qt
 import json
 import os
 
+PERFORMANCE_MODES = ["auto", "quality", "fast"]
+TUNED_KEYS = ("num_inference_steps", "width", "height")  # hardware_profile's tuning fills these only while unset
+
 CONFIG_PATH = "plugins/image_gen/image_gen_config.json"
 
 class ImageGenSettingsDialog(QDialog):
@@ -12,6 +15,9 @@ class ImageGenSettingsDialog(QDialog):
         self.setWindowTitle("Image Generation Settings")
         self.setMinimumWidth(400)
         self.config_path = config_path
+        self.loaded = {}
+        from hardware_profile import get_tuning
+        self.tuned = get_tuning().get("image_gen", {})
 
         self.layout = QVBoxLayout()
 
@@ -64,6 +70,19 @@ class ImageGenSettingsDialog(QDialog):
         ])
         self.layout.addWidget(self.resolution_dropdown)
 
+        # ── Images per Prompt ───────────────────────────
+        self.layout.addWidget(QLabel("Images per Prompt (different seeds, batched):"))
+        self.images_spin = QSpinBox()
+        self.images_spin.setRange(1, 8)
+        self.images_spin.setValue(1)
+        self.layout.addWidget(self.images_spin)
+
+        # ── Performance Mode ────────────────────────────
+        self.layout.addWidget(QLabel("Performance Mode (fast = DPM-Solver++ at 20–25 steps):"))
+        self.mode_dropdown = QComboBox()
+        self.mode_dropdown.addItems(PERFORMANCE_MODES)
+        self.layout.addWidget(self.mode_dropdown)
+
         # ── Save Button ────────────────────────────────
         self.save_button = QPushButton("Save Settings")
         self.save_button.clicked.connect(self.save_settings)
@@ -79,11 +98,26 @@ class ImageGenSettingsDialog(QDialog):
             "num_inference_steps": self.steps_slider.value(),
             "model_id": self.model_dropdown.currentText(),
             "width": width,
-            "height": height
+            "height": height,
+            "num_images_per_prompt": self.images_spin.value(),
+            "performance_mode": self.mode_dropdown.currentText()
         }
 
     def save_settings(self):
-        settings = self.get_settings()
+        # keep keys this dialog doesn't edit (e.g. pool_ram_gb, fast_scheduler)
+        settings = {}
+        if os.path.exists(self.config_path):
+            try:
+                with open(self.config_path, "r", encoding="utf-8") as f:
+                    settings = json.load(f)
+            except (json.JSONDecodeError, IOError):
+                settings = {}
+        chosen = self.get_settings()
+        for key in TUNED_KEYS:
+            # an untouched tuned default stays unset so a later re-tune can still change it
+            if key not in self.loaded and chosen[key] == self.tuned.get(key):
+                chosen.pop(key)
+        settings.update(chosen)
         with open(self.config_path, "w", encoding="utf-8") as f:
             json.dump(settings, f, indent=2)
         self.accept()
@@ -92,7 +126,8 @@ class ImageGenSettingsDialog(QDialog):
         if os.path.exists(self.config_path):
             try:
                 with open(self.config_path, "r", encoding="utf-8") as f:
-                    settings = json.load(f)
+                    self.loaded = json.load(f)
+                settings = {**self.tuned, **self.loaded}
 
                 # Load sliders
                 self.guidance_slider.setValue(settings.get("guidance_scale", 9))
@@ -106,6 +141,13 @@ class ImageGenSettingsDialog(QDialog):
                 if index != -1:
                     self.resolution_dropdown.setCurrentIndex(index)
 
+                self.images_spin.setValue(settings.get("num_images_per_prompt", 1))
+
+                # Load performance mode
+                index = self.mode_dropdown.findText(settings.get("performance_mode", "auto"))
+                if index != -1:
+                    self.mode_dropdown.setCurrentIndex(index)
+
                 # Load model
                 model_id = settings.get("model_id", "stabilityai/stable-diffusion-2-1")
                 index = self.model_dropdown.findText(model_id)
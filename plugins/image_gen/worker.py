@@ -0,0 +1,128 @@
+# plugins/image_gen/worker.py — dedicated image generation process
+#
+# Started automatically by the Image Generation plugin; can also be run by hand:
+#   python -m plugins.image_gen.worker
+
+import argparse
+import os
+import threading
+import time
+
+import psutil
+
+from plugins.image_gen.job_queue import JobQueue
+from plugins.image_gen.custom_pipelines.step_hooks import CancelToken, GenerationCancelled
+
+PREVIEW_DIR = os.path.join("generated_images", "previews")
+HEARTBEAT_INTERVAL = 2.0
+IDLE_POLL_INTERVAL = 0.5
+
+
+class JobCancelToken(CancelToken):
+    """Cancel token backed by the job row, so the UI process can cancel a running job."""
+    def __init__(self, queue: JobQueue, job_id: int, interval: float = 0.5):
+        super().__init__()
+        self.queue = queue
+        self.job_id = job_id
+        self.interval = interval
+        self._last_check = 0.0
+
+    def is_set(self) -> bool:
+        if super().is_set():
+            return True
+        now = time.monotonic()
+        if now - self._last_check >= self.interval:
+            self._last_check = now
+            if self.queue.cancel_requested(self.job_id):
+                self.cancel()
+        return super().is_set()
+
+    def raise_if_cancelled(self):
+        if self.is_set():
+            raise GenerationCancelled("Image generation was cancelled.")
+
+
+def _parent_alive(pid):
+    # psutil rather than os.kill(pid, 0), which sends CTRL_C_EVENT on Windows
+    return not pid or psutil.pid_exists(pid)
+
+
+def save_preview(job_id, image):
+    os.makedirs(PREVIEW_DIR, exist_ok=True)
+    path = os.path.abspath(os.path.join(PREVIEW_DIR, f"job_{job_id}.png"))
+    tmp_path = path + ".tmp.png"
+    image.save(tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def process_job(queue: JobQueue, engine, job: dict):
+    job_id = job["id"]
+    params = job["params"]
+    print(f"🎨 [ImageWorker] Job {job_id}: {params['prompts']}")
+
+    def on_preview(preview):
+        path = save_preview(job_id, preview["image"])
+        queue.update_progress(job_id, preview["step"], preview["total_steps"], path)
+
+    try:
+        engine.run_batch(
+            params["prompts"],
+            seeds=params["seeds"],
+            settings=params.get("settings"),
+            on_image=lambda result: queue.add_result(job_id, result),
+            on_preview=on_preview,
+            cancel_token=JobCancelToken(queue, job_id),
+        )
+        queue.finish(job_id, "done")
+        print(f"✅ [ImageWorker] Job {job_id} done")
+    except GenerationCancelled:
+        queue.finish(job_id, "cancelled")
+        print(f"⛔ [ImageWorker] Job {job_id} cancelled")
+    except Exception as e:
+        queue.finish(job_id, "failed", f"Image generation failed: {e}")
+        print(f"💥 [ImageWorker] Job {job_id} failed: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI Forge image generation worker")
+    parser.add_argument("--parent-pid", type=int, default=None,
+                        help="exit when this process (the UI) goes away")
+    args = parser.parse_args()
+
+    queue = JobQueue()
+    if not queue.acquire_lease(os.getpid()):
+        print("🖼️ [ImageWorker] Another worker is already running; exiting")
+        return
+    # only jobs of worker processes that are gone; we hold the lease, so nobody else is running them
+    queue.recover_interrupted()
+
+    stop = threading.Event()
+
+    def beat():
+        # separate thread so long denoising runs don't look like a dead worker
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            if not queue.heartbeat(os.getpid()):
+                print("⚠️ [ImageWorker] Lost the worker lease; exiting after the current job")
+                stop.set()
+
+    threading.Thread(target=beat, daemon=True).start()
+
+    # heavy imports happen here, in the worker, never in the UI process
+    from plugins.image_gen.engine import ImageGenEngine
+    engine = ImageGenEngine()
+    print(f"🖼️ [ImageWorker] Ready (pid {os.getpid()})")
+
+    try:
+        while _parent_alive(args.parent_pid) and not stop.is_set():
+            job = queue.claim_next()
+            if job is None:
+                time.sleep(IDLE_POLL_INTERVAL)
+                continue
+            process_job(queue, engine, job)
+    finally:
+        stop.set()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,6 @@
 
 import os
 import json
-from PyQt6.QtCore import Qt
 
 TEMPLATE_DIR = "prompt_templates"
 os.makedirs(TEMPLATE_DIR, exist_ok=True)
@@ -55,17 +54,17 @@ def delete_prompt_template(name: str) -> None:
         os.remove(path)
 
 
-def chain_prompts(template_names: list[str], user_input: str, model_loader) -> str:
+def run_chain(template_names: list[str], user_input: str, model_loader) -> list[tuple[str, str, str]]:
     """
     Run multiple templates in sequence, feeding the output to the next.
-    Each step appends a prompt/response block to the final output.
+    Returns (template name, prompt, response) for each step.
     """
     if not model_loader:
         raise ValueError("ModelLoader instance is required for chaining.")
 
     previous_output = ""
     seen = set()
-    conversation = ""
+    steps = []
 
     for name in template_names:
         if name in seen:
@@ -79,7 +78,18 @@ def chain_prompts(template_names: list[str], user_input: str, model_loader) -> s
         prompt = apply_template(template, user_input, previous_output)
         response = model_loader.generate_single_response(prompt)
         previous_output = response
+        steps.append((name, prompt, response))
 
+    return steps
+
+
+def chain_prompts(template_names: list[str], user_input: str, model_loader) -> str:
+    """
+    Run multiple templates in sequence, feeding the output to the next.
+    Each step appends a prompt/response block to the final output.
+    """
+    conversation = ""
+    for name, prompt, response in run_chain(template_names, user_input, model_loader):
         conversation += (
             f"<div class='ai-output'>"
             f"<b style='color:#ff79c6;'>Prompt ({name}):</b><br><i>{prompt}</i><hr>"
@@ -90,6 +100,8 @@ def chain_prompts(template_names: list[str], user_input: str, model_loader) -> s
 
 
 def update_template_selector_state(self):
+    from PyQt6.QtCore import Qt
+
     any_checked = any(
         self.chain_list.item(i).checkState() == Qt.CheckState.Checked
         for i in range(self.chain_list.count())